@@ -6,8 +6,10 @@ from firebase_admin import credentials, auth, firestore, db
 from firebase_admin.exceptions import FirebaseError
 
 from dotenv import load_dotenv
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 import json
+import hashlib
 
 import logging
 import requests
@@ -20,6 +22,28 @@ from routes.health import *
 from models.notification import Notification
 from models.notification import *
 from models.notification import FCMManager
+from routes.emergency_detector import incident_event_handler, init_emergency_monitor
+from routes.emergency_incident import Incident, IncidentManager
+from routes.auth_middleware import init_auth, owner_forbidden, verifier
+from routes.background_jobs import start_jobs
+from models.repository import NotificationRepository, UserRepository, init_repository
+from routes.metrics import init_metrics, record_cache, track_upstream
+from routes.cache_backend import get_cache
+from routes.geocoder import DISTRICT_MATCH_KM, get_geocoder
+from routes.location_buffer import get_location_buffer
+from routes.quota_scheduler import PRIORITY_EMERGENCY, priority, scheduler
+from routes.resilience import init_resilience, mark_stale
+from routes.response_encoding import init_response_encoding, respond
+from routes.tracing import init_tracing, submit
+from routes.weather_history import cell_id
+from routes.weather_monitor import active_alerts, init_weather_monitor
+from routes.digest import index_user_async, init_digest
+from routes.admin import admin_bp
+from routes.export import export_bp
+from routes.event_hub import get_event_hub
+from routes.events import events_bp
+from routes.admission import ROUTE_CLASS_ALERTS, ROUTE_CLASS_CAFES, ROUTE_CLASS_EMERGENCY, admission
+from routes.alert_explanations import explain_alert
 
 from geopy import Nominatim
 import google.generativeai as genai
@@ -30,7 +54,10 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-MOCK_JSON_PATH = os.path.join(os.path.dirname(__file__), 'tests\mock-anno.json')
+MOCK_JSON_PATH = os.path.join(os.path.dirname(__file__), 'tests', 'mock-anno.json')
+GEOCODE_TTL = 30 * 24 * 3600   # Konum doğrulama sonucu neredeyse hiç değişmez
+MAX_BATCH_ITEMS = 500
+GEMINI_TTL = 24 * 3600
 
 def get_user(email):
     return db.reference(f'/users/{email}').get()
@@ -38,13 +65,33 @@ def get_user(email):
 #konum doğrulama
 def validate_location(location: str) -> bool:
     try:
-        geolocator = Nominatim(user_agent="weather_app")
-        return bool(geolocator.geocode(location))
+        def geocode():
+            scheduler.acquire("nominatim")
+            geolocator = Nominatim(user_agent="weather_app")
+            with track_upstream("nominatim", "geocode"):
+                return bool(geolocator.geocode(location))
+        return get_cache().get_or_fetch("geocode", location.strip().lower(), GEOCODE_TTL, geocode)
     except:
         return False
     
 # Flask Uygulamasını Başlat
 app = Flask(__name__)
+init_tracing(app)
+init_metrics(app)
+init_auth(app)
+init_repository(app, record_cache=record_cache, track_upstream=track_upstream, submit=submit,
+                publish=lambda topic, event_type, data: get_event_hub().publish(topic, event_type, data),
+                pending_location=lambda user_id: get_location_buffer().latest(user_id))
+init_resilience(app)
+init_digest(app)
+init_weather_monitor(app)
+init_response_encoding(app)
+
+# Ters vekil arkasında istemci IP'si: yalnızca bilinen sayıda vekilin eklediği
+# X-Forwarded-For adımlarına güvenilir (0: doğrudan bağlantı, başlık yok sayılır)
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=TRUSTED_PROXY_HOPS)
 
 # Firebase Başlatma
 try:
@@ -84,10 +131,9 @@ except Exception as e:
     firestore_db = None
     realtime_db = None
 
-def get_location(user_id: str) -> tuple:
-    """(lat, lon) tuple döner"""
-    location_str = db.reference(f'/users/{user_id}/location').get()
-    return tuple(map(float, location_str.split(','))) if location_str else 'Ankara'
+def get_location(user_id: str) -> str:
+    """Tahmin konumu: kullanıcının ilçesinin temsil noktası ("lat,lon"); konum yoksa 'Ankara'"""
+    return normalize_location(UserRepository().get_location(user_id)) or 'Ankara'
 
 @app.route('/verify-token', methods=['POST'])
 def verify_token():
@@ -98,8 +144,8 @@ def verify_token():
         return jsonify({"error": "ID token missing"}), 400
 
     try:
-        # Verify the ID token
-        decoded_token = auth.verify_id_token(id_token)
+        # Verify the ID token (doğrulanmış token'lar önbellekten döner)
+        decoded_token = verifier.verify(id_token)
         uid = decoded_token['uid']
         return jsonify({"message": "Token verified", "uid": uid}), 200
     except Exception as e:
@@ -119,8 +165,13 @@ def register_device():
     try:
         user_id = request.json['user_id']
         token = request.json['token']
+        forbidden = owner_forbidden(user_id)
+        if forbidden:
+            return forbidden
         fcm = FCMManager(user_id)
         success = fcm.register_device(token)
+        if success:
+            index_user_async(user_id)
         return jsonify({"success": success}), 200 if success else 400
     except KeyError:
         return jsonify({"error": "Geçersiz istek formatı"}), 400
@@ -137,14 +188,18 @@ def set_location():
 
         if not user_id or not location:
             return jsonify({"error": "Eksik veri"}), 400
+        forbidden = owner_forbidden(user_id)
+        if forbidden:
+            return forbidden
 
-        ref = db.reference(f"users/{user_id}/location")
-        ref.set(location)
+        # Yazma tamponu: yalnızca anlamlı konum değişiklikleri toplu olarak kaydedilir
+        # (özet indeksi de kayıttan sonra güncellenir)
+        get_location_buffer().update(user_id, location)
 
         return jsonify({"message": "Konum başarıyla kaydedildi", "user_id": user_id, "location": location}), 200
 
     except Exception as e:
-        print(f"set_location HATASI: {e}")
+        logger.error(f"set_location hatası: {str(e)}")
         return jsonify({"error": "Sunucu hatası"}), 500
 #SET LOCATION
 
@@ -153,32 +208,21 @@ genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 model = genai.GenerativeModel('gemini-pro')
 
 def analyze_with_gemini(prompt: str, context: str) -> str:
-    """Gemini'ye metin analizi yaptırır"""
-    try:
-        response = model.generate_content(f"{prompt}\n\nContext: {context}")
+    """Gemini'ye metin analizi yaptırır (aynı prompt/context için sonuç paylaşılır)"""
+    def generate():
+        with track_upstream("gemini", "generate_content"):
+            response = model.generate_content(f"{prompt}\n\nContext: {context}")
         return response.text
+
+    key = hashlib.sha256(f"{prompt}\x00{context}".encode()).hexdigest()
+    try:
+        return get_cache().get_or_fetch("gemini", key, GEMINI_TTL, generate)
     except Exception as e:
         logger.error(f"Gemini analiz hatası: {str(e)}")
         return "Durum analizi şu anda mevcut değil"
 
 # Akıllı Uyarı Sistemleri
 
-def enhanced_weather_alert(user_id: str, alert_data: dict):
-    """Hava durumu uyarılarını Gemini ile zenginleştirir"""
-    analysis = analyze_with_gemini(
-        prompt="Aşağıdaki hava durumu uyarısını basit Türkçe ile açıkla ve 3 maddelik öneri sun:",
-        context=alert_data['message']
-    )
-    
-    enhanced_alert = {
-        **alert_data,
-        "gemini_analysis": analysis,
-        "type": "enhanced_weather_alert"
-    }
-    
-    # Bildirimi kaydet ve gönder
-    return send_weather_alert(user_id, enhanced_alert)
-
 def scrape_municipality_announcements(city: str = "ankara") -> List[Dict]:
     """JSON dosyasından mock veri çeken fonksiyon"""
     try:
@@ -210,29 +254,35 @@ def generate_recommendation_message(cafes: list) -> str:
     
     message = "Yakınınızdaki önerilen kafeler:\n"
     for i, cafe in enumerate(cafes[:5], 1):
-        message += f"{i}. {cafe['name']} - {cafe['distance']} metre uzakta\n"
+        message += f"{i}. {cafe['name']} - {cafe['distance_meters']} metre uzakta\n"
     message += "\nBu kafelerde dinlenebilir veya içecek alabilirsiniz."
     return message
 
+@priority(PRIORITY_EMERGENCY)  # Uyarı akışı, yoğun /weather trafiğinde kotasız kalmasın
 def send_enhanced_alert(user_id: str, alert_type: str, original_data: dict):
     """Özel kafe önerili bildirim gönderir"""
     try:
-        # 1. Kullanıcı konumunu al
-        location = get_location(user_id)
+        # 1. Kullanıcının tam konumunu al (kafe mesafeleri ilçe noktasına değil kullanıcıya göre)
+        location = UserRepository().get_location(user_id)
         
         # 2. Yakın kafeleri bul
-        lat, lon = location.split(',')  # Konum formatı "lat,lon" olmalı
+        lat, lon = map(float, location.split(','))  # Konum formatı "lat,lon" olmalı
         cafes = CafeRecommendationService.find_top5_cafes(lat, lon)
         
         # 3. Öneri mesajını oluştur
         recommendation_msg = generate_recommendation_message(cafes)
         
-        # 4. Gemini ile bağlamsal mesaj oluştur
-        full_message = f"{original_data['message']}\n\n{recommendation_msg}"
-        gemini_analysis = analyze_with_gemini(
-            prompt="Bu uyarıyı ve kafe önerilerini birleştirerek dostça bir mesaj oluştur:",
-            context=full_message
-        )
+        # 4. Bilinen kalıptaki uyarılar önceden üretilmiş açıklamayla birleştirilir;
+        #    yalnızca yeni tür uyarılar için Gemini ile bağlamsal mesaj oluşturulur
+        explanation = explain_alert(original_data['message'])
+        if explanation:
+            gemini_analysis = f"{explanation}\n\n{recommendation_msg}"
+        else:
+            full_message = f"{original_data['message']}\n\n{recommendation_msg}"
+            gemini_analysis = analyze_with_gemini(
+                prompt="Bu uyarıyı ve kafe önerilerini birleştirerek dostça bir mesaj oluştur:",
+                context=full_message
+            )
         
         # 5. Bildirimi kaydet ve gönder
         notification_id = Notification(user_id).create(
@@ -267,22 +317,11 @@ def weekly_weather(user_id: str):
     """Kullanıcının konumuna göre 7 günlük hava tahmini"""
     try:
         location = get_location(user_id =user_id)
-        api_key = os.getenv("VISUAL_CROSSING_API_KEY")
         
-        response = requests.get(
-            f"https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/{location}/next7days",
-            params={
-                "unitGroup": "metric",
-                "include": "days",
-                "key": api_key,
-                "contentType": "json"
-            },
-            timeout=15
-        )
-        response.raise_for_status()
+        days = fetch_timeline(location, "next7days", "days", "next7days").get('days', [])
         
         weekly_data = []
-        for day in response.json().get('days', []):
+        for day in days:
             weekly_data.append({
                 "date": day['datetime'],
                 "temp_max": day['tempmax'],
@@ -293,11 +332,20 @@ def weekly_weather(user_id: str):
                 "sunset": day['sunset']
             })
             
-        return jsonify({
+        return respond({
             "location": location,
             "forecast_days": len(weekly_data),
             "data": weekly_data
-        }), 200
+        }, compact=lambda: {
+            "location": location,
+            "date": [day.get('datetimeEpoch') for day in days],
+            "temp_max": [day['tempmax'] for day in days],
+            "temp_min": [day['tempmin'] for day in days],
+            "precip_prob": [day['precipprob'] for day in days],
+            "conditions": [day['conditions'] for day in days],
+            "sunrise": [day.get('sunriseEpoch') for day in days],
+            "sunset": [day.get('sunsetEpoch') for day in days]
+        })
         
     except requests.exceptions.RequestException as e:
         logger.error(f"API hatası: {str(e)}")
@@ -311,29 +359,16 @@ def current_weather(user_id: str):
     """Kullanıcının konumuna göre anlık hava durumu"""
     try:
         location = get_location(user_id)
-        api_key = os.getenv("VISUAL_CROSSING_API_KEY")
         
-        response = requests.get(
-            f"https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/{location}/today",
-            params={
-                "unitGroup": "metric",
-                "include": "current",
-                "key": api_key,
-                "contentType": "json"
-            },
-            timeout=10
-        )
-        response.raise_for_status()
+        current_data = fetch_timeline(location, "today", "current", "current", timeout=10).get('currentConditions', {})
         
-        current_data = response.json().get('currentConditions', {})
-        
-        return jsonify({
+        return respond({
             "location": location,
             "temp": current_data.get('temp'),
             "feels_like": current_data.get('feelslike'),
             "humidity": current_data.get('humidity'),
             "conditions": current_data.get('conditions')
-        }), 200
+        })
         
     except requests.exceptions.RequestException as e:
         logger.error(f"Current weather API error: {str(e)}")
@@ -342,21 +377,78 @@ def current_weather(user_id: str):
         logger.error(f"Current weather error: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+@app.route('/weather/batch', methods=['POST'])
+def weather_batch():
+    """
+    Çok sayıda kullanıcı ya da konum için anlık hava durumu.
+    Gövde: {"user_ids": [...]} ve/veya {"locations": ["39.92,32.85", "Ankara", ...]}
+    Aynı konuma düşen öğeler tek çekimle karşılanır; hatalar öğe bazında raporlanır.
+    """
+    data = request.get_json(silent=True) or {}
+    user_ids = data.get("user_ids") or []
+    locations = data.get("locations") or []
+    if not isinstance(user_ids, list) or not isinstance(locations, list):
+        return jsonify({"error": "user_ids ve locations liste olmalı"}), 400
+    if not user_ids and not locations:
+        return jsonify({"error": "user_ids veya locations gerekli"}), 400
+    if len(user_ids) + len(locations) > MAX_BATCH_ITEMS:
+        return jsonify({"error": f"En fazla {MAX_BATCH_ITEMS} öğe gönderilebilir"}), 400
+    for uid in user_ids:
+        forbidden = owner_forbidden(uid)
+        if forbidden:
+            return forbidden
+
+    try:
+        stored = UserRepository().get_locations(str(uid) for uid in user_ids) if user_ids else {}
+        items = [({"user_id": uid}, normalize_location(stored.get(str(uid)))) for uid in user_ids]
+        items += [({"location": location}, normalize_location(location)) for location in locations]
+
+        fetched = fetch_current_many(location for _, location in items if location)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Weather batch API error: {str(e)}")
+        return jsonify({"error": "Hava durumu servisine ulaşılamıyor"}), 503
+
+    results = []
+    for item, location in items:
+        outcome = fetched.get(location) if location else {"error": "Konum bulunamadı"}
+        if "error" in outcome:
+            results.append({**item, "status": "error", "error": outcome["error"]})
+            continue
+        current = outcome["data"].get('currentConditions', {})
+        if outcome["stale_age"]:
+            mark_stale(outcome["stale_age"])
+        results.append({
+            **item,
+            "status": "ok",
+            "resolved_location": location,
+            "temp": current.get('temp'),
+            "feels_like": current.get('feelslike'),
+            "humidity": current.get('humidity'),
+            "conditions": current.get('conditions'),
+            "stale_age": int(outcome["stale_age"])
+        })
+
+    failed = sum(1 for result in results if result["status"] == "error")
+    return respond({
+        "results": results,
+        "unique_locations": len(fetched),
+        "failed": failed
+    }, 503 if failed == len(results) else 200)
+
 @app.route('/weather/alerts/<user_id>', methods=['GET'])
 def weather_alerts(user_id: str):
     """Kullanıcı için aktif meteorolojik uyarılar"""
     try:
-        location = get_location(user_id)
-        
-        # Gerçek veri için Firebase'den geçmiş veri çek
-        ref = db.reference(f'/weather_history/{user_id}')
-        historical_data = ref.get()
+        raw_location = UserRepository().get_location(user_id)
+        location = normalize_location(raw_location) or 'Ankara'
         
-        alerts = check_sudden_change(historical_data, get_weather(location))
+        # Uyarılar hücre başına arka plan izleyicisinde hesaplanır (routes/weather_monitor.py);
+        # hücre indeksi ham konumla anahtarlandığı için hücre de ham konumdan bulunur
+        alerts = active_alerts(cell_id(raw_location or location))
         
         return jsonify({
             "location": location,
-            "alerts": alerts if alerts else [],
+            "alerts": alerts,
             "last_updated": datetime.now().isoformat()
         }), 200
         
@@ -375,24 +467,13 @@ def daily_detailed_weather(user_id: str):
         location = get_location(user_id)
         
         # 2. API'den saatlik verileri çek
-        api_key = os.getenv("VISUAL_CROSSING_API_KEY")
         today = datetime.now().strftime("%Y-%m-%d")
         
-        response = requests.get(
-            f"https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/{location}/{today}/{today}",
-            params={
-                "unitGroup": "metric",
-                "include": "hours",
-                "key": api_key,
-                "contentType": "json"
-            },
-            timeout=15
-        )
-        response.raise_for_status()
+        timeline = fetch_timeline(location, f"{today}/{today}", "hours", "hours")
         
         # 3. Veriyi işle
         hourly_data = []
-        day_data = response.json().get('days', [{}])[0]
+        day_data = timeline.get('days', [{}])[0]
         for hour in day_data.get('hours', []):
             hourly_data.append({
                 "time": datetime.fromtimestamp(hour['datetimeEpoch']).strftime("%H:%M"),
@@ -404,11 +485,22 @@ def daily_detailed_weather(user_id: str):
                 "conditions": hour.get('conditions')
             })
             
-        return jsonify({
+        hours = day_data.get('hours', [])
+        return respond({
             "location": location,
             "date": today,
             "hours": hourly_data
-        }), 200
+        }, compact=lambda: {
+            "location": location,
+            "date": today,
+            "time": [hour['datetimeEpoch'] for hour in hours],
+            "temp": [hour.get('temp') for hour in hours],
+            "feels_like": [hour.get('feelslike') for hour in hours],
+            "humidity": [hour.get('humidity', 0) for hour in hours],
+            "precip_prob": [hour.get('precipprob', 0) for hour in hours],
+            "wind_speed": [hour.get('windspeed', 0) for hour in hours],
+            "conditions": [hour.get('conditions') for hour in hours]
+        })
         
     except requests.exceptions.RequestException as e:
         logger.error(f"Saatlik veri API hatası: {str(e)}")
@@ -445,7 +537,7 @@ def get_notifications(user_id: str):
     """Tüm bildirimleri listeleme"""
     notifier = Notification(user_id)
     limit = int(request.args.get('limit', 100))
-    return jsonify(notifier.get_all(limit)), 200
+    return respond(notifier.get_all(limit))
 
 @notifications_bp.route('/<user_id>/<notification_id>/read', methods=['PUT'])
 def mark_as_read(user_id: str, notification_id: str):
@@ -458,8 +550,7 @@ def mark_as_read(user_id: str, notification_id: str):
 def delete_notification(user_id: str, notification_id: str):
     """Bildirimi silme"""
     try:
-        ref = db.reference(f'/notifications/{user_id}/{notification_id}')
-        ref.delete()
+        NotificationRepository().delete(user_id, notification_id)
         return jsonify({"success": True}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -488,16 +579,18 @@ def send_test_push(user_id: str):
 @notifications_bp.route('/analyzed-alerts/<user_id>', methods=['GET'])
 def get_analyzed_alerts(user_id: str):
     """Zenginleştirilmiş uyarıları getir"""
-    ref = db.reference(f'/notifications/{user_id}')
-    alerts = ref.order_by_child('type').equal_to('enhanced_weather_alert').get()
-    return jsonify(list(alerts.values())), 200
+    alerts = NotificationRepository().by_type(user_id, 'enhanced_weather_alert')
+    return jsonify(alerts), 200
 
 @notifications_bp.route('/municipality-alerts/<user_id>', methods=['POST'])
+@admission(ROUTE_CLASS_ALERTS)
 def trigger_municipality_alert(user_id: str):
     """Belediye duyurularını analiz edip bildirim oluştur"""
     try:
-        # 1. Duyuruları çek
-        announcements = scrape_municipality_announcements()
+        # 1. Kullanıcının ilindeki duyuruları çek
+        # Seyrek merkez verisinden il üyeliği çıkarılmaz: yalnızca ilçe merkezine yakın konumlar eşlenir
+        place = get_geocoder().resolve(UserRepository().get_location(user_id), DISTRICT_MATCH_KM)
+        announcements = scrape_municipality_announcements(place.city if place else "ankara")
         
         # 2. Her duyuruyu analiz et
         for announcement in announcements:
@@ -522,19 +615,15 @@ def trigger_municipality_alert(user_id: str):
         return jsonify({"error": str(e)}), 500
     
 @notifications_bp.route('/weather-alert/<user_id>', methods=['POST'])
-def trigger_weather_alert(user_id: str):
-    alert_data = request.get_json()
-    return enhanced_weather_alert(user_id, alert_data)
-
-@notifications_bp.route('/weather-alert/<user_id>', methods=['POST'])
+@admission(ROUTE_CLASS_ALERTS)
 def trigger_weather_alert(user_id: str):
     alert_data = request.get_json()
     
     # Mevcut hava durumu verilerini al
     weather_data = get_weather(get_location(user_id))
     
-    # Gelişmiş bildirim gönder
-    return send_enhanced_alert(
+    # Gelişmiş bildirim gönder (konum aynı istekte tekrar okunmaz)
+    notification_id = send_enhanced_alert(
         user_id=user_id,
         alert_type="weather_alert",
         original_data={
@@ -542,6 +631,11 @@ def trigger_weather_alert(user_id: str):
             "data": weather_data
         }
     )
+    if notification_id:
+        return jsonify({"id": notification_id}), 201
+    return jsonify({"error": "Bildirim oluşturulamadı"}), 500
+
+app.register_blueprint(notifications_bp)
 #NOTIFICATION.PY ENDPOINTS END
 
 #HEALTH.PY ENDPOINTS
@@ -586,33 +680,71 @@ def delete_contact(user_id, contact_id):
     """Acil durum kişisini silme"""
     return delete_emergency_contact(user_id, contact_id)
 
+def notify_emergency(user_id: str, incident: Incident):
+    """Olay başına bir kez: acil durum kişilerine SMS + kafe önerili bildirim"""
+    send_emergency_sms(user_id, "Acil durum tespit edildi!")
+    send_enhanced_alert(
+        user_id=user_id,
+        alert_type="health_emergency",
+        original_data={
+            "message": "Sağlık durumunuzda acil değişiklik tespit edildi!",
+            "data": incident.data
+        }
+    )
+
+def escalate_emergency(user_id: str, incident: Incident):
+    """Onaylanmayan olay için acil durum kişilerine tekrar SMS"""
+    send_emergency_sms(
+        user_id,
+        f"Acil durum hâlâ yanıtsız! (Seviye {incident.escalation_level}) Lütfen hemen iletişime geçin."
+    )
+
+incident_manager = IncidentManager(
+    detect=detect_emergency,
+    notify=notify_emergency,
+    escalate=escalate_emergency,
+    on_change=lambda incident: get_event_hub().publish(incident.user_id, "incident", incident.to_dict())
+)
+# Sürekli izleme: dedektörün acil durum geçişleri aynı olay akışından geçer
+init_emergency_monitor(app, incident_event_handler(incident_manager))
+
 @emergency_bp.route('/trigger/<user_id>', methods=['POST'])
+@admission(ROUTE_CLASS_EMERGENCY)
 def trigger_emergency_action(user_id):
-    """Acil durum tetikleme (Güncellenmiş)"""
-    is_emergency = check_emergency(user_id)
-    
-    if is_emergency:
-        # 1. Temel acil durum işlemleri
-        emergency_data = get_realtime_health_data(user_id)
-        send_emergency_sms(user_id, "Acil durum tespit edildi!")
-        
-        # 2. Kafe önerili bildirim
-        send_enhanced_alert(
-            user_id=user_id,
-            alert_type="health_emergency",
-            original_data={
-                "message": "Sağlık durumunuzda acil değişiklik tespit edildi!",
-                "data": emergency_data
-            }
-        )
-        
+    """Acil durum tetikleme (olay bazlı, tekrar eden istekler idempotent)"""
+    incident, created = incident_manager.trigger(user_id)
+
+    if incident:
         return jsonify({
             "success": True,
-            "message": "Acil durum prosedürleri başlatıldı"
+            "message": "Acil durum prosedürleri başlatıldı" if created else "Acil durum olayı zaten açık",
+            "incident": incident.to_dict()
         }), 200
-        
+
     return jsonify({"message": "Acil durum yok"}), 200
 
+@emergency_bp.route('/incidents/<user_id>', methods=['GET'])
+def get_incident(user_id):
+    """Kullanıcının güncel acil durum olayı"""
+    incident = incident_manager.current(user_id)
+    return jsonify({"incident": incident.to_dict() if incident else None}), 200
+
+@emergency_bp.route('/incidents/<user_id>/<incident_id>/ack', methods=['PUT'])
+def acknowledge_incident(user_id, incident_id):
+    """Olayı onayla (eskalasyonu durdurur)"""
+    incident = incident_manager.acknowledge(user_id, incident_id)
+    if not incident:
+        return jsonify({"error": "Açık olay bulunamadı"}), 404
+    return jsonify({"incident": incident.to_dict()}), 200
+
+@emergency_bp.route('/incidents/<user_id>/<incident_id>/resolve', methods=['PUT'])
+def resolve_incident(user_id, incident_id):
+    """Olayı kapat"""
+    incident = incident_manager.resolve(user_id, incident_id)
+    if not incident:
+        return jsonify({"error": "Açık olay bulunamadı"}), 404
+    return jsonify({"incident": incident.to_dict()}), 200
+
 # Acil Durum Yönetimi
 
 @emergency_bp.route('/check/<user_id>', methods=['GET'])
@@ -621,14 +753,16 @@ def check_emergency_status(user_id):
     is_emergency = check_emergency(user_id)
     return jsonify({"emergency": is_emergency}), 200
 
-@emergency_bp.route('/trigger/<user_id>', methods=['POST'])
-def trigger_emergency_action(user_id):
-    """Acil durum tetikleme ve SMS gönderme"""
-    return trigger_emergency(user_id)
+app.register_blueprint(health_bp)
+app.register_blueprint(emergency_bp)
+app.register_blueprint(admin_bp)
+app.register_blueprint(export_bp)
+app.register_blueprint(events_bp)
 #HEALTH.PY ENDPOINTS END
 
 #CAFE RECOMMENDATION SERVICE ENDPOINTS
 @app.route("/cafes/nearest", methods=["GET"])
+@admission(ROUTE_CLASS_CAFES)
 def get_nearest_cafes():
     lat = request.args.get("lat")
     lon = request.args.get("lon")
@@ -638,11 +772,12 @@ def get_nearest_cafes():
 
     try:
         result = CafeRecommendationService.find_nearest_cafes(lat, lon)
-        return jsonify(result), 200
+        return respond(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
 @app.route("/cafes/distance", methods=["GET"])
+@admission(ROUTE_CLASS_CAFES)
 def get_distance():
     try:
         lat1 = float(request.args.get("lat1"))
@@ -656,6 +791,7 @@ def get_distance():
     return jsonify({"distance_meters": round(distance, 2)}), 200
 
 @app.route("/cafes/top5", methods=["GET"])
+@admission(ROUTE_CLASS_CAFES)
 def get_top5_cafes():
     lat = 39.96939957261083 #request.args.get("lat") 
     lon =  32.744049317303556 #request.args.get("lon")
@@ -665,7 +801,7 @@ def get_top5_cafes():
 
     try:
         result = CafeRecommendationService.find_top5_cafes(lat, lon)
-        return jsonify(result), 200
+        return respond(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 #CAFE RECOMMENDATION SERVICE ENDPOINTS END 
@@ -684,5 +820,7 @@ def get_announcements():
 
 #BELEDİYE ENDPOINT END
 
+# Geliştirme sunucusu; production için: gunicorn -c gunicorn.conf.py
 if __name__ == '__main__':
+    start_jobs()
     app.run(host='0.0.0.0', port=8080, debug=False)
\ No newline at end of file
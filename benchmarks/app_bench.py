@@ -0,0 +1,246 @@
+"""
+app.py'deki tüm Flask route'larını sahte upstream'ler üzerinde eşzamanlı yük altında çalıştırır.
+
+Endpoint başına p50/p95/p99 gecikme, throughput, durum kodları ve upstream çağrı
+sayıları hesaplanır; sonuç JSON olarak kaydedilir.
+
+Kullanım:
+    python -m benchmarks.app_bench --requests 200 --concurrency 16 --latency 0.05
+    python -m benchmarks.app_bench --compare benchmarks/results/a.json benchmarks/results/b.json
+"""
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import requests
+from werkzeug.serving import make_server
+
+from benchmarks.fake_upstreams import OfflineEnvironment
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+USER_COUNT = 50
+
+
+def seed_data(users: int = USER_COUNT) -> dict:
+    data = {"users": {}, "devices": {}, "notifications": {}}
+    for i in range(users):
+        uid = f"user{i}"
+        data["users"][uid] = {
+            "email": f"{uid}@example.com",
+            "location": f"{39.90 + i * 0.001:.4f},{32.80 + i * 0.001:.4f}",
+            "notification_time": "08:00",
+            "health_info": {"blood_type": "A+", "height": 175, "weight": 70, "allergies": []},
+            "emergency_contacts": {
+                "c1": {"name": "Ayşe", "phone": "0532 000 00 01", "relationship": "anne"},
+                "c2": {"name": "Mehmet", "phone": "+905320000002", "relationship": "baba"},
+            },
+        }
+        data["devices"][uid] = {"d1": {"token": f"token-{uid}", "platform": "android"}}
+        data["notifications"][uid] = {
+            f"n{j:03d}": {"type": "enhanced_weather_alert" if j % 3 == 0 else "general",
+                          "message": f"Bildirim {j}", "timestamp": f"2025-01-01T08:{j % 60:02d}:00",
+                          "read": False, "metadata": {}}
+            for j in range(20)
+        }
+    return data
+
+
+class Scenario:
+    def __init__(self, name: str, method: str, path: Callable[[int], str],
+                 body: Optional[Callable[[int], dict]] = None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.body = body
+
+
+def uid(i: int) -> str:
+    return f"user{i % USER_COUNT}"
+
+
+SCENARIOS: List[Scenario] = [
+    Scenario("home", "GET", lambda i: "/"),
+    Scenario("api_test", "GET", lambda i: "/api/test"),
+    Scenario("register_device", "POST", lambda i: "/register-device",
+             lambda i: {"user_id": uid(i), "token": f"bench-token-{i}"}),
+    Scenario("set_location", "POST", lambda i: "/set_location",
+             lambda i: {"user_id": uid(i), "location": f"{39.9 + i * 1e-5:.5f},32.80000"}),
+    Scenario("weather_weekly", "GET", lambda i: f"/weather/weekly/{uid(i)}"),
+    Scenario("weather_current", "GET", lambda i: f"/weather/current/{uid(i)}"),
+    Scenario("weather_batch", "POST", lambda i: "/weather/batch",
+             lambda i: {"user_ids": [uid(i * 25 + k) for k in range(25)]}),
+    Scenario("weather_alerts", "GET", lambda i: f"/weather/alerts/{uid(i)}"),
+    Scenario("weather_daily", "GET", lambda i: f"/weather/daily/{uid(i)}"),
+    Scenario("notification_create", "POST", lambda i: f"/api/notifications/{uid(i)}",
+             lambda i: {"type": "general", "message": f"Bench {i}"}),
+    Scenario("notification_list", "GET", lambda i: f"/api/notifications/{uid(i)}?limit=20"),
+    Scenario("notification_read", "PUT", lambda i: f"/api/notifications/{uid(i)}/n{i % 20:03d}/read"),
+    Scenario("notification_device", "POST", lambda i: f"/api/notifications/devices/{uid(i)}",
+             lambda i: {"token": f"bench-token-{i}"}),
+    Scenario("notification_push_test", "POST", lambda i: f"/api/notifications/push/test/{uid(i)}",
+             lambda i: {"title": "Bench", "body": "Test"}),
+    Scenario("analyzed_alerts", "GET", lambda i: f"/api/notifications/analyzed-alerts/{uid(i)}"),
+    Scenario("municipality_alerts", "POST", lambda i: f"/api/notifications/municipality-alerts/{uid(i)}",
+             lambda i: {}),
+    Scenario("weather_alert", "POST", lambda i: f"/api/notifications/weather-alert/{uid(i)}",
+             lambda i: {"message": "Sıcaklık 6°C düştü!"}),
+    Scenario("notification_delete", "DELETE", lambda i: f"/api/notifications/{uid(i)}/n{(i * 7) % 20:03d}"),
+    Scenario("health_save", "POST", lambda i: f"/api/health/{uid(i)}",
+             lambda i: {"blood_type": "0+", "height": 170, "weight": 65}),
+    Scenario("health_get", "GET", lambda i: f"/api/health/{uid(i)}"),
+    Scenario("health_realtime", "GET", lambda i: f"/api/health/realtime/{uid(i)}"),
+    Scenario("emergency_contact_add", "POST", lambda i: f"/api/emergency/contacts/{uid(i)}",
+             lambda i: {"name": "Bench", "phone": f"0555 000 {i % 100:02d} 00", "relationship": "arkadaş"}),
+    Scenario("emergency_contacts", "GET", lambda i: f"/api/emergency/contacts/{uid(i)}"),
+    Scenario("emergency_check", "GET", lambda i: f"/api/emergency/check/{uid(i)}"),
+    Scenario("emergency_trigger", "POST", lambda i: f"/api/emergency/trigger/{uid(i)}", lambda i: {}),
+    Scenario("emergency_incident", "GET", lambda i: f"/api/emergency/incidents/{uid(i)}"),
+    Scenario("cafes_nearest", "GET", lambda i: f"/cafes/nearest?lat={39.9 + (i % 10) * 0.01}&lon=32.8"),
+    Scenario("cafes_distance", "GET", lambda i: "/cafes/distance?lat1=39.9&lon1=32.8&lat2=41.0&lon2=29.0"),
+    Scenario("cafes_top5", "GET", lambda i: "/cafes/top5"),
+    Scenario("municipality_announcements", "GET", lambda i: "/api/municipality-announcements?city=ankara"),
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_scenario(base_url: str, scenario: Scenario, count: int, concurrency: int,
+                 env: Optional[OfflineEnvironment] = None) -> dict:
+    """`env` verilmezse (ör. sunucu ayrı süreçteyse) upstream çağrı sayıları raporlanmaz."""
+    local = threading.local()
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def one(i: int):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        body = scenario.body(i) if scenario.body else None
+        started = time.perf_counter()
+        try:
+            response = session.request(scenario.method, base_url + scenario.path(i), json=body, timeout=60)
+            status = response.status_code
+        except requests.exceptions.RequestException:
+            status = "error"
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            statuses[str(status)] += 1
+
+    before = env.call_counts() if env else {}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(count)))
+    wall = time.perf_counter() - started
+    after = env.call_counts() if env else {}
+
+    return {
+        "requests": count,
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(count / wall, 1) if wall else 0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "mean": round(statistics.mean(latencies) * 1000, 2) if latencies else 0,
+        },
+        "status": dict(statuses),
+        "upstream_calls": {name: after[name] - before[name] for name in after if after[name] != before[name]},
+        "upstream_calls_per_request": {
+            name: round((after[name] - before[name]) / count, 2) for name in after if after[name] != before[name]
+        },
+    }
+
+
+def run(requests_per_endpoint: int, concurrency: int, latency: float, error_rate: float,
+        db_latency: float, only: Optional[List[str]], output: Optional[str]) -> dict:
+    with OfflineEnvironment(latency=latency, error_rate=error_rate, db_latency=db_latency) as env:
+        env.seed(seed_data())
+        import app as app_module
+        env.attach_app(app_module)
+
+        server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+
+        results = {}
+        try:
+            for scenario in SCENARIOS:
+                if only and scenario.name not in only:
+                    continue
+                results[scenario.name] = run_scenario(base_url, scenario, requests_per_endpoint, concurrency, env)
+                summary = results[scenario.name]
+                print(f"{scenario.name:28s} p50={summary['latency_ms']['p50']:8.1f}ms "
+                      f"p99={summary['latency_ms']['p99']:8.1f}ms "
+                      f"{summary['throughput_rps']:8.1f} rps  {summary['status']}  "
+                      f"{summary['upstream_calls_per_request']}")
+        finally:
+            server.shutdown()
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "config": {
+            "requests_per_endpoint": requests_per_endpoint,
+            "concurrency": concurrency,
+            "upstream_latency": latency,
+            "error_rate": error_rate,
+            "db_latency": db_latency,
+        },
+        "endpoints": results,
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"app_bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+    print(f"Sonuçlar kaydedildi: {output}")
+    return report
+
+
+def compare(old_path: str, new_path: str):
+    with open(old_path, encoding="utf-8") as file:
+        old = json.load(file)["endpoints"]
+    with open(new_path, encoding="utf-8") as file:
+        new = json.load(file)["endpoints"]
+
+    print(f"{'endpoint':28s} {'p50 (ms)':>20s} {'p99 (ms)':>20s} {'rps':>18s}")
+    for name in sorted(set(old) & set(new)):
+        o, n = old[name], new[name]
+        print(f"{name:28s} "
+              f"{o['latency_ms']['p50']:8.1f} -> {n['latency_ms']['p50']:8.1f} "
+              f"{o['latency_ms']['p99']:8.1f} -> {n['latency_ms']['p99']:8.1f} "
+              f"{o['throughput_rps']:7.1f} -> {n['throughput_rps']:7.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Uygulama geneli offline benchmark")
+    parser.add_argument("--requests", type=int, default=100, help="Endpoint başına istek sayısı")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="Upstream gecikmesi (sn)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--db-latency", type=float, default=0.005, help="Realtime Database gecikmesi (sn)")
+    parser.add_argument("--only", nargs="*", help="Sadece bu senaryoları çalıştır")
+    parser.add_argument("--output", help="Sonuç JSON dosyası")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        run(args.requests, args.concurrency, args.latency, args.error_rate, args.db_latency, args.only, args.output)
@@ -0,0 +1,112 @@
+"""
+Kimlik doğrulama middleware'inin istek başına maliyeti (soğuk / sıcak önbellek).
+
+Yerel bir RSA anahtarı ve sertifikası ile Firebase formatında token üretilir,
+ağ çağrısı yapılmaz.
+
+Kullanım:
+    python -m benchmarks.auth_bench --requests 5000
+"""
+import argparse
+import datetime
+import time
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from flask import Flask, g, jsonify
+from google.auth import crypt
+from google.auth import jwt as google_jwt
+from werkzeug.test import Client
+
+from routes.auth_middleware import ID_TOKEN_ISSUER_PREFIX, PublicKeyCache, TokenVerifier
+import routes.auth_middleware as auth_middleware
+
+PROJECT_ID = "cman-bench"
+KEY_ID = "bench-key"
+
+
+def make_signing_key():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "bench")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(1)
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    pem_key = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                serialization.NoEncryption())
+    signer = crypt.RSASigner.from_string(pem_key, key_id=KEY_ID)
+    return signer, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+def make_token(signer, uid: str) -> str:
+    now = int(time.time())
+    payload = {
+        "iss": ID_TOKEN_ISSUER_PREFIX + PROJECT_ID,
+        "aud": PROJECT_ID,
+        "sub": uid,
+        "iat": now,
+        "exp": now + 3600,
+        "auth_time": now,
+    }
+    return google_jwt.encode(signer, payload).decode()
+
+
+def build_app():
+    app = Flask(__name__)
+    app.before_request(auth_middleware.authenticate_request)
+
+    @app.route("/whoami")
+    def whoami():
+        return jsonify({"uid": g.uid})
+
+    return app
+
+
+def timed(func, count: int) -> float:
+    started = time.perf_counter()
+    for i in range(count):
+        func(i)
+    return (time.perf_counter() - started) / count
+
+
+def run(count: int, users: int):
+    signer, cert = make_signing_key()
+    keys = PublicKeyCache()
+    keys.set_certs({KEY_ID: cert})
+    verifier = TokenVerifier(keys=keys, project_id=PROJECT_ID)
+    auth_middleware.verifier = verifier
+
+    tokens = [make_token(signer, f"user{i}") for i in range(users)]
+
+    # Soğuk: her token ilk kez görülüyor (imza doğrulaması)
+    cold = timed(lambda i: verifier.verify(tokens[i]), users)
+    # Sıcak: aynı token'lar önbellekten
+    warm = timed(lambda i: verifier.verify(tokens[i % users]), count)
+
+    client = Client(build_app())
+    headers = [{"Authorization": f"Bearer {t}"} for t in tokens]
+    no_auth = timed(lambda i: client.get("/whoami"), count)
+    with_auth = timed(lambda i: client.get("/whoami", headers=headers[i % users]), count)
+
+    print(f"Soğuk doğrulama      : {cold * 1e6:8.1f} µs/token")
+    print(f"Sıcak önbellek       : {warm * 1e6:8.1f} µs/token")
+    print(f"İstek (auth yok)     : {no_auth * 1e6:8.1f} µs")
+    print(f"İstek (sıcak auth)   : {with_auth * 1e6:8.1f} µs "
+          f"(+{(with_auth - no_auth) * 1e6:.1f} µs)")
+    print(f"Önbellek             : {verifier.stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Auth middleware microbenchmark")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=200)
+    args = parser.parse_args()
+    run(args.requests, args.users)
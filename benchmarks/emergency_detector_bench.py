@@ -0,0 +1,82 @@
+"""
+Acil durum dedektörü için sentetik yük testi.
+
+Kullanım:
+    python -m benchmarks.emergency_detector_bench --users 100000 --ticks 50
+"""
+import argparse
+import time
+
+import numpy as np
+
+from routes.emergency_detector import EmergencyDetector
+from routes.health import generate_synthetic_health_data
+
+
+def build_sample_pool(size: int):
+    """generate_synthetic_health_data çıktılarından vektörel örnek havuzu oluşturur."""
+    samples = [generate_synthetic_health_data() for _ in range(size)]
+    heart_rate = np.array([s["heart_rate"] for s in samples], dtype=np.float32)
+    steps = np.array([s["steps"] for s in samples], dtype=np.int32)
+    sleep = np.array([s["sleep_duration"] for s in samples], dtype=np.float32)
+    return heart_rate, steps, sleep
+
+
+def run(users: int, ticks: int, anomaly_rate: float, pool_size: int, seed: int):
+    rng = np.random.default_rng(seed)
+    pool_hr, pool_steps, pool_sleep = build_sample_pool(pool_size)
+
+    detector = EmergencyDetector(capacity=users)
+    user_ids = [f"user{i}" for i in range(users)]
+
+    started = time.perf_counter()
+    idx = detector.register(user_ids)
+    register_time = time.perf_counter() - started
+
+    # Anomali yaşayacak kullanıcılar tüm test boyunca sabit (süreklilik kuralı için)
+    anomalous = rng.random(users) < anomaly_rate
+    tick_times = []
+    raised = resolved = 0
+
+    for tick in range(ticks):
+        pick = rng.integers(0, pool_size, users)
+        heart_rate = pool_hr[pick].copy()
+        steps = pool_steps[pick]
+        sleep = pool_sleep[pick]
+        # Testin ikinci yarısında anomali grubunun nabzı yükselir, son çeyrekte normale döner
+        if ticks // 2 <= tick < (3 * ticks) // 4:
+            heart_rate[anomalous] = 140
+
+        started = time.perf_counter()
+        events = detector.update(idx, heart_rate, steps, sleep)
+        tick_times.append(time.perf_counter() - started)
+
+        raised += sum(1 for e in events if e["state"] == "emergency")
+        resolved += sum(1 for e in events if e["state"] == "resolved")
+
+    tick_times = np.array(tick_times)
+    state_bytes = sum(a.nbytes for a in (
+        detector.hr_mean, detector.hr_var, detector.samples, detector.breach_ticks,
+        detector.normal_ticks, detector.reasons, detector.active
+    ))
+
+    print(f"Kullanıcı sayısı     : {users}")
+    print(f"Kayıt süresi         : {register_time * 1000:.1f} ms")
+    print(f"Tick p50 / p99       : {np.percentile(tick_times, 50) * 1000:.2f} ms / "
+          f"{np.percentile(tick_times, 99) * 1000:.2f} ms")
+    print(f"Throughput           : {users / np.median(tick_times):,.0f} ölçüm/sn")
+    print(f"Durum belleği        : {state_bytes / users:.1f} byte/kullanıcı "
+          f"({state_bytes / 1024 / 1024:.2f} MB)")
+    print(f"Anomali grubundaki   : {int(anomalous.sum())} kullanıcı")
+    print(f"Açılan / kapanan olay: {raised} / {resolved}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EmergencyDetector yük testi")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--ticks", type=int, default=40)
+    parser.add_argument("--anomaly-rate", type=float, default=0.001)
+    parser.add_argument("--pool-size", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.users, args.ticks, args.anomaly_rate, args.pool_size, args.seed)
@@ -0,0 +1,199 @@
+"""
+firebase_admin.db için bellek içi Realtime Database taklidi.
+
+Kullanılan API yüzeyi: reference(path), get(etag, shallow), set, update (multi-path),
+transaction, push, delete, child, key ve order_by_child / order_by_key sorguları.
+"""
+import copy
+import hashlib
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+
+def _split(path: str):
+    return [part for part in (path or "").split("/") if part]
+
+
+class InMemoryDatabase:
+    def __init__(self, latency: float = 0.0, on_call: Optional[Callable[[str], None]] = None):
+        self.latency = latency
+        self.on_call = on_call
+        self.root = {}
+        self.calls = 0
+        self._lock = threading.RLock()
+        self._push_ids = itertools.count(1)
+
+    def reference(self, path: str = "/") -> "InMemoryReference":
+        return InMemoryReference(self, _split(path))
+
+    def _call(self, operation: str):
+        with self._lock:
+            self.calls += 1
+        if self.on_call:
+            self.on_call(operation)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _read(self, parts):
+        node = self.root
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return copy.deepcopy(node)
+
+    def _write(self, parts, value):
+        if not parts:
+            self.root = copy.deepcopy(value) if isinstance(value, dict) else {}
+            return
+        node = self.root
+        trail = []
+        for part in parts[:-1]:
+            child = node.get(part)
+            if not isinstance(child, dict):
+                child = node[part] = {}
+            trail.append((node, part))
+            node = child
+        if value is None:
+            node.pop(parts[-1], None)
+            # Boş kalan ara düğümler silinir (Firebase davranışı)
+            for parent, key in reversed(trail):
+                if parent[key]:
+                    break
+                del parent[key]
+        else:
+            node[parts[-1]] = copy.deepcopy(value)
+
+    def next_push_id(self) -> str:
+        # Zamana göre sıralanabilir anahtar (Firebase push id'lerine benzer)
+        return f"-N{int(time.time() * 1000):013d}{next(self._push_ids):08d}"
+
+
+class InMemoryReference:
+    def __init__(self, database: InMemoryDatabase, parts):
+        self._db = database
+        self._parts = list(parts)
+
+    @property
+    def key(self) -> Optional[str]:
+        return self._parts[-1] if self._parts else None
+
+    @property
+    def path(self) -> str:
+        return "/" + "/".join(self._parts)
+
+    def child(self, path: str) -> "InMemoryReference":
+        return InMemoryReference(self._db, self._parts + _split(path))
+
+    def get(self, etag: bool = False, shallow: bool = False):
+        self._db._call("get")
+        with self._db._lock:
+            value = self._db._read(self._parts)
+        if shallow and isinstance(value, dict):
+            value = {key: (True if isinstance(child, dict) else child) for key, child in value.items()}
+        if etag:
+            digest = hashlib.md5(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+            return value, digest
+        return value
+
+    def set(self, value):
+        self._db._call("set")
+        with self._db._lock:
+            self._db._write(self._parts, value)
+
+    def update(self, value: dict):
+        self._db._call("update")
+        with self._db._lock:
+            for path, child in value.items():
+                self._db._write(self._parts + _split(path), child)
+
+    def transaction(self, transaction_update: Callable):
+        """Firebase'deki gibi: fonksiyon güncel değeri alır, dönen değer yazılır ve döner."""
+        self._db._call("transaction")
+        with self._db._lock:
+            value = transaction_update(self._db._read(self._parts))
+            self._db._write(self._parts, value)
+            return copy.deepcopy(value)
+
+    def push(self, value=""):
+        self._db._call("push")
+        with self._db._lock:
+            ref = self.child(self._db.next_push_id())
+            if value != "":
+                self._db._write(ref._parts, value)
+        return ref
+
+    def delete(self):
+        self._db._call("delete")
+        with self._db._lock:
+            self._db._write(self._parts, None)
+
+    def order_by_child(self, path: str) -> "InMemoryQuery":
+        return InMemoryQuery(self, lambda item: _child_value(item[1], path))
+
+    def order_by_key(self) -> "InMemoryQuery":
+        return InMemoryQuery(self, lambda item: item[0])
+
+
+def _child_value(value, path: str):
+    for part in _split(path):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+class InMemoryQuery:
+    def __init__(self, ref: InMemoryReference, order_key):
+        self._ref = ref
+        self._order_key = order_key
+        self._start = self._end = self._equal = None
+        self._first = self._last = None
+
+    def start_at(self, value):
+        self._start = value
+        return self
+
+    def end_at(self, value):
+        self._end = value
+        return self
+
+    def equal_to(self, value):
+        self._equal = value
+        return self
+
+    def limit_to_first(self, count: int):
+        self._first = count
+        return self
+
+    def limit_to_last(self, count: int):
+        self._last = count
+        return self
+
+    def get(self):
+        self._ref._db._call("query")
+        with self._ref._db._lock:
+            value = self._ref._db._read(self._ref._parts)
+        if not isinstance(value, dict):
+            return OrderedDict()
+
+        def sort_key(item):
+            key = self._order_key(item)
+            return (key is None, str(type(key)), key if key is not None else "")
+
+        items = sorted(value.items(), key=sort_key)
+        if self._equal is not None:
+            items = [item for item in items if self._order_key(item) == self._equal]
+        if self._start is not None:
+            items = [item for item in items if self._order_key(item) is not None and self._order_key(item) >= self._start]
+        if self._end is not None:
+            items = [item for item in items if self._order_key(item) is not None and self._order_key(item) <= self._end]
+        if self._first is not None:
+            items = items[:self._first]
+        if self._last is not None:
+            items = items[-self._last:] if self._last else []
+        return OrderedDict(items)
@@ -0,0 +1,51 @@
+"""
+Twilio REST client'ının yerel taklidi: ağ çağrısı yapmadan gecikme ve hata üretir.
+"""
+import itertools
+import random
+import threading
+import time
+
+from twilio.base.exceptions import TwilioRestException
+
+
+class _FakeMessage:
+    def __init__(self, sid: str, to: str, body: str):
+        self.sid = sid
+        self.to = to
+        self.body = body
+        self.status = "queued"
+
+
+class _FakeMessages:
+    def __init__(self, client: "FakeTwilioClient"):
+        self._client = client
+
+    def create(self, body: str, from_: str = None, to: str = None, **kwargs):
+        return self._client._create(body, to)
+
+
+class FakeTwilioClient:
+    """`client.messages.create(...)` arayüzünü taklit eder."""
+
+    def __init__(self, latency: float = 0.2, error_rate: float = 0.0, seed: int = None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.messages = _FakeMessages(self)
+        self.sent = []
+        self.calls = 0
+        self._ids = itertools.count(1)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _create(self, body: str, to: str):
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.error_rate
+        time.sleep(self.latency)
+        if fail:
+            raise TwilioRestException(503, "/Messages.json", "Service Unavailable", method="POST")
+        message = _FakeMessage(f"SM{next(self._ids):032d}", to, body)
+        with self._lock:
+            self.sent.append(message)
+        return message
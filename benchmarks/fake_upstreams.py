@@ -0,0 +1,335 @@
+"""
+Tüm dış servisler için yerel sahte HTTP sunucuları ve bunları uygulamaya bağlayan ortam.
+
+Visual Crossing, Google Places, Nominatim, Fitbit, Twilio ve Google sertifika istekleri
+`requests` seviyesinde yerel sunuculara yönlendirilir. Gemini ve FCM istemcileri
+sahte sunuculara HTTP isteği atan ince sarmalayıcılarla değiştirilir. Firebase
+Realtime Database bellek içi taklitle (fake_db) değiştirilir.
+"""
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit, urlunsplit
+
+import aiohttp
+import requests
+
+from benchmarks.fake_db import InMemoryDatabase
+
+# Yönlendirilen host -> upstream adı
+UPSTREAM_HOSTS = {
+    "weather.visualcrossing.com": "visual_crossing",
+    "maps.googleapis.com": "places",
+    "nominatim.openstreetmap.org": "nominatim",
+    "api.fitbit.com": "fitbit",
+    "api.twilio.com": "twilio",
+    "www.googleapis.com": "google_certs",
+}
+
+Response = Tuple[int, Dict[str, str], bytes]
+
+
+def _json(payload, status: int = 200, headers: Dict[str, str] = None) -> Response:
+    return status, {"Content-Type": "application/json", **(headers or {})}, json.dumps(payload).encode()
+
+
+def visual_crossing_handler(method, path, query, body) -> Response:
+    base_epoch = int(time.time()) // 86400 * 86400
+    hours = [{
+        "datetimeEpoch": base_epoch + hour * 3600,
+        "temp": 10 + hour % 12,
+        "feelslike": 9 + hour % 12,
+        "humidity": 55,
+        "precip": 0.2 if hour in (14, 15) else 0,
+        "precipprob": 40 if hour in (14, 15) else 5,
+        "preciptype": ["rain"] if hour in (14, 15) else None,
+        "windspeed": 12.5,
+        "conditions": "Partially cloudy",
+    } for hour in range(24)]
+    days = [{
+        "datetime": time.strftime("%Y-%m-%d", time.gmtime(base_epoch + day * 86400)),
+        "tempmax": 18 + day,
+        "tempmin": 7 + day,
+        "precipprob": 20,
+        "conditions": "Clear",
+        "sunrise": "06:45:00",
+        "sunset": "18:20:00",
+        "hours": hours,
+    } for day in range(7)]
+    return _json({
+        "resolvedAddress": path.split("/")[5] if len(path.split("/")) > 5 else "",
+        "currentConditions": {
+            "temp": 14.2, "feelslike": 13.1, "humidity": 60, "windspeed": 10.4,
+            "precip": 0, "preciptype": None, "conditions": "Clear",
+        },
+        "days": days,
+    })
+
+
+def places_handler(method, path, query, body) -> Response:
+    lat, lon = (float(v) for v in query.get("location", ["39.9,32.8"])[0].split(","))
+    results = [{
+        "place_id": f"fake-place-{i}",
+        "name": f"Kahve Cafe {i}",
+        "types": ["cafe", "food"],
+        "vicinity": f"Sokak {i}",
+        "geometry": {"location": {"lat": lat + i * 0.001, "lng": lon + i * 0.001}},
+    } for i in range(8)]
+    return _json({"results": results, "status": "OK"})
+
+
+def nominatim_handler(method, path, query, body) -> Response:
+    return _json([{"lat": "39.93", "lon": "32.85", "display_name": query.get("q", [""])[0],
+                   "place_id": 1, "boundingbox": ["39.9", "40.0", "32.8", "32.9"]}])
+
+
+def fitbit_handler(method, path, query, body) -> Response:
+    if path.startswith("/oauth2/token"):
+        return _json({"access_token": "fake-access", "refresh_token": "fake-refresh", "expires_in": 28800})
+    return _json({"activities-heart": [{"dateTime": time.strftime("%Y-%m-%d"),
+                                        "value": {"restingHeartRate": 64}}]},
+                 headers={"ETag": '"fitbit-v1"'})
+
+
+def twilio_handler(method, path, query, body) -> Response:
+    return _json({"sid": f"SM{random.getrandbits(64):032x}", "status": "queued"}, status=201)
+
+
+def gemini_handler(method, path, query, body) -> Response:
+    return _json({"text": "Bu uyarı sahte Gemini yanıtıdır.\n1. Sıcak giyinin\n2. Şemsiye alın\n3. Su için"})
+
+
+def fcm_handler(method, path, query, body) -> Response:
+    tokens = json.loads(body or b"{}").get("tokens", [])
+    return _json({"success": len(tokens), "failure": 0})
+
+
+def google_certs_handler(method, path, query, body) -> Response:
+    return _json({}, headers={"Cache-Control": "public, max-age=3600"})
+
+
+HANDLERS: Dict[str, Callable] = {
+    "visual_crossing": visual_crossing_handler,
+    "places": places_handler,
+    "nominatim": nominatim_handler,
+    "fitbit": fitbit_handler,
+    "twilio": twilio_handler,
+    "gemini": gemini_handler,
+    "fcm": fcm_handler,
+    "google_certs": google_certs_handler,
+}
+
+
+class FakeUpstream:
+    """Tek bir upstream için gecikme ve hata enjeksiyonlu yerel HTTP sunucusu."""
+
+    def __init__(self, name: str, handler: Callable, latency: float = 0.05,
+                 jitter: float = 0.0, error_rate: float = 0.0):
+        self.name = name
+        self.handler = handler
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(name)
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _serve(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                status, headers, payload = upstream.serve(self.command, self.path, body)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PUT = do_DELETE = do_PATCH = _serve
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name=f"fake-{name}", daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def serve(self, method: str, raw_path: str, body: bytes) -> Response:
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.error_rate
+            delay = self.latency + self._random.uniform(0, self.jitter)
+        time.sleep(delay)
+        if fail:
+            with self._lock:
+                self.errors += 1
+            return _json({"error": "injected failure"}, status=503)
+        parts = urlsplit(raw_path)
+        return self.handler(method, parts.path, parse_qs(parts.query), body)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _FakeGeminiResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGeminiModel:
+    """`model.generate_content(prompt)` arayüzü; yanıtı sahte Gemini sunucusundan alır."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.session = requests.Session()
+
+    def generate_content(self, contents, **kwargs):
+        response = self.session.post(f"{self.url}/v1/generateContent", json={"contents": str(contents)}, timeout=30)
+        response.raise_for_status()
+        return _FakeGeminiResponse(response.json()["text"])
+
+
+class OfflineEnvironment:
+    """
+    Sahte sunucuları başlatır ve uygulamanın dış bağımlılıklarını onlara yönlendirir.
+
+        with OfflineEnvironment(latency=0.05) as env:
+            import app
+            env.attach_app(app)
+            ...
+            env.call_counts()
+    """
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, error_rate: float = 0.0,
+                 db_latency: float = 0.0, overrides: Optional[Dict[str, dict]] = None):
+        self.upstreams: Dict[str, FakeUpstream] = {}
+        for name, handler in HANDLERS.items():
+            options = {"latency": latency, "jitter": jitter, "error_rate": error_rate}
+            options.update((overrides or {}).get(name, {}))
+            self.upstreams[name] = FakeUpstream(name, handler, **options)
+        self.db_calls = Counter()
+        self._db_lock = threading.Lock()
+        self.database = InMemoryDatabase(latency=db_latency, on_call=self._count_db_call)
+        self._patches = []
+
+    def _count_db_call(self, operation: str):
+        with self._db_lock:
+            self.db_calls[operation] += 1
+
+    def _patch(self, target, name, value):
+        self._patches.append((target, name, getattr(target, name)))
+        setattr(target, name, value)
+
+    def __enter__(self):
+        for upstream in self.upstreams.values():
+            upstream.start()
+
+        targets = {host: self.upstreams[name].url for host, name in UPSTREAM_HOSTS.items()}
+        original_send = requests.Session.send
+
+        def send(session, request, **kwargs):
+            parts = urlsplit(request.url)
+            target = targets.get(parts.hostname)
+            if target:
+                local = urlsplit(target)
+                request.url = urlunsplit((local.scheme, local.netloc, parts.path, parts.query, parts.fragment))
+                kwargs.pop("verify", None)
+            return original_send(session, request, **kwargs)
+
+        self._patch(requests.Session, "send", send)
+
+        original_request = aiohttp.ClientSession._request
+
+        async def aiohttp_request(session, method, str_or_url, **kwargs):
+            parts = urlsplit(str(str_or_url))
+            target = targets.get(parts.hostname)
+            if target:
+                local = urlsplit(target)
+                str_or_url = urlunsplit((local.scheme, local.netloc, parts.path, parts.query, parts.fragment))
+                kwargs.pop("ssl", None)
+            return await original_request(session, method, str_or_url, **kwargs)
+
+        self._patch(aiohttp.ClientSession, "_request", aiohttp_request)
+
+        from firebase_admin import db, messaging
+        self._patch(db, "reference", self.database.reference)
+
+        fcm_url = self.upstreams["fcm"].url
+        fcm_session = requests.Session()
+
+        def send_multicast(message, dry_run=False, app=None):
+            response = fcm_session.post(f"{fcm_url}/v1/messages:send", json={"tokens": list(message.tokens)}, timeout=30)
+            response.raise_for_status()
+            result = response.json()
+            return messaging.BatchResponse(
+                [messaging.SendResponse({"name": "fake"}, None)] * result["success"]
+            )
+
+        self._patch(messaging, "send_multicast", send_multicast)
+
+        from routes import sms_dispatch
+        from twilio.rest import Client
+        sms_dispatch.set_twilio_client(Client("ACfake", "fake-token"))
+
+        # Sahte ortamda ID token üretilmez: kullanıcı route'ları token'sız çağrılır
+        from routes import auth_middleware
+        self._patch(auth_middleware, "ALLOW_ANONYMOUS", True)
+
+        # Sahte upstream'lerde gerçek kota yok; zamanlayıcı ölçümü bozmasın
+        from routes.quota_scheduler import UpstreamQuota, scheduler
+        self._saved_quotas = dict(scheduler.quotas)
+        for name in self._saved_quotas:
+            scheduler.register(UpstreamQuota(name, per_second=1e6, burst=1e6, daily_limit=None))
+
+        # Her çalıştırma boş bir paylaşımlı önbellekle başlar
+        from routes import cache_backend
+        self._cache_dir = tempfile.TemporaryDirectory(prefix="cman-bench-")
+        cache_backend.set_cache_backend(cache_backend.TieredCache(
+            cache_backend.MemoryCache(),
+            cache_backend.SqliteCache(os.path.join(self._cache_dir.name, "cache.sqlite3"))
+        ))
+        return self
+
+    def attach_app(self, app_module):
+        """Uygulama import edildikten sonra Gemini modelini sahte sunucuya bağlar."""
+        self._patch(app_module, "model", FakeGeminiModel(self.upstreams["gemini"].url))
+
+    def seed(self, data: dict):
+        self.database.reference("/").set(data)
+
+    def call_counts(self) -> Dict[str, int]:
+        counts = {name: upstream.calls for name, upstream in self.upstreams.items()}
+        with self._db_lock:
+            counts["firebase"] = sum(self.db_calls.values())
+        return counts
+
+    def __exit__(self, *exc):
+        for target, name, value in reversed(self._patches):
+            setattr(target, name, value)
+        self._patches = []
+        from routes import sms_dispatch
+        sms_dispatch.set_twilio_client(None)
+        self._cache_dir.cleanup()
+        from routes.quota_scheduler import scheduler
+        scheduler.quotas.update(self._saved_quotas)
+        for upstream in self.upstreams.values():
+            upstream.stop()
@@ -0,0 +1,158 @@
+"""
+Uygulamayı gerçek gunicorn worker'ları ile (sync / gthread / gevent) sahte upstream'ler
+üzerinde çalıştırır ve modları aynı yük altında karşılaştırır.
+
+Her mod ayrı bir alt süreçte başlatılır: alt süreç sahte sunucuları ve bellek içi
+veritabanını kurar, uygulamayı preload eder ve gunicorn'u gunicorn.conf.py ayarlarıyla
+çalıştırır. Worker'lar fork ile bu ortamı devralır.
+
+Kullanım:
+    python -m benchmarks.serving_bench --modes sync gthread --requests 200 --concurrency 32
+"""
+import argparse
+import json
+import os
+import runpy
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import requests
+
+from benchmarks.app_bench import RESULTS_DIR, SCENARIOS, run_scenario, seed_data
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SCENARIOS = ["weather_weekly", "weather_current", "notification_list", "health_get",
+                     "emergency_contacts", "cafes_nearest"]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve(mode: str, port: int, latency: float, workers: int = None):
+    """Alt süreç: offline ortamı kurar ve gunicorn'u ön planda çalıştırır."""
+    os.environ["GUNICORN_MODE"] = mode
+    from gunicorn.app.base import BaseApplication
+
+    from benchmarks.fake_upstreams import OfflineEnvironment
+
+    settings = runpy.run_path(os.path.join(ROOT, "gunicorn.conf.py"))
+
+    with OfflineEnvironment(latency=latency) as env:
+        env.seed(seed_data())
+        import app as app_module
+        env.attach_app(app_module)
+
+        class BenchApplication(BaseApplication):
+            def load_config(self):
+                for key, value in settings.items():
+                    if key in self.cfg.settings and value is not None:
+                        self.cfg.set(key, value)
+                self.cfg.set("bind", f"127.0.0.1:{port}")
+                self.cfg.set("accesslog", None)
+                self.cfg.set("preload_app", True)
+                self.cfg.set("graceful_timeout", 2)
+                if workers:
+                    self.cfg.set("workers", workers)
+
+            def load(self):
+                return app_module.app
+
+        BenchApplication().run()
+
+
+def _wait_ready(base_url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(base_url + "/api/test", timeout=1).status_code == 200:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Sunucu hazır olmadı: {base_url}")
+
+
+def bench_mode(mode: str, scenarios: List[str], count: int, concurrency: int,
+               latency: float, workers: int = None) -> Dict[str, dict]:
+    port = _free_port()
+    command = [sys.executable, "-m", "benchmarks.serving_bench", "--serve", mode,
+               "--port", str(port), "--latency", str(latency)]
+    if workers:
+        command += ["--workers", str(workers)]
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(base_url)
+        results = {}
+        for scenario in SCENARIOS:
+            if scenario.name not in scenarios:
+                continue
+            results[scenario.name] = run_scenario(base_url, scenario, count, concurrency)
+            summary = results[scenario.name]
+            print(f"[{mode:7s}] {scenario.name:24s} p50={summary['latency_ms']['p50']:8.1f}ms "
+                  f"p99={summary['latency_ms']['p99']:8.1f}ms {summary['throughput_rps']:8.1f} rps "
+                  f"{summary['status']}")
+        return results
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def run(modes: List[str], scenarios: List[str], count: int, concurrency: int,
+        latency: float, workers: int = None, output: str = None) -> dict:
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "config": {"requests_per_endpoint": count, "concurrency": concurrency,
+                   "upstream_latency": latency, "workers": workers, "cpu_count": os.cpu_count()},
+        "modes": {},
+    }
+    for mode in modes:
+        if mode == "gevent":
+            try:
+                import gevent  # noqa: F401
+            except ImportError:
+                print("[gevent ] atlandı: gevent kurulu değil")
+                continue
+        report["modes"][mode] = bench_mode(mode, scenarios, count, concurrency, latency, workers)
+
+    print(f"\n{'endpoint':24s}" + "".join(f"{mode + ' rps':>14s}" for mode in report["modes"]))
+    for name in scenarios:
+        row = [report["modes"][mode].get(name, {}).get("throughput_rps", 0) for mode in report["modes"]]
+        print(f"{name:24s}" + "".join(f"{value:14.1f}" for value in row))
+
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"serving_bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+    print(f"Sonuçlar kaydedildi: {output}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="gunicorn worker modları karşılaştırması")
+    parser.add_argument("--modes", nargs="*", default=["sync", "gthread", "gevent"])
+    parser.add_argument("--only", nargs="*", default=DEFAULT_SCENARIOS, help="Çalıştırılacak senaryolar")
+    parser.add_argument("--requests", type=int, default=200, help="Endpoint başına istek sayısı")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.05, help="Upstream gecikmesi (sn)")
+    parser.add_argument("--workers", type=int, help="Worker sayısını sabitle (varsayılan: CPU'ya göre)")
+    parser.add_argument("--output")
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.latency, args.workers)
+    else:
+        run(args.modes, args.only, args.requests, args.concurrency, args.latency, args.workers, args.output)
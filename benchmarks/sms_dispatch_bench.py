@@ -0,0 +1,61 @@
+"""
+Acil durum SMS fan-out'u: eski seri döngü ile SmsDispatcher karşılaştırması.
+
+Kullanım:
+    python -m benchmarks.sms_dispatch_bench --contacts 5 --latency 0.3
+"""
+import argparse
+import time
+
+from benchmarks.fake_twilio import FakeTwilioClient
+from routes.sms_dispatch import SmsDispatcher, set_twilio_client, unique_recipients
+
+
+def build_contacts(count: int) -> dict:
+    contacts = {f"c{i}": {"name": f"Kişi {i}", "phone": f"0532 000 00 {i:02d}"} for i in range(count)}
+    # Aynı kişinin farklı yazımı tekrar gönderilmemeli
+    contacts["dup"] = {"name": "Kişi 0", "phone": "+90 532 000 00 00"}
+    return contacts
+
+
+def serial_send(client, contacts: dict, body: str):
+    for contact in contacts.values():
+        client.messages.create(body=body, from_="+10000000000", to=contact["phone"])
+
+
+def run(contacts_count: int, latency: float, error_rate: float, rounds: int):
+    contacts = build_contacts(contacts_count)
+    body = "ACİL DURUM: benchmark"
+
+    client = FakeTwilioClient(latency=latency)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        serial_send(client, contacts, body)
+    serial = (time.perf_counter() - started) / rounds
+    serial_calls = client.calls
+
+    client = FakeTwilioClient(latency=latency, error_rate=error_rate, seed=1)
+    set_twilio_client(client)
+    dispatcher = SmsDispatcher(from_number="+10000000000", backoff=0.05)
+    started = time.perf_counter()
+    results = []
+    for _ in range(rounds):
+        results = dispatcher.send_bulk(unique_recipients(contacts), body)
+    concurrent = (time.perf_counter() - started) / rounds
+
+    print(f"Kişi sayısı (tekrar dahil): {len(contacts)}")
+    print(f"Seri döngü        : {serial * 1000:.0f} ms/olay, {serial_calls // rounds} çağrı")
+    print(f"SmsDispatcher     : {concurrent * 1000:.0f} ms/olay, {client.calls // rounds} çağrı")
+    print(f"Son tur sonuçları : {sum(r['status'] == 'sent' for r in results)} gönderildi, "
+          f"{sum(r['status'] != 'sent' for r in results)} başarısız, "
+          f"{sum(r['attempts'] for r in results)} deneme")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SMS fan-out benchmark")
+    parser.add_argument("--contacts", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    run(args.contacts, args.latency, args.error_rate, args.rounds)
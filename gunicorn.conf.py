@@ -0,0 +1,64 @@
+"""
+gunicorn yapılandırması:  gunicorn -c gunicorn.conf.py
+
+İstek süresinin çoğu Visual Crossing, Places, Gemini ve Firebase beklemesiyle
+geçtiği için varsayılan mod `gthread`tir: az sayıda süreç, süreç başına çok thread.
+
+Ortam değişkenleri:
+    GUNICORN_MODE     sync | gthread (varsayılan) | gevent  (gevent ayrıca `pip install gevent` ister)
+    WEB_CONCURRENCY   worker süreç sayısı (varsayılan CPU sayısına göre)
+    GUNICORN_THREADS  gthread modunda worker başına thread (varsayılan 8)
+    PORT              dinlenecek port (varsayılan 8080)
+"""
+import multiprocessing
+import os
+
+# grpc (Firestore client'ı) master süreçte yüklendiği için fork desteği açılmalı;
+# uygulama import edilmeden önce ayarlanmalı
+os.environ.setdefault("GRPC_ENABLE_FORK_SUPPORT", "1")
+
+MODE = os.getenv("GUNICORN_MODE", "gthread")
+CPU_COUNT = multiprocessing.cpu_count()
+
+wsgi_app = "wsgi:application"
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+
+if MODE == "sync":
+    worker_class = "sync"
+    workers = CPU_COUNT * 2 + 1
+    threads = 1
+elif MODE == "gevent":
+    worker_class = "gevent"
+    workers = CPU_COUNT
+    worker_connections = 256
+else:
+    worker_class = "gthread"
+    workers = CPU_COUNT + 1
+    threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+workers = int(os.getenv("WEB_CONCURRENCY", workers))
+
+# Uygulama master'da bir kez yüklenir, worker'lar fork ile kopyalanır (copy-on-write).
+# gevent monkey-patch'i worker içinde yapıldığı için o modda preload kapalıdır.
+preload_app = MODE != "gevent"
+
+timeout = 60                 # Belediye uyarıları birden fazla Gemini çağrısı yapabilir
+graceful_timeout = 30
+keepalive = 5
+max_requests = 5000          # Bellek sızıntılarına karşı worker'ları ara sıra yenile
+max_requests_jitter = 500
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+
+def post_worker_init(worker):
+    from wsgi import warm_up
+    warm_up()
+
+
+def worker_exit(server, worker):
+    # Yazma tamponundaki son konumlar worker kapanmadan (max_requests yenilemesi dahil) kaydedilsin
+    from routes.location_buffer import get_location_buffer
+    get_location_buffer().flush(force=True)
@@ -1,16 +1,16 @@
 from firebase_admin import messaging
 from firebase_admin.exceptions import FirebaseError
-from firebase_admin import db
 from datetime import datetime
 from typing import Dict, List, Optional
 import logging
+from models.repository import DeviceRepository, NotificationRepository, hooks
 
 logger = logging.getLogger(__name__)
 
 class Notification:
     def __init__(self, user_id: str):
         self.user_id = user_id
-        self.ref = db.reference(f'/notifications/{user_id}')
+        self.repo = NotificationRepository()
 
     def create(self, notification_type: str, message: str, metadata: dict = None) -> str:
         """Yeni bildirim oluştur ve Firebase'e kaydet"""
@@ -22,7 +22,7 @@ class Notification:
                 "read": False,
                 "metadata": metadata or {}
             }
-            return self.ref.push(new_notification).key
+            return self.repo.create(self.user_id, new_notification)
         except Exception as e:
             logger.error(f"Bildirim oluşturma hatası: {str(e)}")
             return None
@@ -30,7 +30,7 @@ class Notification:
     def mark_as_read(self, notification_id: str) -> bool:
         """Bildirimi okundu olarak işaretle"""
         try:
-            self.ref.child(notification_id).update({"read": True})
+            self.repo.mark_as_read(self.user_id, notification_id)
             return True
         except Exception as e:
             logger.error(f"Okunma durumu güncelleme hatası: {str(e)}")
@@ -39,7 +39,7 @@ class Notification:
     def get_all(self, limit: int = 100) -> list:
         """Kullanıcının tüm bildirimlerini getir"""
         try:
-            return list(self.ref.order_by_child('timestamp').limit_to_last(limit).get().values())
+            return self.repo.latest(self.user_id, limit)
         except Exception as e:
             logger.error(f"Bildirim çekme hatası: {str(e)}")
             return []
@@ -47,16 +47,12 @@ class Notification:
 class FCMManager:
     def __init__(self, user_id: str):
         self.user_id = user_id
-        self.devices_ref = db.reference(f'/devices/{user_id}')
+        self.devices = DeviceRepository()
 
     def register_device(self, token: str) -> bool:
         """Yeni cihaz token'ını kaydet"""
         try:
-            self.devices_ref.push().set({
-                'token': token,
-                'platform': 'android',  # veya ios/web
-                'created_at': datetime.now().isoformat()
-            })
+            self.devices.register(self.user_id, token, platform='android')  # veya ios/web
             return True
         except Exception as e:
             logger.error(f"Cihaz kayıt hatası: {str(e)}")
@@ -65,8 +61,7 @@ class FCMManager:
     def send_push_notification(self, title: str, body: str, data: dict = None) -> dict:
         """FCM üzerinden push bildirim gönder"""
         try:
-            devices = self.devices_ref.get()
-            tokens = [device['token'] for device in devices.values() if 'token' in device]
+            tokens = self.devices.tokens(self.user_id)
 
             if not tokens:
                 return {'success': 0, 'failure': 0}
@@ -77,7 +72,8 @@ class FCMManager:
                 tokens=tokens
             )
 
-            response = messaging.send_multicast(message)
+            with hooks.track_upstream("fcm", "send_multicast"):
+                response = messaging.send_multicast(message)
             return {'success': response.success_count, 'failure': response.failure_count}
         except FirebaseError as e:
             logger.error(f"FCM hatası: {str(e)}")
@@ -86,6 +82,28 @@ class FCMManager:
             logger.error(f"Genel bildirim hatası: {str(e)}")
             return {'error': 'Internal server error'}
 
+FCM_MULTICAST_LIMIT = 500   # send_multicast başına en fazla token
+
+
+def send_bulk_push(tokens: List[str], title: str, body: str, data: dict = None) -> dict:
+    """Aynı bildirimi çok sayıda cihaza 500'lük multicast'ler halinde gönderir."""
+    result = {'success': 0, 'failure': 0}
+    for start in range(0, len(tokens), FCM_MULTICAST_LIMIT):
+        message = messaging.MulticastMessage(
+            notification=messaging.Notification(title=title, body=body),
+            data=data or {},
+            tokens=tokens[start:start + FCM_MULTICAST_LIMIT]
+        )
+        try:
+            with hooks.track_upstream("fcm", "send_multicast"):
+                response = messaging.send_multicast(message)
+            result['success'] += response.success_count
+            result['failure'] += response.failure_count
+        except FirebaseError as e:
+            logger.error(f"FCM hatası: {str(e)}")
+            result['failure'] += len(message.tokens)
+    return result
+
 def send_weather_alert(user_id: str, alert_data: Dict):
     """Hem DB'ye kaydet hem push gönder"""
     try:
@@ -103,7 +121,7 @@ def send_weather_alert(user_id: str, alert_data: Dict):
             data={
                 'type': 'weather_alert',
                 'notification_id': notification_id,
-                'deep_link': f"app://weather/alerts/{alert_data['alert_id']}"
+                'deep_link': f"app://weather/alerts/{alert_data.get('alert_id', notification_id)}"
             }
         )
 
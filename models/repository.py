@@ -0,0 +1,394 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from firebase_admin import db
+from flask import g, has_request_context
+
+logger = logging.getLogger(__name__)
+
+DB_READ_WORKERS = 8
+_MISSING = object()
+_read_pool = ThreadPoolExecutor(max_workers=DB_READ_WORKERS, thread_name_prefix="db-read")
+
+
+class RepositoryHooks:
+    """
+    Veri katmanının dışarıya bağımlı davranışları (metrik, iz, canlı olay, konum tamponu).
+    models paketi routes'u import etmez; uygulama bunları init_repository(app, ...) ile
+    bağlar. Bağlanmayan kancalar etkisizdir (script'ler ve testler).
+    """
+    record_cache: Callable[[str, bool], None] = staticmethod(lambda cache, hit: None)
+    track_upstream: Callable[..., Any] = staticmethod(lambda upstream, operation="request", **attrs: nullcontext())
+    submit: Callable[..., Any] = staticmethod(lambda executor, fn, *args, **kwargs: executor.submit(fn, *args, **kwargs))
+    publish: Callable[[str, str, dict], Any] = staticmethod(lambda topic, event_type, data: None)
+    # Henüz veritabanına yazılmamış son konum (routes/location_buffer.py)
+    pending_location: Callable[[str], Optional[str]] = staticmethod(lambda user_id: None)
+
+    def configure(self, **hooks):
+        for name, hook in hooks.items():
+            if not hasattr(RepositoryHooks, name):
+                raise TypeError(f"Bilinmeyen kanca: {name}")
+            setattr(self, name, hook)
+
+
+hooks = RepositoryHooks()
+
+
+class RequestScope:
+    """
+    Bir istek boyunca yapılan Realtime Database okumalarını not eder (memoization)
+    ve sunucuya yapılan gidiş-dönüş sayısını tutar.
+    """
+
+    def __init__(self, memoize: bool = True):
+        self.memoize = memoize
+        self.round_trips = 0
+        self.memo_hits = 0
+        self._memo: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, key: tuple):
+        if not self.memoize:
+            return _MISSING
+        with self._lock:
+            value = self._memo.get(key, _MISSING)
+            if value is not _MISSING:
+                self.memo_hits += 1
+            return value
+
+    def store(self, key: tuple, value):
+        with self._lock:
+            if self.memoize:
+                self._memo[key] = value
+
+    def count_round_trip(self):
+        with self._lock:
+            self.round_trips += 1
+
+    def invalidate(self, path: str):
+        """Yazılan yolun kendisini, üst ve alt düğümlerini önbellekten çıkarır."""
+        path = _normalize(path)
+        with self._lock:
+            for key in list(self._memo):
+                cached = key[0]
+                if cached == path or cached.startswith(path + "/") or path.startswith(cached + "/") or cached == "":
+                    del self._memo[key]
+
+
+_thread_scope = threading.local()
+
+
+def _normalize(path: str) -> str:
+    return "/".join(part for part in path.split("/") if part)
+
+
+def current_scope() -> RequestScope:
+    """İstek içindeyse isteğe ait scope, değilse (ör. arka plan işleri) thread'e ait scope."""
+    if has_request_context():
+        scope = getattr(g, "_db_scope", None)
+        if scope is None:
+            scope = g._db_scope = RequestScope()
+        return scope
+    scope = getattr(_thread_scope, "scope", None)
+    if scope is None:
+        # İstek dışında memoization kapalı: uzun yaşayan thread'ler bayat veri görmesin
+        scope = _thread_scope.scope = RequestScope(memoize=False)
+    return scope
+
+
+class db_scope:
+    """İstek dışında (test, script, arka plan işi) memoization ve sayaç için bağlam."""
+
+    def __enter__(self) -> RequestScope:
+        self._previous = getattr(_thread_scope, "scope", None)
+        _thread_scope.scope = RequestScope()
+        return _thread_scope.scope
+
+    def __exit__(self, *exc):
+        _thread_scope.scope = self._previous
+
+
+class Repository:
+    def __init__(self, scope: RequestScope = None):
+        self._scope = scope
+
+    @property
+    def scope(self) -> RequestScope:
+        return self._scope or current_scope()
+
+    def _get(self, path: str, shallow: bool = False):
+        key = (_normalize(path), shallow)
+        scope = self.scope
+        value = scope.lookup(key)
+        hooks.record_cache("db_request_memo", value is not _MISSING)
+        if value is not _MISSING:
+            return value
+        scope.count_round_trip()
+        with hooks.track_upstream("firebase", "get", path=path):
+            value = db.reference(path).get(shallow=shallow)
+        scope.store(key, value)
+        return value
+
+    def get_many(self, paths: Iterable[str]) -> Dict[str, Any]:
+        """Birbirinden bağımsız okumaları paralel yapar."""
+        paths = list(dict.fromkeys(paths))
+        scope = self.scope
+        if len(paths) <= 1:
+            return {path: self._get(path) for path in paths}
+        futures = {path: hooks.submit(_read_pool, Repository(scope)._get, path) for path in paths}
+        return {path: future.result() for path, future in futures.items()}
+
+    def _exists(self, path: str) -> bool:
+        """Sadece anahtarları çeken shallow okuma ile varlık kontrolü."""
+        return self._get(path, shallow=True) is not None
+
+    def _count(self, path: str) -> int:
+        """Alt düğüm sayısı (shallow okuma, içerik indirilmez)."""
+        value = self._get(path, shallow=True)
+        return len(value) if isinstance(value, dict) else 0
+
+    def _page(self, path: str, start_after: Optional[str], limit: int) -> Dict[str, Any]:
+        """
+        Anahtar sırasıyla `start_after`'dan sonraki en fazla `limit` çocuk (imleçli sayfalama).
+        Sayfalar isteğin memo'suna yazılmaz; büyük listeler bellekte birikmez.
+        """
+        self.scope.count_round_trip()
+        query = db.reference(path).order_by_key()
+        if start_after is not None:
+            query = query.start_at(start_after)
+        with hooks.track_upstream("firebase", "query", path=path):
+            result = query.limit_to_first(limit + (start_after is not None)).get() or {}
+        return {key: value for key, value in result.items() if key != start_after}
+
+    def _set(self, path: str, value):
+        self.scope.count_round_trip()
+        with hooks.track_upstream("firebase", "set", path=path):
+            db.reference(path).set(value)
+        self.scope.invalidate(path)
+
+    def _update(self, path: str, value: dict):
+        self.scope.count_round_trip()
+        with hooks.track_upstream("firebase", "update", path=path):
+            db.reference(path).update(value)
+        self.scope.invalidate(path)
+
+    def _transaction(self, path: str, update: Callable[[Any], Any]):
+        """Firebase transaction: `update` güncel değeri alır, döndürdüğü değer yazılır (çakışmada tekrar)."""
+        self.scope.count_round_trip()
+        with hooks.track_upstream("firebase", "transaction", path=path):
+            value = db.reference(path).transaction(update)
+        self.scope.invalidate(path)
+        return value
+
+    def _push(self, path: str, value: dict) -> str:
+        self.scope.count_round_trip()
+        with hooks.track_upstream("firebase", "push", path=path):
+            key = db.reference(path).push(value).key
+        self.scope.invalidate(path)
+        return key
+
+    def _delete(self, path: str):
+        self.scope.count_round_trip()
+        with hooks.track_upstream("firebase", "delete", path=path):
+            db.reference(path).delete()
+        self.scope.invalidate(path)
+
+
+class UserRepository(Repository):
+    def get_profile(self, user_id: str) -> Optional[dict]:
+        return self._get(f'/users/{user_id}')
+
+    def get_location(self, user_id: str) -> Optional[str]:
+        # Okuyucular konum tamponundaki, henüz yazılmamış son konumu görür
+        return hooks.pending_location(user_id) or self._get(f'/users/{user_id}/location')
+
+    def get_locations(self, user_ids: Iterable[str]) -> Dict[str, Optional[str]]:
+        user_ids = list(user_ids)
+        pending = {user_id: hooks.pending_location(user_id) for user_id in user_ids}
+        paths = {user_id: f'/users/{user_id}/location' for user_id in user_ids if not pending.get(user_id)}
+        values = self.get_many(paths.values())
+        return {user_id: pending.get(user_id) or values[paths[user_id]] for user_id in user_ids}
+
+    def set_location(self, user_id: str, location):
+        self._set(f'/users/{user_id}/location', location)
+
+    def set_locations(self, locations: Dict[str, str]):
+        """Birden çok kullanıcının konumu tek multi-path update ile."""
+        self._update('/users', {f'{user_id}/location': location for user_id, location in locations.items()})
+
+    def get_notification_time(self, user_id: str) -> Optional[str]:
+        return self._get(f'/users/{user_id}/notification_time')
+
+    def get_health_info(self, user_id: str) -> Optional[dict]:
+        return self._get(f'/users/{user_id}/health_info')
+
+    def set_health_info(self, user_id: str, health_info: dict):
+        self._set(f'/users/{user_id}/health_info', health_info)
+
+    def exists(self, user_id: str) -> bool:
+        return self._exists(f'/users/{user_id}')
+
+    def page(self, start_after: Optional[str], limit: int) -> Dict[str, dict]:
+        return self._page('/users', start_after, limit)
+
+
+class DeviceRepository(Repository):
+    def get_all(self, user_id: str) -> dict:
+        return self._get(f'/devices/{user_id}') or {}
+
+    def tokens(self, user_id: str) -> List[str]:
+        return [device['token'] for device in self.get_all(user_id).values() if 'token' in device]
+
+    def register(self, user_id: str, token: str, platform: str = 'android') -> str:
+        return self._push(f'/devices/{user_id}', {
+            'token': token,
+            'platform': platform,
+            'created_at': datetime.now().isoformat()
+        })
+
+    def count(self, user_id: str) -> int:
+        return self._count(f'/devices/{user_id}')
+
+
+class NotificationRepository(Repository):
+    def create(self, user_id: str, notification: dict) -> str:
+        notification_id = self._push(f'/notifications/{user_id}', notification)
+        hooks.publish(user_id, "notification", {"id": notification_id, **notification})
+        return notification_id
+
+    def mark_as_read(self, user_id: str, notification_id: str):
+        self._update(f'/notifications/{user_id}/{notification_id}', {"read": True})
+        hooks.publish(user_id, "notification_read", {"id": notification_id})
+
+    def delete(self, user_id: str, notification_id: str):
+        self._delete(f'/notifications/{user_id}/{notification_id}')
+        hooks.publish(user_id, "notification_deleted", {"id": notification_id})
+
+    def latest(self, user_id: str, limit: int = 100) -> list:
+        self.scope.count_round_trip()
+        with hooks.track_upstream("firebase", "query"):
+            result = db.reference(f'/notifications/{user_id}').order_by_child('timestamp').limit_to_last(limit).get()
+        return list((result or {}).values())
+
+    def by_type(self, user_id: str, notification_type: str) -> list:
+        self.scope.count_round_trip()
+        with hooks.track_upstream("firebase", "query"):
+            result = db.reference(f'/notifications/{user_id}').order_by_child('type').equal_to(notification_type).get()
+        return list((result or {}).values())
+
+    def count(self, user_id: str) -> int:
+        return self._count(f'/notifications/{user_id}')
+
+    def page(self, user_id: str, start_after: Optional[str], limit: int) -> Dict[str, dict]:
+        return self._page(f'/notifications/{user_id}', start_after, limit)
+
+    def create_many(self, notification_id: str, notifications: Dict[str, dict]):
+        """Aynı anahtarla birden çok kullanıcıya kayıt: tek multi-path update (tekrar yazmak idempotent)."""
+        self._update('/notifications', {f'{user_id}/{notification_id}': notification
+                                        for user_id, notification in notifications.items()})
+        for user_id, notification in notifications.items():
+            hooks.publish(user_id, "notification", {"id": notification_id, **notification})
+
+
+class EmergencyContactRepository(Repository):
+    def get_all(self, user_id: str) -> dict:
+        return self._get(f'/users/{user_id}/emergency_contacts') or {}
+
+    def add(self, user_id: str, contact: dict) -> str:
+        return self._push(f'/users/{user_id}/emergency_contacts', contact)
+
+    def delete(self, user_id: str, contact_id: str):
+        self._delete(f'/users/{user_id}/emergency_contacts/{contact_id}')
+
+    def count(self, user_id: str) -> int:
+        return self._count(f'/users/{user_id}/emergency_contacts')
+
+
+class EmergencyAlertRepository(Repository):
+    def page(self, user_id: str, start_after: Optional[str], limit: int) -> Dict[str, dict]:
+        return self._page(f'/emergency_alerts/{user_id}', start_after, limit)
+
+
+class WeatherHistoryRepository(Repository):
+    """Hücre başına gün kovaları: /weather_history_cells/{cell}/{YYYYMMDD} -> kodlanmış kayıt"""
+
+    def get_days(self, cell: str, days: Iterable[str]) -> Dict[str, Optional[str]]:
+        paths = {day: f'/weather_history_cells/{cell}/{day}' for day in days}
+        values = self.get_many(paths.values())
+        return {day: values[path] for day, path in paths.items()}
+
+    def set_day(self, cell: str, day: str, blob: str):
+        self._set(f'/weather_history_cells/{cell}/{day}', blob)
+
+    def update_day(self, cell: str, day: str, update: Callable[[Optional[str]], Optional[str]]) -> Optional[str]:
+        """Gün kaydını transaction ile günceller; eşzamanlı yazanların örnekleri kaybolmaz."""
+        return self._transaction(f'/weather_history_cells/{cell}/{day}', update)
+
+
+class DigestIndexRepository(Repository):
+    """
+    Bildirim dakikası ve konum hücresine göre kullanıcı indeksleri:
+    /digest_index/{HHMM}/{cell}/{uid} -> cihaz token listesi (cihaz yoksa true)  (özetler)
+    /cell_index/{cell}/{uid}          -> aynı değer                                (ani değişim uyarıları)
+    Kullanıcının bulunduğu yer /users/{uid}/digest_slot ("HHMM/cell") içinde tutulur.
+    """
+
+    def bucket(self, minute: str) -> Dict[str, Dict[str, Any]]:
+        return self._get(f'/digest_index/{minute}') or {}
+
+    def cells(self) -> List[str]:
+        """Abonesi olan tüm hücreler (shallow okuma, kullanıcılar indirilmez)."""
+        return list(self._get('/cell_index', shallow=True) or {})
+
+    def subscribers(self, cell: str) -> Dict[str, Any]:
+        return self._get(f'/cell_index/{cell}') or {}
+
+    def page_users(self, start_after: Optional[str], limit: int) -> Dict[str, dict]:
+        return self._page('/users', start_after, limit)
+
+    def place(self, entries: Dict[str, tuple]):
+        """entries: uid -> (eski slot, yeni slot, token listesi); tek multi-path update."""
+        updates = {}
+        for user_id, (old_slot, new_slot, tokens) in entries.items():
+            new_cell = new_slot.split('/')[1]
+            if old_slot and old_slot != new_slot:
+                updates[f'digest_index/{old_slot}/{user_id}'] = None
+                old_cell = old_slot.split('/')[1]
+                if old_cell != new_cell:
+                    updates[f'cell_index/{old_cell}/{user_id}'] = None
+            updates[f'digest_index/{new_slot}/{user_id}'] = tokens or True
+            updates[f'cell_index/{new_cell}/{user_id}'] = tokens or True
+            updates[f'users/{user_id}/digest_slot'] = new_slot
+        if updates:
+            self._update('/', updates)
+
+
+class WeatherAlertRepository(Repository):
+    """Hücre başına etkin ani değişim uyarıları: /cell_alerts/{cell}/{alert_id}"""
+
+    def for_cell(self, cell: str) -> Dict[str, dict]:
+        return self._get(f'/cell_alerts/{cell}') or {}
+
+    def replace(self, alerts_by_cell: Dict[str, Dict[str, dict]]):
+        """Birden çok hücrenin uyarı listesini tek multi-path update ile yazar."""
+        if alerts_by_cell:
+            self._update('/cell_alerts', {cell: alerts or None for cell, alerts in alerts_by_cell.items()})
+
+
+def init_repository(app, **repository_hooks):
+    """
+    Her yanıta isteğin veritabanı gidiş-dönüş sayısını ekler; verilen kancaları
+    (bkz. RepositoryHooks) bağlar.
+    """
+    hooks.configure(**repository_hooks)
+
+    @app.after_request
+    def add_round_trip_header(response):
+        scope = getattr(g, "_db_scope", None)
+        if scope is not None:
+            response.headers["X-DB-Round-Trips"] = str(scope.round_trips)
+        return response
@@ -0,0 +1,76 @@
+import logging
+from datetime import datetime
+
+from flask import Blueprint, Response, jsonify, request
+
+from routes.admission import controller as admission_controller
+from routes.auth_middleware import require_admin
+from routes.event_hub import get_event_hub
+from routes.location_buffer import get_location_buffer
+from routes.profiler import PROFILE_MAX_SECONDS, ProfilerBusy, get_profiler
+from routes.quota_scheduler import scheduler
+from routes.resilience import breaker_states
+
+logger = logging.getLogger(__name__)
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+
+@admin_bp.route('/profile', methods=['POST'])
+@require_admin
+def run_profile():
+    """
+    Sampling profiler'ı `seconds` (varsayılan 10) boyunca çalıştırır ve
+    collapsed-stack dosyası döner:  flamegraph.pl profile.folded > profile.svg
+    """
+    try:
+        seconds = float(request.args.get('seconds', 10))
+    except ValueError:
+        return jsonify({"error": "seconds sayı olmalı"}), 400
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        return jsonify({"error": f"seconds 0-{PROFILE_MAX_SECONDS} arasında olmalı"}), 400
+
+    try:
+        folded = get_profiler().profile(seconds)
+    except ProfilerBusy as e:
+        return jsonify({"error": str(e)}), 409
+
+    filename = f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.folded"
+    logger.info(f"Profil tamamlandı: {seconds} sn, {len(folded.splitlines())} farklı yığın")
+    return Response(folded, mimetype="text/plain",
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+
+@admin_bp.route('/quotas', methods=['GET'])
+@require_admin
+def quota_status():
+    """Upstream kotaları: kalan token, günlük kullanım ve öncelik şeridi sayaçları (bu worker)"""
+    return jsonify({"upstreams": scheduler.snapshot()}), 200
+
+
+@admin_bp.route('/circuits', methods=['GET'])
+@require_admin
+def circuit_status():
+    """Upstream devre kesicilerinin durumu (bu worker)"""
+    return jsonify({"upstreams": breaker_states()}), 200
+
+
+@admin_bp.route('/admission', methods=['GET'])
+@require_admin
+def admission_status():
+    """Pahalı endpoint'lerin kabul kontrolü: eşzamanlı istek ve sınıf başına kalan token (bu worker)"""
+    return jsonify(admission_controller.snapshot()), 200
+
+
+@admin_bp.route('/location-buffer', methods=['GET'])
+@require_admin
+def location_buffer_status():
+    """Konum yazma tamponu: gelen / yazılan güncellemeler ve tasarruf edilen yazmalar (bu worker)"""
+    return jsonify(get_location_buffer().snapshot()), 200
+
+
+@admin_bp.route('/events', methods=['GET'])
+@require_admin
+def event_hub_status():
+    """SSE olay merkezi: açık bağlantılar, izlenen konular ve son olay sırası (bu worker)"""
+    return jsonify(get_event_hub().snapshot()), 200
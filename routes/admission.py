@@ -0,0 +1,196 @@
+"""
+Pahalı endpoint'ler için kabul kontrolü.
+
+Her rota sınıfının kullanıcı başına ve genel bir token bucket'ı vardır; ayrıca
+tüm pahalı istekler ortak bir eşzamanlılık sınırını paylaşır. Sınırı aşan istek
+upstream'e hiç gitmeden 429 + Retry-After ile hızla reddedilir.
+
+Token bucket'lar paylaşımlı önbellek sayacındadır (SharedTokenBucket): hız
+sınırları worker sayısından bağımsız olarak makine geneli için geçerlidir.
+Eşzamanlılık sınırı (ADMISSION_MAX_IN_FLIGHT) ise bilerek worker başınadır:
+koruduğu şey worker'ın kendi thread havuzudur (GUNICORN_THREADS'ten büyük
+olmamalıdır); makine toplamı worker sayısı × bu değerdir.
+
+Acil durum sınıfı hiçbir zaman reddedilmez: eşzamanlılık sınırının bir kısmı
+(EMERGENCY_RESERVED_SLOTS) yalnızca ona ayrılmıştır; diğer sınıflar bu payı
+kullanamaz, sınır dolsa bile acil durum istekleri kabul edilir.
+"""
+import logging
+import math
+import os
+import threading
+from dataclasses import dataclass
+from functools import wraps
+from typing import Dict
+
+from dotenv import load_dotenv
+from flask import g, jsonify, request
+
+from routes.metrics import inc, register
+from routes.token_bucket import SharedTokenBucket
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "32"))   # Worker başına
+EMERGENCY_RESERVED_SLOTS = int(os.getenv("ADMISSION_EMERGENCY_SLOTS", "8"))
+CONCURRENCY_RETRY_AFTER = 1    # Eşzamanlılık sınırında istemciye önerilen bekleme (sn)
+
+ROUTE_CLASS_ALERTS = "alerts"         # Gemini + FCM (+ Places)
+ROUTE_CLASS_CAFES = "cafes"           # Google Places
+ROUTE_CLASS_EMERGENCY = "emergency"   # Twilio + FCM
+
+register("admission_decisions_total", "counter",
+         "Kabul kontrolü kararları (admitted / over_limit / rate_limited / overloaded)", ("route_class", "result"))
+
+
+@dataclass(frozen=True)
+class RouteClassLimits:
+    user_burst: float
+    user_per_second: float
+    global_burst: float
+    global_per_second: float
+    shed: bool = True              # False: sınırlar yalnızca sayılır, istek reddedilmez
+
+
+def _limits_from_env(route_class: str, defaults: RouteClassLimits) -> RouteClassLimits:
+    prefix = f"ADMISSION_{route_class.upper()}"
+    return RouteClassLimits(
+        user_burst=float(os.getenv(f"{prefix}_USER_BURST", defaults.user_burst)),
+        user_per_second=float(os.getenv(f"{prefix}_USER_PER_SECOND", defaults.user_per_second)),
+        global_burst=float(os.getenv(f"{prefix}_GLOBAL_BURST", defaults.global_burst)),
+        global_per_second=float(os.getenv(f"{prefix}_GLOBAL_PER_SECOND", defaults.global_per_second)),
+        shed=defaults.shed,
+    )
+
+
+ROUTE_CLASSES: Dict[str, RouteClassLimits] = {
+    # Kullanıcı başına dakikada 1 (5'lik patlama); tüm kullanıcılar saniyede 2
+    ROUTE_CLASS_ALERTS: _limits_from_env(ROUTE_CLASS_ALERTS, RouteClassLimits(5, 1 / 60, 50, 2)),
+    ROUTE_CLASS_CAFES: _limits_from_env(ROUTE_CLASS_CAFES, RouteClassLimits(10, 0.2, 100, 10)),
+    ROUTE_CLASS_EMERGENCY: RouteClassLimits(3, 1 / 60, 50, 5, shed=False),
+}
+
+
+class Rejected(Exception):
+    def __init__(self, route_class: str, reason: str, retry_after: float):
+        super().__init__(f"{route_class} isteği reddedildi ({reason})")
+        self.route_class = route_class
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, classes: Dict[str, RouteClassLimits] = None, max_in_flight: int = MAX_IN_FLIGHT,
+                 emergency_slots: int = EMERGENCY_RESERVED_SLOTS):
+        self.classes = classes or ROUTE_CLASSES
+        self.max_in_flight = max_in_flight
+        self.emergency_slots = min(emergency_slots, max_in_flight)
+        self._global_buckets = {
+            name: SharedTokenBucket(f"admission:{name}", limits.global_burst, limits.global_per_second)
+            for name, limits in self.classes.items()
+        }
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def _enter(self, route_class: str) -> bool:
+        limits = self.classes[route_class]
+        with self._lock:
+            # Ayrılmış paya yalnızca reddedilmeyen (acil durum) sınıf girebilir
+            if limits.shed and self._in_flight >= self.max_in_flight - self.emergency_slots:
+                return False
+            self._in_flight += 1
+            return True
+
+    def _user_bucket(self, route_class: str, user_key: str) -> SharedTokenBucket:
+        limits = self.classes[route_class]
+        return SharedTokenBucket(f"admission:{route_class}:{user_key}", limits.user_burst, limits.user_per_second)
+
+    def _leave(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _count(self, route_class: str, result: str):
+        inc("admission_decisions_total", (route_class, result))
+
+    def admit(self, route_class: str, user_key: str):
+        """
+        Kabul edilirse eşzamanlılık payı alınır (release ile bırakılmalı); edilmezse
+        Rejected fırlatılır. Reddedilen istek token harcamaz.
+        """
+        limits = self.classes[route_class]
+        if not self._enter(route_class):
+            self._count(route_class, "overloaded")
+            raise Rejected(route_class, "overloaded", CONCURRENCY_RETRY_AFTER)
+
+        user_bucket = self._user_bucket(route_class, user_key)
+        ok, retry_after = user_bucket.try_acquire()
+        if ok:
+            ok, retry_after = self._global_buckets[route_class].try_acquire()
+            if not ok:
+                # Reddin sebebi kullanıcı değil; token'ı iade edilir
+                user_bucket.refund()
+        if not ok and limits.shed:
+            self._leave()
+            self._count(route_class, "rate_limited")
+            raise Rejected(route_class, "rate_limited", retry_after)
+        self._count(route_class, "admitted" if ok else "over_limit")
+
+    def release(self):
+        self._leave()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            in_flight = self._in_flight
+        return {
+            "in_flight": in_flight,
+            "max_in_flight": self.max_in_flight,
+            "emergency_reserved_slots": self.emergency_slots,
+            "classes": {
+                name: {
+                    "global_tokens_available": round(self._global_buckets[name].available(), 2),
+                    "sheds": limits.shed,
+                }
+                for name, limits in self.classes.items()
+            },
+        }
+
+
+controller = AdmissionController()
+
+
+def _user_key() -> str:
+    """
+    Doğrulanmış kullanıcı, yoksa rotadaki user_id, o da yoksa istemci IP'si.
+    X-Forwarded-For istemcinin elindedir; yalnızca güvenilir vekil arkasında ProxyFix
+    (TRUSTED_PROXY_HOPS, bkz. app.py) remote_addr'ı ondan türetir.
+    """
+    uid = getattr(g, "uid", None)
+    if uid:
+        return f"uid:{uid}"
+    user_id = (request.view_args or {}).get("user_id")
+    if user_id:
+        return f"user:{user_id}"
+    return f"ip:{request.remote_addr}"
+
+
+def admission(route_class: str):
+    """Route'u kabul kontrolüne bağlar; sınır aşılırsa 429 + Retry-After döner."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                controller.admit(route_class, _user_key())
+            except Rejected as e:
+                response = jsonify({"error": "Çok fazla istek, lütfen daha sonra tekrar deneyin",
+                                    "reason": e.reason})
+                response.status_code = 429
+                response.headers["Retry-After"] = str(max(1, math.ceil(e.retry_after)))
+                return response
+            try:
+                return func(*args, **kwargs)
+            finally:
+                controller.release()
+        return wrapper
+    return decorator
@@ -0,0 +1,294 @@
+"""
+Uyarı açıklamaları için önceden üretilmiş tablo.
+
+Uyarıların çoğu birkaç kalıptan biridir ("sıcaklık N°C düştü", "HH:MM'de yağmur
+bekleniyor"...). Her kalıp büyüklük aralığı ve günün saatine göre kovalara ayrılır;
+kova başına açıklama Gemini'ye toplu olarak bir kez ürettirilir ve yer tutuculu
+("{drop}") şablonlar olarak sürümlü yerel bir tabloya yazılır. Çevrim içi yol
+sözlük araması ve yer tutucu doldurmadır; kalıba uymayan ya da tabloda olmayan
+uyarılar için Gemini'ye gidilir.
+
+    python -m routes.alert_explanations generate [--only-missing]
+    python -m routes.alert_explanations show "Sıcaklık son 1 saatte 6.5°C düştü!"
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import logging
+import os
+import re
+import string
+import tempfile
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from routes.metrics import record_cache, track_upstream
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TABLE_PATH = os.getenv("ALERT_EXPLANATIONS_PATH", os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'data', 'alerts', 'alert_explanations.json'))
+GEMINI_MODEL = "gemini-pro"
+EXPLAIN_PROMPT = "Aşağıdaki hava durumu uyarısını basit Türkçe ile açıkla ve 3 maddelik öneri sun:"
+
+# Günün saatine göre kovalar: (başlangıç saati, ad)
+TIMES_OF_DAY = ((0, "gece"), (6, "sabah"), (12, "ogleden_sonra"), (18, "aksam"))
+
+_NUMBER = r"\d+(?:[.,]\d+)?"
+
+
+@dataclass(frozen=True)
+class Archetype:
+    name: str
+    description: str            # Üretim isteminde kalıbı tarif eder
+    patterns: Tuple[str, ...]   # Adlandırılmış gruplar yer tutucuları verir
+    magnitude: Optional[str]    # Kovalamada kullanılan yer tutucu (yoksa tek kova)
+    buckets: Tuple[Tuple[float, str], ...] = ()   # (üst sınır, ad); son kova sınırsız
+
+    @property
+    def slots(self) -> Tuple[str, ...]:
+        return tuple(sorted(set().union(*(re.compile(pattern).groupindex for pattern in self.patterns))))
+
+    def bucket(self, value: float) -> str:
+        bounds = [bound for bound, _ in self.buckets]
+        return self.buckets[min(bisect.bisect_left(bounds, value), len(self.buckets) - 1)][1]
+
+    def bucket_names(self) -> Tuple[str, ...]:
+        return tuple(name for _, name in self.buckets) or ("all",)
+
+
+ARCHETYPES = (
+    Archetype(
+        "temperature_drop", "Son bir saatte sıcaklık {drop}°C düştü.",
+        (rf"Sıcaklık son 1 saatte (?P<drop>{_NUMBER})°C düştü",),
+        "drop", ((7, "5-7"), (10, "7-10"), (float("inf"), "10+")),
+    ),
+    Archetype(
+        "precipitation_onset", "Yağış başladı, saatte {rate} mm.",
+        (rf"Yağış başladı: saatte (?P<rate>{_NUMBER}) mm",),
+        "rate", ((2.5, "hafif"), (7.6, "orta"), (float("inf"), "kuvvetli")),
+    ),
+    Archetype(
+        "wind_spike", "Rüzgar hızı son bir saatte {before} km/s'den {after} km/s'ye çıktı.",
+        (rf"Rüzgar hızı son 1 saatte (?P<before>{_NUMBER}) km/s'den (?P<after>{_NUMBER}) km/s'ye çıktı",),
+        "after", ((60, "40-60"), (90, "60-90"), (float("inf"), "90+")),
+    ),
+    Archetype(
+        "rain_expected", "Saat {time} civarında yağmur bekleniyor.",
+        (r"(?i)(?:saat )?(?P<time>\d{1,2}[:.]\d{2})(?:'(?:de|da|te|ta))? (?:yağmur|yağış) bekleniyor",
+         r"(?i)(?:yağmur|yağış) bekleniyor:? (?:saat )?(?P<time>\d{1,2}[:.]\d{2})"),
+        None,
+    ),
+)
+
+
+@dataclass(frozen=True)
+class Match:
+    archetype: Archetype
+    key: str
+    slots: Dict[str, str]
+
+
+def _time_of_day(hour: int) -> str:
+    starts = [start for start, _ in TIMES_OF_DAY]
+    return TIMES_OF_DAY[bisect.bisect_right(starts, hour) - 1][1]
+
+
+def _format_slot(value: str) -> str:
+    if re.fullmatch(r"\d{1,2}[:.]\d{2}", value):
+        hour, minute = re.split(r"[:.]", value)
+        return f"{int(hour):02d}:{minute}"
+    return value.replace(",", ".")
+
+
+def entry_key(archetype: str, bucket: str, time_of_day: str) -> str:
+    return f"{archetype}|{bucket}|{time_of_day}"
+
+
+def match_alert(message: str, when: datetime = None) -> Optional[Match]:
+    """Uyarı metnini bir kalıba ve kovaya eşler; kalıp dışı metinler için None."""
+    for archetype in ARCHETYPES:
+        for pattern in archetype.patterns:
+            found = re.search(pattern, message)
+            if not found:
+                continue
+            slots = {name: _format_slot(value) for name, value in found.groupdict().items()}
+            if archetype.magnitude:
+                bucket = archetype.bucket(float(slots[archetype.magnitude]))
+                hour = (when or datetime.now()).hour
+            else:
+                bucket = "all"
+                # Beklenen olaylarda günün saati olayın saatidir
+                hour = int(slots["time"][:2]) % 24
+            return Match(archetype, entry_key(archetype.name, bucket, _time_of_day(hour)), slots)
+    return None
+
+
+def spec_hash() -> str:
+    """İstem ya da kalıplar değişirse eski tablo kullanılmaz."""
+    spec = [EXPLAIN_PROMPT, TIMES_OF_DAY] + [
+        (archetype.name, archetype.description, archetype.patterns, archetype.buckets)
+        for archetype in ARCHETYPES
+    ]
+    return hashlib.sha1(json.dumps(spec, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()[:12]
+
+
+def valid_template(template: str, slots: Tuple[str, ...]) -> bool:
+    """Şablon yalnızca kalıbın yer tutucularını içermeli ve format ile doldurulabilmeli."""
+    try:
+        fields = {field for _, field, _, _ in string.Formatter().parse(template) if field is not None}
+        template.format(**{slot: "" for slot in slots})
+    except (ValueError, KeyError, IndexError):
+        return False
+    return fields == set(slots)
+
+
+class ExplanationTable:
+    """Sürümlü açıklama tablosu; dosya ilk kullanımda bir kez okunur."""
+
+    def __init__(self, path: str = TABLE_PATH):
+        self.path = path
+        self._entries: Optional[Dict[str, str]] = None
+        self.version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _read(self) -> Optional[dict]:
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            logger.error(f"Açıklama tablosu okunamadı ({self.path}): {str(e)}")
+            return None
+
+    def load(self) -> Dict[str, str]:
+        with self._lock:
+            if self._entries is None:
+                table = self._read() or {}
+                self.version = table.get("version")
+                if table and table.get("spec") != spec_hash():
+                    logger.warning(f"Açıklama tablosu v{table.get('version')} güncel kalıplarla uyuşmuyor; "
+                                   f"yeniden üretilene kadar Gemini kullanılacak")
+                    table = {}
+                self._entries = table.get("entries", {})
+            return self._entries
+
+    def reload(self):
+        with self._lock:
+            self._entries = None
+        self.load()
+
+    def explain(self, message: str, when: datetime = None) -> Optional[str]:
+        """Tablodan doldurulmuş açıklama; kalıp dışı ya da tabloda olmayan uyarılar için None."""
+        match = match_alert(message, when)
+        template = self.load().get(match.key) if match else None
+        record_cache("alert_explanations", template is not None)
+        return template.format(**match.slots) if template else None
+
+
+_table = ExplanationTable()
+
+
+def get_explanation_table() -> ExplanationTable:
+    return _table
+
+
+def explain_alert(message: str, when: datetime = None) -> Optional[str]:
+    return _table.explain(message, when)
+
+
+# -- Çevrim dışı üretim -------------------------------------------------------
+
+
+def _generation_prompt(archetype: Archetype, keys: Dict[str, Tuple[str, str]]) -> str:
+    placeholders = ", ".join("{" + slot + "}" for slot in archetype.slots)
+    cases = "\n".join(f'- "{key}": büyüklük aralığı {bucket}, günün saati {time_of_day}'
+                      for key, (bucket, time_of_day) in keys.items())
+    return (
+        f"{EXPLAIN_PROMPT}\n\n"
+        f"Uyarı: {archetype.description}\n"
+        f"Aşağıdaki durumların her biri için ayrı bir metin yaz. Metinlerde {placeholders} "
+        f"yer tutucularını aynen (süslü parantezleriyle) kullan, başka süslü parantez kullanma.\n"
+        f"{cases}\n\n"
+        f"Yanıtı yalnızca anahtarları yukarıdaki gibi olan bir JSON nesnesi olarak ver."
+    )
+
+
+def _parse_json(text: str) -> dict:
+    found = re.search(r"\{.*\}", text, re.S)
+    if not found:
+        raise ValueError("Yanıtta JSON bulunamadı")
+    return json.loads(found.group(0))
+
+
+def generate(only_missing: bool = False, path: str = TABLE_PATH) -> dict:
+    """Tüm kalıp x kova x günün saati kombinasyonlarını üretir; kalıp başına tek Gemini çağrısı."""
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    model = genai.GenerativeModel(GEMINI_MODEL)
+
+    table = ExplanationTable(path)
+    entries = dict(table.load()) if only_missing else {}
+    for archetype in ARCHETYPES:
+        keys = {entry_key(archetype.name, bucket, time_of_day): (bucket, time_of_day)
+                for bucket in archetype.bucket_names() for _, time_of_day in TIMES_OF_DAY}
+        keys = {key: value for key, value in keys.items() if key not in entries}
+        if not keys:
+            continue
+        try:
+            with track_upstream("gemini", "generate_content"):
+                response = model.generate_content(_generation_prompt(archetype, keys))
+            generated = _parse_json(response.text)
+        except Exception as e:
+            logger.error(f"{archetype.name} için açıklama üretilemedi: {str(e)}")
+            continue
+        for key in keys:
+            template = generated.get(key)
+            if isinstance(template, str) and valid_template(template.strip(), archetype.slots):
+                entries[key] = template.strip()
+            else:
+                logger.warning(f"Geçersiz şablon atlandı: {key}")
+
+    output = {
+        "version": (table.version or 0) + 1,
+        "spec": spec_hash(),
+        "model": GEMINI_MODEL,
+        "generated_at": datetime.now().isoformat(),
+        "entries": dict(sorted(entries.items())),
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(path), suffix=".json", delete=False,
+                                     encoding="utf-8") as file:
+        json.dump(output, file, ensure_ascii=False, indent=2)
+    os.replace(file.name, path)
+
+    expected = sum(len(archetype.bucket_names()) * len(TIMES_OF_DAY) for archetype in ARCHETYPES)
+    logger.info(f"Açıklama tablosu v{output['version']}: {len(entries)}/{expected} kayıt")
+    return output
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Uyarı açıklama tablosu")
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate_parser = commands.add_parser("generate")
+    generate_parser.add_argument("--only-missing", action="store_true",
+                                 help="Mevcut tablodaki kayıtları koru, eksikleri üret")
+    show = commands.add_parser("show")
+    show.add_argument("message")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "generate":
+        generate(args.only_missing)
+    else:
+        match = match_alert(args.message)
+        print(match.key if match else "kalıp dışı", "->", explain_alert(args.message))
@@ -0,0 +1,109 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import logging
+import os
+import threading
+from typing import Any, Coroutine, Optional
+
+import aiohttp
+import requests
+
+logger = logging.getLogger(__name__)
+
+CONNECTION_LIMIT = 64          # Süreç başına eşzamanlı açık bağlantı
+DNS_CACHE_SECONDS = 300
+
+
+class AsyncHTTPError(requests.exceptions.HTTPError):
+    """aiohttp durum hatası; requests hiyerarşisinde olduğu için mevcut 503 yolları ve devre kesici tanır."""
+
+    def __init__(self, status_code: int, url: str):
+        super().__init__(f"{status_code} Error for url: {url}")
+        self.status_code = status_code
+
+
+class AsyncHTTP:
+    """
+    Arka planda çalışan tek bir event loop ve paylaşılan aiohttp oturumu.
+    Senkron Flask handler'ları coroutine'leri `run` ile bu loop'ta çalıştırır.
+    Fork'tan sonra (gunicorn worker'ı) loop ve oturum yeniden kurulur.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._session = None
+                self._pid = os.getpid()
+                threading.Thread(target=self._loop.run_forever, name="async-http", daemon=True).start()
+            return self._loop
+
+    def run(self, coro: Coroutine, timeout: float) -> Any:
+        """
+        Coroutine'i arka plan loop'unda çalıştırır; çağıranın context'i (trace, öncelik) taşınır.
+        `timeout` toplam süre sınırıdır (zorunlu): aşılırsa görev iptal edilir ve
+        requests.exceptions.Timeout yükselir, handler thread'i süresiz beklemez.
+        """
+        loop = self._ensure_loop()
+        context = contextvars.copy_context()
+        result: concurrent.futures.Future = concurrent.futures.Future()
+        tasks = []
+
+        def start():
+            task = loop.create_task(coro, context=context)
+            tasks.append(task)
+
+            def done(task):
+                if task.cancelled():
+                    result.cancel()
+                elif task.exception() is not None:
+                    result.set_exception(task.exception())
+                else:
+                    result.set_result(task.result())
+            task.add_done_callback(done)
+
+        def cancel():
+            for task in tasks:
+                task.cancel()
+
+        loop.call_soon_threadsafe(start)
+        try:
+            return result.result(timeout)
+        except concurrent.futures.TimeoutError as e:
+            # start'tan sonra sıraya girer; görev henüz oluşmadıysa bile iptal edilir
+            loop.call_soon_threadsafe(cancel)
+            raise requests.exceptions.Timeout(f"Toplu istek {timeout:.1f} sn içinde tamamlanmadı") from e
+
+    def session(self) -> aiohttp.ClientSession:
+        """Yalnızca loop içinden çağrılır."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(
+                limit=CONNECTION_LIMIT, ttl_dns_cache=DNS_CACHE_SECONDS
+            ))
+        return self._session
+
+    async def get_json(self, url: str, params: dict = None, timeout: float = 15) -> Any:
+        try:
+            async with self.session().get(url, params=params,
+                                          timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                if response.status >= 400:
+                    raise AsyncHTTPError(response.status, url)
+                return await response.json(content_type=None)
+        except asyncio.TimeoutError as e:
+            raise requests.exceptions.Timeout(f"{url} zaman aşımı") from e
+        except aiohttp.ClientError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+
+
+_client = AsyncHTTP()
+
+
+def get_async_http() -> AsyncHTTP:
+    return _client
@@ -1,5 +1,6 @@
 from firebase_admin import auth
 from firebase_admin import db
+from routes.digest import index_profiles
 
 # Kullanıcı kayıt fonksiyonu
 def create_user(email: str, password: str, location: str):
@@ -11,12 +12,14 @@ def create_user(email: str, password: str, location: str):
         )
         
         # 2. Realtime DB'ye kullanıcı verisini yaz
-        ref = db.reference(f'/users/{user.uid}')
-        ref.set({
+        profile = {
             'email': email,
             'location': location,
             'notification_time': '08:00'
-        })
+        }
+        ref = db.reference(f'/users/{user.uid}')
+        ref.set(profile)
+        index_profiles({user.uid: profile})
         return user.uid
         
     except auth.EmailAlreadyExistsError:
@@ -0,0 +1,254 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Dict, Optional
+
+import firebase_admin
+import requests
+from dotenv import load_dotenv
+from firebase_admin import auth
+from flask import g, jsonify, request
+from google.auth import jwt as google_jwt
+
+from routes.metrics import record_cache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PUBLIC_KEYS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+ID_TOKEN_ISSUER_PREFIX = "https://securetoken.google.com/"
+TOKEN_CACHE_SIZE = 10000
+CLOCK_SKEW_SECONDS = 60
+KEY_REFRESH_RETRY = 60       # Anahtar çekme başarısız olursa tekrar deneme aralığı (sn)
+
+# Token olmadan erişilebilen yollar (AUTH_REQUIRED=true iken)
+PUBLIC_PATHS = ("/", "/verify-token", "/api/test")
+# Kullanıcıya ait route'lar (<user_id>) AUTH_REQUIRED'dan bağımsız olarak token ister.
+# Yalnızca yerel geliştirme / sahte ortam için: AUTH_ALLOW_ANONYMOUS=true token'sız erişime izin verir.
+ALLOW_ANONYMOUS = os.getenv("AUTH_ALLOW_ANONYMOUS", "false").lower() == "true"
+
+
+class PublicKeyCache:
+    """Google'ın ID token imza anahtarlarını önceden yükler ve arka planda yeniler."""
+
+    def __init__(self, url: str = PUBLIC_KEYS_URL):
+        self.url = url
+        self._certs: Dict[str, str] = {}
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def refresh(self) -> float:
+        """Anahtarları çeker, bir sonraki yenilemeye kalan süreyi döner."""
+        response = requests.get(self.url, timeout=10)
+        response.raise_for_status()
+        max_age = 3600
+        match = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+        if match:
+            max_age = int(match.group(1))
+        with self._lock:
+            self._certs = response.json()
+            self._expires_at = time.time() + max_age
+        # Süre dolmadan yenile
+        return max(KEY_REFRESH_RETRY, max_age * 0.8)
+
+    def set_certs(self, certs: Dict[str, str], max_age: float = 3600):
+        with self._lock:
+            self._certs = dict(certs)
+            self._expires_at = time.time() + max_age
+
+    def _fresh(self) -> Optional[Dict[str, str]]:
+        with self._lock:
+            if self._certs and time.time() < self._expires_at:
+                return self._certs
+            return None
+
+    def get(self) -> Dict[str, str]:
+        certs = self._fresh()
+        if certs is not None:
+            return certs
+        # Süre dolduğunda tek bir thread yeniler; eski anahtar varsa diğerleri onunla devam eder
+        if not self._refresh_lock.acquire(blocking=not self._certs):
+            with self._lock:
+                return self._certs
+        try:
+            if self._fresh() is None:
+                self.refresh()
+        except Exception as e:
+            logger.error(f"Public key yenileme hatası: {str(e)}")
+        finally:
+            self._refresh_lock.release()
+        # İlk ihtiyaçta arka plan yenileyicisi başlar (import sırasında ağ çağrısı yapılmaz)
+        self.start()
+        with self._lock:
+            return self._certs
+
+    def _run(self):
+        with self._lock:
+            # Anahtarlar yeni çekildiyse (ör. get() içinde) ilk yenileme süre dolmadan yapılır
+            delay = (self._expires_at - time.time()) * 0.8 if self._certs else 0.0
+        while not self._stop.wait(max(0.0, delay)):
+            try:
+                delay = self.refresh()
+            except Exception as e:
+                logger.error(f"Public key yenileme hatası: {str(e)}")
+                delay = KEY_REFRESH_RETRY
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="auth-public-keys", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+class TokenVerifier:
+    """
+    Firebase ID token'larını bir kez doğrular; çözülmüş claim'ler token hash'i
+    ile `exp` zamanına kadar sınırlı bir LRU önbellekte tutulur.
+    """
+
+    def __init__(self, keys: PublicKeyCache = None, project_id: str = None,
+                 cache_size: int = TOKEN_CACHE_SIZE):
+        self.keys = keys or PublicKeyCache()
+        self._project_id = project_id
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    @property
+    def project_id(self) -> Optional[str]:
+        if not self._project_id:
+            self._project_id = os.getenv("FIREBASE_PROJECT_ID") or os.getenv("GOOGLE_CLOUD_PROJECT")
+            if not self._project_id and firebase_admin._apps:
+                self._project_id = firebase_admin.get_app().project_id
+        return self._project_id
+
+    def _decode(self, id_token: str) -> dict:
+        project_id = self.project_id
+        certs = self.keys.get()
+        if not project_id or not certs:
+            # Yerel doğrulama yapılamıyorsa Admin SDK'ya düş
+            return auth.verify_id_token(id_token)
+
+        claims = google_jwt.decode(id_token, certs=certs, audience=project_id,
+                                   clock_skew_in_seconds=CLOCK_SKEW_SECONDS)
+        if claims.get("iss") != ID_TOKEN_ISSUER_PREFIX + project_id:
+            raise ValueError("Geçersiz token issuer")
+        if not claims.get("sub") or len(claims["sub"]) > 128:
+            raise ValueError("Geçersiz token subject")
+        claims["uid"] = claims["sub"]
+        return claims
+
+    def verify(self, id_token: str) -> dict:
+        """Doğrulanmış claim'leri döner, geçersiz token'da hata fırlatır."""
+        key = hashlib.sha256(id_token.encode()).hexdigest()
+        now = time.time()
+        with self._lock:
+            claims = self._cache.get(key)
+            if claims is not None:
+                if claims["exp"] > now:
+                    self._cache.move_to_end(key)
+                    self.stats["hits"] += 1
+                    record_cache("id_token", True)
+                    return claims
+                del self._cache[key]
+            self.stats["misses"] += 1
+        record_cache("id_token", False)
+
+        claims = self._decode(id_token)
+        with self._lock:
+            self._cache[key] = claims
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return claims
+
+
+verifier = TokenVerifier()
+
+
+def _bearer_token() -> Optional[str]:
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        return header[7:].strip() or None
+    return None
+
+
+def owner_forbidden(user_id) -> Optional[tuple]:
+    """
+    Kullanıcıya ait veriye erişim kontrolü: token yoksa 401, doğrulanmış kullanıcı
+    başka bir kullanıcının verisine erişiyorsa 403 yanıtı (yöneticiler hariç),
+    değilse None. AUTH_ALLOW_ANONYMOUS=true iken token'sız isteklere izin verilir.
+    """
+    if user_id is None:
+        return None
+    uid = getattr(g, "uid", None)
+    if not uid:
+        if ALLOW_ANONYMOUS:
+            return None
+        return jsonify({"error": "Kimlik doğrulaması gerekli"}), 401
+    if str(user_id) != uid and not (g.claims or {}).get("admin"):
+        return jsonify({"error": "Bu kullanıcının verisine erişim yetkiniz yok"}), 403
+    return None
+
+
+def authenticate_request():
+    """
+    before_request: token varsa doğrular ve uid'i `g.uid` olarak ekler. Yolunda
+    <user_id> olan route'lar her zaman token ister ve yalnızca o kullanıcıya
+    (ya da yöneticiye) açıktır.
+    """
+    g.uid = None
+    g.claims = None
+    token = _bearer_token()
+    if token:
+        try:
+            g.claims = verifier.verify(token)
+            g.uid = g.claims["uid"]
+        except Exception as e:
+            return jsonify({"error": f"Geçersiz token: {str(e)}"}), 401
+    elif os.getenv("AUTH_REQUIRED", "false").lower() == "true" and request.path not in PUBLIC_PATHS:
+        return jsonify({"error": "Authorization header eksik"}), 401
+    return owner_forbidden((request.view_args or {}).get("user_id"))
+
+
+def require_auth(func):
+    """Route için doğrulanmış kullanıcı zorunlu kılar."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not getattr(g, "uid", None):
+            return jsonify({"error": "Kimlik doğrulaması gerekli"}), 401
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def require_admin(func):
+    """Route'u `admin: true` custom claim'i olan kullanıcılara kısıtlar."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not getattr(g, "uid", None):
+            return jsonify({"error": "Kimlik doğrulaması gerekli"}), 401
+        if not (g.claims or {}).get("admin"):
+            return jsonify({"error": "Yönetici yetkisi gerekli"}), 403
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def init_auth(app):
+    # Anahtar yenileyicisi ilk doğrulamada (gunicorn'da worker ısınmasında) başlar
+    app.before_request(authenticate_request)
+    if ALLOW_ANONYMOUS:
+        logger.warning("AUTH_ALLOW_ANONYMOUS açık: kullanıcı verisine token'sız erişilebilir (yalnızca geliştirme)")
@@ -0,0 +1,83 @@
+"""
+Uygulama içinde çalışan zamanlayıcılar (DIGEST_SCHEDULER, WEATHER_MONITOR, EMERGENCY_MONITOR).
+
+init_* fonksiyonları işleri yalnızca kaydeder; import sırasında thread başlatılmaz
+(gunicorn preload_app ile import master süreçte yapılır, thread'ler fork'ta taşınmaz).
+
+- gunicorn: worker ısınmasında (wsgi.warm_up) start_as_leader() çağrılır. Makinedeki
+  worker'lardan yalnızca JOBS_LOCK_PATH dosya kilidini alan biri işleri çalıştırır;
+  o worker sonlanınca (max_requests yenilemesi dahil) kilidi işletim sistemi bırakır
+  ve bekleyen worker'lardan biri LEADER_RETRY_SECONDS içinde devralır.
+- Geliştirme sunucusu (python app.py): işler doğrudan başlatılır.
+
+Ayrı süreç tercih edilirse bayraklar kapalı bırakılıp her modülün kendi komutu
+kullanılır (ör. python -m routes.digest run).
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Optional, TextIO
+
+logger = logging.getLogger(__name__)
+
+JOBS_LOCK_PATH = os.getenv("BACKGROUND_JOBS_LOCK_PATH", os.path.join(tempfile.gettempdir(), "cman-smart-jobs.lock"))
+LEADER_RETRY_SECONDS = 30
+
+_jobs: Dict[str, Callable[[], None]] = {}
+_started = False
+_lock = threading.Lock()
+_lock_file: Optional[TextIO] = None
+
+
+def register_job(name: str, start: Callable[[], None]):
+    _jobs[name] = start
+
+
+def start_jobs():
+    """Kayıtlı işleri bu süreçte başlatır (süreç başına bir kez)."""
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+    for name, start in _jobs.items():
+        try:
+            start()
+        except Exception as e:
+            logger.error(f"Arka plan işi başlatılamadı ({name}): {str(e)}")
+
+
+def _try_lock() -> bool:
+    global _lock_file
+    try:
+        import fcntl
+    except ImportError:
+        return True     # gunicorn'un çalışmadığı platformlar: tek süreç
+    file = open(JOBS_LOCK_PATH, "a")
+    try:
+        fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        file.close()
+        return False
+    _lock_file = file   # Süreç yaşadıkça kilit tutulur
+    return True
+
+
+def start_as_leader():
+    """Kilidi alan worker işleri başlatır; alamayanlar arka planda beklemeye devam eder."""
+    if not _jobs:
+        return
+    if _try_lock():
+        logger.info(f"Arka plan işleri bu worker'da çalışıyor (pid {os.getpid()}): {', '.join(_jobs)}")
+        start_jobs()
+        return
+
+    def wait_for_lock():
+        while not _try_lock():
+            time.sleep(LEADER_RETRY_SECONDS)
+        logger.info(f"Arka plan işleri bu worker'a devredildi (pid {os.getpid()})")
+        start_jobs()
+
+    threading.Thread(target=wait_for_lock, name="jobs-leader", daemon=True).start()
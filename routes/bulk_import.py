@@ -0,0 +1,272 @@
+"""
+Toplu kullanıcı aktarımı (CSV / JSONL).
+
+Kullanım:
+    python -m routes.bulk_import users.csv --workers 4
+
+Her satır: email, password (opsiyonel), location, notification_time (opsiyonel), uid (opsiyonel).
+İşlem yarıda kalırsa aynı komut tekrar çalıştırıldığında tamamlanmış batch'ler atlanır.
+Zaten var olan kullanıcılar üzerine yazılmaz: Auth kaydı ve profili olanlar atlanıp
+hata dosyasına işaretlenir; Auth kaydı olup profili olmayanların (yarıda kalmış
+önceki çalıştırma) yalnızca profili yazılır. Profil alanları tek tek yazıldığı için
+kullanıcının diğer verileri (sağlık bilgisi, acil durum kişileri, ...) korunur.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import firebase_admin
+from dotenv import load_dotenv
+from firebase_admin import auth, credentials, db
+
+from models.repository import Repository
+from routes.digest import index_profiles
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_IMPORT_BATCH = 1000      # auth.import_users üst sınırı
+DB_UPDATE_CHUNK = 500        # Tek multi-path update'teki kullanıcı sayısı
+AUTH_LOOKUP_CHUNK = 100      # auth.get_users üst sınırı
+DEFAULT_WORKERS = 4
+PASSWORD_HASH_ROUNDS = 10000
+DEFAULT_NOTIFICATION_TIME = "08:00"
+
+
+def read_users(path: str) -> Iterator[dict]:
+    """Dosyayı satır satır okur; uzantıya göre CSV veya JSONL."""
+    with open(path, "r", encoding="utf-8") as file:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in file:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(file)
+
+
+def make_uid(email: str) -> str:
+    """E-postadan deterministik uid: tekrar çalıştırmada aynı kullanıcı yeniden oluşmaz."""
+    return hashlib.sha256(email.strip().lower().encode()).hexdigest()[:28]
+
+
+def hash_password(password: str, rounds: int = PASSWORD_HASH_ROUNDS) -> Tuple[bytes, bytes]:
+    salt = os.urandom(16)
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, rounds), salt
+
+
+def batched(rows: Iterator[dict], size: int) -> Iterator[Tuple[int, List[dict]]]:
+    batch = []
+    number = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield number, batch
+            number += 1
+            batch = []
+    if batch:
+        yield number, batch
+
+
+class Checkpoint:
+    """Tamamlanan batch numaralarını dosyada tutar."""
+
+    def __init__(self, path: str, batch_size: int):
+        self.path = path
+        self.batch_size = batch_size
+        self.completed = set()
+        self.imported = 0
+        self.failed = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            if data.get("batch_size") != batch_size:
+                raise ValueError(f"Checkpoint batch boyutu farklı: {data.get('batch_size')} != {batch_size}")
+            self.completed = set(data.get("completed", []))
+            self.imported = data.get("imported", 0)
+            self.failed = data.get("failed", 0)
+            self.skipped = data.get("skipped", 0)
+
+    def mark(self, batch_number: int, imported: int, failed: int, skipped: int = 0):
+        with self._lock:
+            self.completed.add(batch_number)
+            self.imported += imported
+            self.failed += failed
+            self.skipped += skipped
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump({
+                    "batch_size": self.batch_size,
+                    "completed": sorted(self.completed),
+                    "imported": self.imported,
+                    "failed": self.failed,
+                    "skipped": self.skipped
+                }, file)
+            os.replace(tmp_path, self.path)
+
+
+class BulkUserImporter:
+    def __init__(self, source: str, batch_size: int = MAX_IMPORT_BATCH, workers: int = DEFAULT_WORKERS,
+                 hash_rounds: int = PASSWORD_HASH_ROUNDS, checkpoint_path: Optional[str] = None):
+        if not 1 <= batch_size <= MAX_IMPORT_BATCH:
+            raise ValueError(f"batch_size 1-{MAX_IMPORT_BATCH} aralığında olmalı")
+        self.source = source
+        self.batch_size = batch_size
+        self.workers = workers
+        self.hash_rounds = hash_rounds
+        self.checkpoint = Checkpoint(checkpoint_path or f"{source}.checkpoint.json", batch_size)
+        self.errors_path = f"{source}.errors.jsonl"
+        self._errors_lock = threading.Lock()
+        self._started = None
+        self._processed = 0
+
+    def _build_records(self, rows: List[dict]) -> Tuple[List[auth.ImportUserRecord], Dict[str, dict], List[dict]]:
+        records = []
+        profiles = {}
+        invalid = []
+        for row in rows:
+            email = (row.get("email") or "").strip()
+            if not email:
+                # Parola hata dosyasına yazılmaz
+                invalid.append({"row": {k: v for k, v in row.items() if k != "password"}, "reason": "email eksik"})
+                continue
+            uid = row.get("uid") or make_uid(email)
+            password_hash = password_salt = None
+            if row.get("password"):
+                password_hash, password_salt = hash_password(row["password"], self.hash_rounds)
+            records.append(auth.ImportUserRecord(
+                uid=uid, email=email, password_hash=password_hash, password_salt=password_salt
+            ))
+            profiles[uid] = {
+                "email": email,
+                "location": row.get("location"),
+                "notification_time": row.get("notification_time") or DEFAULT_NOTIFICATION_TIME
+            }
+        return records, profiles, invalid
+
+    def _write_profiles(self, profiles: Dict[str, dict]):
+        uids = list(profiles)
+        users_ref = db.reference("/users")
+        for start in range(0, len(uids), DB_UPDATE_CHUNK):
+            chunk = uids[start:start + DB_UPDATE_CHUNK]
+            # Alan bazında yollar: /users/{uid} düğümünün geri kalanı silinmez
+            users_ref.update({f"{uid}/{field}": value for uid in chunk for field, value in profiles[uid].items()})
+            index_profiles({uid: profiles[uid] for uid in chunk})
+
+    def _existing_users(self, uids: List[str]) -> Tuple[set, set]:
+        """(Auth kaydı olanlar, bunlardan profili de olanlar)"""
+        in_auth = set()
+        for start in range(0, len(uids), AUTH_LOOKUP_CHUNK):
+            result = auth.get_users([auth.UidIdentifier(uid) for uid in uids[start:start + AUTH_LOOKUP_CHUNK]])
+            in_auth.update(user.uid for user in result.users)
+        if not in_auth:
+            return in_auth, set()
+        emails = Repository().get_many([f"/users/{uid}/email" for uid in in_auth])
+        return in_auth, {uid for uid in in_auth if emails[f"/users/{uid}/email"]}
+
+    def _record_errors(self, batch_number: int, errors: List[dict]):
+        if not errors:
+            return
+        with self._errors_lock:
+            with open(self.errors_path, "a", encoding="utf-8") as file:
+                for error in errors:
+                    file.write(json.dumps({"batch": batch_number, **error}, ensure_ascii=False) + "\n")
+
+    def _import_batch(self, batch_number: int, rows: List[dict]):
+        records, profiles, invalid = self._build_records(rows)
+        errors = list(invalid)
+        skipped = []
+        if records:
+            in_auth, with_profile = self._existing_users([record.uid for record in records])
+            for record in records:
+                if record.uid in with_profile:
+                    profiles.pop(record.uid, None)
+                    skipped.append({"email": record.email, "uid": record.uid,
+                                     "reason": "kullanıcı zaten mevcut, atlandı"})
+            # Auth kaydı olanlar yeniden aktarılmaz (parola ve diğer alanlar ezilmesin)
+            records = [record for record in records if record.uid not in in_auth]
+
+        if records:
+            result = auth.import_users(records, hash_alg=auth.UserImportHash.pbkdf2_sha256(self.hash_rounds))
+            for error in result.errors:
+                record = records[error.index]
+                profiles.pop(record.uid, None)
+                errors.append({"email": record.email, "reason": error.reason})
+        self._write_profiles(profiles)
+
+        self._record_errors(batch_number, errors + skipped)
+        self.checkpoint.mark(batch_number, len(profiles), len(errors), len(skipped))
+        self._report(len(rows))
+
+    def _report(self, rows: int):
+        with self._errors_lock:
+            self._processed += rows
+            elapsed = time.monotonic() - self._started
+            rate = self._processed / elapsed if elapsed else 0
+        logger.info(f"İlerleme: {self.checkpoint.imported} aktarıldı, {self.checkpoint.failed} hatalı, "
+                    f"{self.checkpoint.skipped} atlandı, {rate:.0f} kullanıcı/sn")
+
+    def run(self) -> dict:
+        self._started = time.monotonic()
+        # Bellekte en fazla workers*2 batch bekler
+        slots = threading.BoundedSemaphore(self.workers * 2)
+        failed_batches = []
+
+        def task(batch_number, rows):
+            try:
+                self._import_batch(batch_number, rows)
+            except Exception as e:
+                failed_batches.append(batch_number)
+                logger.error(f"Batch {batch_number} başarısız (tekrar çalıştırınca denenecek): {str(e)}")
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bulk-import") as executor:
+            for batch_number, rows in batched(read_users(self.source), self.batch_size):
+                if batch_number in self.checkpoint.completed:
+                    continue
+                slots.acquire()
+                executor.submit(task, batch_number, rows)
+
+        elapsed = time.monotonic() - self._started
+        summary = {
+            "imported": self.checkpoint.imported,
+            "failed": self.checkpoint.failed,
+            "skipped": self.checkpoint.skipped,
+            "failed_batches": sorted(failed_batches),
+            "seconds": round(elapsed, 1),
+            "users_per_second": round(self._processed / elapsed, 1) if elapsed else 0
+        }
+        logger.info(f"Aktarım tamamlandı: {summary}")
+        return summary
+
+
+def init_firebase():
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(os.getenv("FIREBASE_SERVICE_ACCOUNT_PATH"))
+        firebase_admin.initialize_app(cred, {"databaseURL": os.getenv("FIREBASE_DB_URL")})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Toplu kullanıcı aktarımı")
+    parser.add_argument("source", help="CSV veya JSONL dosyası")
+    parser.add_argument("--batch-size", type=int, default=MAX_IMPORT_BATCH)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--hash-rounds", type=int, default=PASSWORD_HASH_ROUNDS)
+    parser.add_argument("--checkpoint", default=None)
+    args = parser.parse_args()
+
+    init_firebase()
+    BulkUserImporter(args.source, args.batch_size, args.workers, args.hash_rounds, args.checkpoint).run()
@@ -0,0 +1,479 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from routes.metrics import inc, record_cache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "tiered")     # "tiered" | "memory"
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", os.path.join(tempfile.gettempdir(), "cman-smart-cache.sqlite3"))
+LOCAL_MAX_ENTRIES = 2048
+LOCAL_MAX_TTL = 60           # Yerel kopya en fazla bu kadar yaşar; paylaşımlı katman asıl kaynaktır
+LEASE_SECONDS = 15           # Bir worker'ın aynı anahtarı çekme hakkını tuttuğu en uzun süre
+LEASE_POLL_INTERVAL = 0.05
+PURGE_EVERY = 500            # Bu kadar yazmada bir süresi dolmuş kayıtlar silinir
+REFRESH_WORKERS = 4          # Arka planda yenileme (stale-while-revalidate) yapan thread sayısı
+
+_MISSING = object()
+
+
+class CacheBackend:
+    """
+    Önbellek katmanlarının ortak arayüzü. Değerler JSON ile serileştirilebilir
+    olmalıdır (dict, list, str, sayı, bool).
+    """
+
+    def get(self, key: str, default=None):
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: float):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def incr(self, key: str, amount: int, limit: Optional[int], ttl: float) -> Optional[int]:
+        """
+        Sayacı atomik olarak artırır; `limit` aşılacaksa artırmaz ve None döner.
+        Sayaç ilk oluşturulduktan `ttl` saniye sonra sıfırlanır.
+        """
+        raise NotImplementedError
+
+    def counter(self, key: str) -> int:
+        raise NotImplementedError
+
+    def acquire_lease(self, key: str, owner: str) -> bool:
+        """Anahtarı çekme hakkı. Paylaşımsız katmanlarda her zaman alınır."""
+        return True
+
+    def release_lease(self, key: str, owner: str):
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """Süreç içi, kayıt başına süresi olan LRU."""
+
+    def __init__(self, maxsize: int = LOCAL_MAX_ENTRIES):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            if entry[1] <= time.time():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key: str, amount: int, limit: Optional[int], ttl: float) -> Optional[int]:
+        with self._lock:
+            now = time.time()
+            entry = self._data.get(key)
+            value = entry[0] if entry and entry[1] > now else 0
+            expires_at = entry[1] if entry and entry[1] > now else now + ttl
+            if limit is not None and value + amount > limit:
+                return None
+            self._data[key] = (value + amount, expires_at)
+            return value + amount
+
+    def counter(self, key: str) -> int:
+        return self.get(key, 0)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SqliteCache(CacheBackend):
+    """
+    Aynı makinedeki tüm gunicorn worker'larının paylaştığı sqlite (WAL) deposu.
+    WAL modunda okuyucular yazıcıyı beklemez; her thread kendi bağlantısını kullanır.
+    """
+
+    def __init__(self, path: str = CACHE_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache ("
+                         "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS leases ("
+                         "key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters ("
+                         "key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # fork sonrası üst süreçten kalan bağlantı kullanılmaz
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_with_expiry(self, key: str):
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        if row is None:
+            return _MISSING, 0.0
+        return json.loads(row[0]), row[1]
+
+    def get(self, key: str, default=None):
+        value, _ = self.get_with_expiry(key)
+        return default if value is _MISSING else value
+
+    def set(self, key: str, value: Any, ttl: float):
+        conn = self._connection()
+        conn.execute("INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                     (key, json.dumps(value, ensure_ascii=False), time.time() + ttl))
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+
+    def delete(self, key: str):
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def incr(self, key: str, amount: int, limit: Optional[int], ttl: float) -> Optional[int]:
+        now = time.time()
+        conn = self._connection()
+        # Süresi dolmuş sayaç sıfırdan başlar; limit kontrolü ve artış tek ifadede
+        conn.execute("DELETE FROM counters WHERE key = ? AND expires_at <= ?", (key, now))
+        row = conn.execute(
+            "INSERT INTO counters (key, value, expires_at) SELECT ?, ?, ? WHERE ? IS NULL OR ? <= ? "
+            "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value "
+            "WHERE ? IS NULL OR counters.value + excluded.value <= ? "
+            "RETURNING value",
+            (key, amount, now + ttl, limit, amount, limit, limit, limit)
+        ).fetchone()
+        return row[0] if row else None
+
+    def counter(self, key: str) -> int:
+        row = self._connection().execute(
+            "SELECT value FROM counters WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def acquire_lease(self, key: str, owner: str) -> bool:
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE leases.expires_at <= ?",
+            (key, owner, now + LEASE_SECONDS, now)
+        )
+        return cursor.rowcount == 1
+
+    def release_lease(self, key: str, owner: str):
+        self._connection().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def lease_held(self, key: str) -> bool:
+        row = self._connection().execute(
+            "SELECT 1 FROM leases WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row is not None
+
+
+class TieredCache(CacheBackend):
+    """Önce süreç içi LRU'ya, sonra paylaşımlı katmana bakar."""
+
+    def __init__(self, local: MemoryCache, shared: SqliteCache, local_max_ttl: float = LOCAL_MAX_TTL):
+        self.local = local
+        self.shared = shared
+        self.local_max_ttl = local_max_ttl
+
+    def get(self, key: str, default=None):
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        try:
+            value, expires_at = self.shared.get_with_expiry(key)
+        except sqlite3.Error as e:
+            logger.error(f"Paylaşımlı önbellek okuma hatası: {str(e)}")
+            return default
+        if value is _MISSING:
+            return default
+        self.local.set(key, value, min(self.local_max_ttl, expires_at - time.time()))
+        return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        self.local.set(key, value, min(self.local_max_ttl, ttl))
+        try:
+            self.shared.set(key, value, ttl)
+        except sqlite3.Error as e:
+            logger.error(f"Paylaşımlı önbellek yazma hatası: {str(e)}")
+
+    def delete(self, key: str):
+        self.local.delete(key)
+        try:
+            self.shared.delete(key)
+        except sqlite3.Error as e:
+            logger.error(f"Paylaşımlı önbellek silme hatası: {str(e)}")
+
+    def incr(self, key: str, amount: int, limit: Optional[int], ttl: float) -> Optional[int]:
+        try:
+            return self.shared.incr(key, amount, limit, ttl)
+        except sqlite3.Error as e:
+            logger.error(f"Paylaşımlı sayaç hatası: {str(e)}")
+            return self.local.incr(key, amount, limit, ttl)
+
+    def counter(self, key: str) -> int:
+        try:
+            return self.shared.counter(key)
+        except sqlite3.Error:
+            return self.local.counter(key)
+
+    def acquire_lease(self, key: str, owner: str) -> bool:
+        try:
+            return self.shared.acquire_lease(key, owner)
+        except sqlite3.Error:
+            return True
+
+    def release_lease(self, key: str, owner: str):
+        try:
+            self.shared.release_lease(key, owner)
+        except sqlite3.Error:
+            pass
+
+    def wait_for(self, key: str, timeout: float = LEASE_SECONDS):
+        """Başka bir worker anahtarı çekerken sonucun paylaşımlı katmana düşmesini bekler."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            try:
+                if not self.shared.lease_held(key):
+                    break
+            except sqlite3.Error:
+                break
+            time.sleep(LEASE_POLL_INTERVAL)
+        return _MISSING
+
+
+class Cache:
+    """
+    Namespace'li önbellek. `get_or_fetch` aynı anahtar için aynı anda tek bir
+    çekim yapar: süreç içinde anahtar başına devam eden çekimin Future'ı ile,
+    worker'lar arasında sqlite lease ile. Farklı anahtarlar birbirini beklemez.
+    """
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self._owner = uuid.uuid4().hex
+        # Devam eden çekimler; çekim bitince anahtar silinir, bellek büyümez
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self._refresh_pool: Optional[ThreadPoolExecutor] = None
+
+    def get(self, namespace: str, key: str, default=None):
+        value = self.backend.get(f"{namespace}:{key}", _MISSING)
+        record_cache(namespace, value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float):
+        self.backend.set(f"{namespace}:{key}", value, ttl)
+
+    def delete(self, namespace: str, key: str):
+        self.backend.delete(f"{namespace}:{key}")
+
+    def get_or_fetch(self, namespace: str, key: str, ttl: float, fetch: Callable[[], Any]):
+        """
+        Önbellekte yoksa `fetch()` çağrılır ve sonucu saklanır. `fetch` hata
+        fırlatırsa hiçbir şey saklanmaz; None dönerse de saklanmaz. Aynı anahtarı
+        bekleyen thread'ler çekimin sonucunu (ya da hatasını) paylaşır.
+        """
+        full_key = f"{namespace}:{key}"
+        value = self.backend.get(full_key, _MISSING)
+        if value is not _MISSING:
+            record_cache(namespace, True)
+            return value
+
+        with self._inflight_lock:
+            flight = self._inflight.get(full_key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[full_key] = Future()
+        if not leader:
+            record_cache(namespace, True)
+            return flight.result()
+
+        try:
+            value = self._fetch(namespace, full_key, ttl, fetch)
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(value)
+            return value
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(full_key, None)
+
+    def _fetch(self, namespace: str, full_key: str, ttl: float, fetch: Callable[[], Any]):
+        # Önceki çekim ilk okumadan hemen sonra bitmiş olabilir
+        value = self.backend.get(full_key, _MISSING)
+        if value is not _MISSING:
+            record_cache(namespace, True)
+            return value
+
+        owner = f"{self._owner}:{os.getpid()}"
+        leased = self.backend.acquire_lease(full_key, owner)
+        if not leased and isinstance(self.backend, TieredCache):
+            value = self.backend.wait_for(full_key)
+            if value is not _MISSING:
+                record_cache(namespace, True)
+                return value
+
+        record_cache(namespace, False)
+        try:
+            value = fetch()
+            if value is not None:
+                self.backend.set(full_key, value, ttl)
+            return value
+        finally:
+            if leased:
+                self.backend.release_lease(full_key, owner)
+
+    def get_or_fetch_stale(self, namespace: str, key: str, fresh_ttl: float, stale_ttl: float,
+                           error_ttl: float, fetch: Callable[[], Any]) -> Tuple[Any, float]:
+        """
+        stale-while-revalidate / stale-if-error. (değer, bayatlık_sn) döner;
+        taze değerde bayatlık 0'dır.
+
+        - `fresh_ttl` içinde: önbellekten döner.
+        - `fresh_ttl + stale_ttl` içinde: son iyi değer hemen döner, arka planda
+          tek bir yenileme başlatılır.
+        - Daha eskiyse ya da hiç yoksa: senkron çekilir; çekim hata verirse
+          `error_ttl` boyunca saklanan son iyi değer döner.
+        """
+        value = self.backend.get(f"{namespace}:{key}", _MISSING)
+        if value is not _MISSING:
+            record_cache(namespace, True)
+            return value, 0.0
+
+        last_good = self.backend.get(f"{namespace}:{key}:last_good")
+        age = time.time() - last_good["fetched_at"] if last_good else None
+
+        def fetch_and_keep():
+            fetched = fetch()
+            if fetched is not None:
+                self.backend.set(f"{namespace}:{key}:last_good",
+                                 {"value": fetched, "fetched_at": time.time()}, error_ttl)
+            return fetched
+
+        if last_good and age < fresh_ttl + stale_ttl:
+            inc("cache_requests_total", (namespace, "stale"))
+            self._refresh_in_background(namespace, key, fresh_ttl, fetch_and_keep)
+            return last_good["value"], age
+
+        try:
+            return self.get_or_fetch(namespace, key, fresh_ttl, fetch_and_keep), 0.0
+        except Exception as e:
+            if not last_good:
+                raise
+            inc("cache_requests_total", (namespace, "stale_if_error"))
+            logger.warning(f"{namespace} çekilemedi, {age:.0f} sn önceki veri kullanılıyor: {str(e)}")
+            return last_good["value"], age
+
+    def peek_stale(self, namespace: str, key: str) -> Optional[Tuple[Any, float]]:
+        """
+        Çekim yapmadan (değer, bayatlık_sn): taze değer 0, yoksa son iyi değer ve yaşı,
+        o da yoksa None. Kendi çekimini yapan çağıranlar (ör. async toplu istekler) için.
+        """
+        value = self.backend.get(f"{namespace}:{key}", _MISSING)
+        record_cache(namespace, value is not _MISSING)
+        if value is not _MISSING:
+            return value, 0.0
+        last_good = self.backend.get(f"{namespace}:{key}:last_good")
+        if last_good:
+            return last_good["value"], time.time() - last_good["fetched_at"]
+        return None
+
+    def store_fresh(self, namespace: str, key: str, value: Any, fresh_ttl: float, error_ttl: float):
+        """get_or_fetch_stale ile aynı anahtarlara yazar; iki yol aynı önbelleği paylaşır."""
+        self.backend.set(f"{namespace}:{key}", value, fresh_ttl)
+        self.backend.set(f"{namespace}:{key}:last_good", {"value": value, "fetched_at": time.time()}, error_ttl)
+
+    def _refresh_in_background(self, namespace: str, key: str, ttl: float, fetch: Callable[[], Any]):
+        full_key = f"{namespace}:{key}"
+        with self._refresh_lock:
+            if full_key in self._refreshing:
+                return
+            self._refreshing.add(full_key)
+            if self._refresh_pool is None:
+                self._refresh_pool = ThreadPoolExecutor(max_workers=REFRESH_WORKERS,
+                                                        thread_name_prefix="cache-refresh")
+
+        def refresh():
+            try:
+                self.get_or_fetch(namespace, key, ttl, fetch)
+            except Exception as e:
+                logger.warning(f"Arka plan yenileme başarısız ({full_key}): {str(e)}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(full_key)
+
+        self._refresh_pool.submit(refresh)
+
+
+def _create_backend() -> CacheBackend:
+    if CACHE_BACKEND == "memory":
+        return MemoryCache()
+    try:
+        return TieredCache(MemoryCache(), SqliteCache(CACHE_DB_PATH))
+    except sqlite3.Error as e:
+        logger.error(f"Paylaşımlı önbellek açılamadı, yalnızca bellek içi kullanılacak: {str(e)}")
+        return MemoryCache()
+
+
+_cache: Optional[Cache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Cache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = Cache(_create_backend())
+    return _cache
+
+
+def set_cache_backend(backend: CacheBackend):
+    """Test ve benchmark'larda farklı bir katman kullanmak için."""
+    global _cache
+    with _cache_lock:
+        _cache = Cache(backend)
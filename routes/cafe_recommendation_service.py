@@ -2,9 +2,60 @@ import requests
 from math import radians, cos, sin, sqrt, atan2
 import os 
 from dotenv import load_dotenv
+from routes.cache_backend import get_cache
+from routes.http_session import get_session
+from routes.metrics import track_upstream
+from routes.resilience import call_upstream, mark_stale
+from routes.response_encoding import note_cached, stamp_version
 
 load_dotenv()
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
+PLACES_URL = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+PLACES_TTL = 6 * 3600       # Yakındaki kafeler saatler içinde pek değişmez
+PLACES_STALE_TTL = 18 * 3600
+PLACES_ERROR_TTL = 7 * 24 * 3600
+PLACES_RADIUS = 2000
+
+
+class PlacesError(Exception):
+    def __init__(self, status_code: int, details: str):
+        super().__init__(f"Places API {status_code}")
+        self.status_code = status_code
+        self.details = details
+
+
+def nearby_cafes(lat: float, lon: float) -> dict:
+    """
+    Places nearbysearch yanıtı. Koordinatlar ~10 m'ye yuvarlanarak anahtarlanır,
+    böylece yakın konumlar aynı önbellek kaydını kullanır.
+    """
+    lat, lon = round(lat, 4), round(lon, 4)
+
+    def attempt():
+        params = {
+            "location": f"{lat},{lon}",
+            "radius": PLACES_RADIUS,
+            "type": "cafe",
+            "key": GOOGLE_MAPS_API_KEY
+        }
+        with track_upstream("places", "nearbysearch"):
+            response = get_session().get(PLACES_URL, params=params, timeout=10)
+        if response.status_code != 200:
+            raise PlacesError(response.status_code, response.text)
+        return response.json()
+
+    try:
+        data, stale_age = get_cache().get_or_fetch_stale(
+            "places", f"{lat},{lon}", PLACES_TTL, PLACES_STALE_TTL, PLACES_ERROR_TTL,
+            lambda: stamp_version(call_upstream("places", attempt))
+        )
+    except requests.exceptions.RequestException as e:
+        # Kota, açık devre kesici veya zaman aşımı ve elde eski veri yok
+        raise PlacesError(503, str(e))
+    note_cached("places", f"{lat},{lon}", data)
+    if stale_age:
+        mark_stale(stale_age)
+    return data
 
 class CafeRecommendationService: 
 
@@ -17,16 +68,11 @@ class CafeRecommendationService:
     @staticmethod
     def find_top5_cafes(lat: float, lon: float) -> list:
         """Güncellenmiş parametre kullanımı"""
-        url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
-        params = {
-            "location": f"{lat},{lon}",  # Doğrudan float değerleri kullan
-            "radius": 2000,
-            "type": "cafe",
-            "key": GOOGLE_MAPS_API_KEY
-        }
-
-        response = requests.get(url, params=params)
-        data = response.json()
+        lat, lon = float(lat), float(lon)
+        try:
+            data = nearby_cafes(lat, lon)
+        except PlacesError:
+            return {"error": "Kafe bulunamadı"}
 
         if "results" not in data or not data["results"]:
             return {"error": "Kafe bulunamadı"}
@@ -99,18 +145,10 @@ class CafeRecommendationService:
             return {"error": "Geçersiz koordinat değerleri. Lütfen sayısal değerler girin."}
         
         """Parametreler artık direkt float olarak alınıyor"""
-        url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
-        params = {
-            "location": f"{latitude},{longitude}",  # Float direkt kullanım
-            "radius": 2000,
-            "type": "cafe",
-            "key": GOOGLE_MAPS_API_KEY
-        }
-
-        response = requests.get(url, params=params)
-        if response.status_code != 200:
-            return {"error": "API isteği başarısız oldu", "details": response.text}
-        data = response.json()
+        try:
+            data = nearby_cafes(latitude, longitude)
+        except PlacesError as e:
+            return {"error": "API isteği başarısız oldu", "details": e.details}
         if not data.get("results"):
             return {"error": "Yakında kafe bulunamadı", "details": data}
         # Filtreleme: Adında veya türünde "kafe", "cafe", "coffee" geçen yerleri seç
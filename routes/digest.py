@@ -0,0 +1,308 @@
+"""
+Kullanıcının seçtiği saatte sabah / akşam hava durumu özeti.
+
+Kullanıcılar bildirim dakikası ve konum hücresine göre /digest_index altında
+gruplanır. Her dakika:
+  1. `PREFETCH_MINUTES` sonra gönderilecek kova okunur ve her hücrenin tahmini
+     bir kez çekilir (arka plan önceliği).
+  2. Zamanı gelen kova gönderilir: mesaj hücre başına bir kez üretilir, push'lar
+     500'lük multicast'lerle, bildirim kayıtları multi-path update'lerle yazılır.
+
+Kullanıcı başına iş yalnızca indeks girişidir; tahmin ve mesaj maliyeti hücre
+sayısıyla büyür. Zamanlayıcı tek bir süreçte çalışmalıdır:
+    python -m routes.digest run          # ayrı süreç olarak
+    DIGEST_SCHEDULER=1 (uygulama içinde)  # worker'lardan biri çalıştırır
+Mevcut kullanıcılar için indeks bir kez oluşturulur:
+    python -m routes.digest reindex
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from zoneinfo import ZoneInfo
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+from dotenv import load_dotenv
+
+from models.notification import send_bulk_push
+from models.repository import DigestIndexRepository, NotificationRepository, Repository
+from routes.background_jobs import register_job
+from routes.cache_backend import get_cache
+from routes.quota_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, priority
+from routes.tracing import submit
+from routes.weather import fetch_timeline
+from routes.weather_history import cell_id, cell_location
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DIGEST_TIMEZONE = ZoneInfo(os.getenv("DIGEST_TIMEZONE", "Europe/Istanbul"))
+PREFETCH_MINUTES = int(os.getenv("DIGEST_PREFETCH_MINUTES", "5"))
+EVENING_HOUR = 15                 # Bu saatten sonraki özetler ertesi günü anlatır
+DEFAULT_MINUTE = "0800"
+FETCH_WORKERS = 8
+SEND_WORKERS = 8
+WRITE_CHUNK = 500                 # Tek multi-path update'teki kullanıcı sayısı
+REINDEX_PAGE = 1000
+CLAIM_TTL = 2 * 86400
+
+_index_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def minute_key(notification_time: Optional[str]) -> str:
+    """"8:00" / "08:00" -> "0800"; geçersiz değerler varsayılan saate düşer."""
+    try:
+        hour, minute = (int(part) for part in str(notification_time).split(":")[:2])
+    except (TypeError, ValueError):
+        return DEFAULT_MINUTE
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        return DEFAULT_MINUTE
+    return f"{hour:02d}{minute:02d}"
+
+
+def slot_for(profile: dict) -> Optional[str]:
+    location = profile.get("location")
+    if not location:
+        return None
+    return f"{minute_key(profile.get('notification_time'))}/{cell_id(location)}"
+
+
+def _tokens(devices: Optional[dict]) -> List[str]:
+    return [device["token"] for device in (devices or {}).values()
+            if isinstance(device, dict) and "token" in device]
+
+
+# -- İndeks bakımı --------------------------------------------------------------
+
+
+def index_users(user_ids: Iterable[str]):
+    """Kullanıcıların indeks girişlerini profil ve cihazlarına göre yeniden yazar."""
+    user_ids = list(user_ids)
+    repository = Repository()
+    values = repository.get_many([f'/users/{uid}' for uid in user_ids] +
+                                 [f'/devices/{uid}' for uid in user_ids])
+    entries = {}
+    for uid in user_ids:
+        profile = values[f'/users/{uid}']
+        slot = slot_for(profile) if profile else None
+        if slot:
+            entries[uid] = (profile.get("digest_slot"), slot, _tokens(values[f'/devices/{uid}']))
+    DigestIndexRepository().place(entries)
+
+
+def index_user_async(user_id: str):
+    """Konum / cihaz değişikliklerinden sonra: indeks yazımı yanıtı bekletmez."""
+    def run():
+        try:
+            index_users([user_id])
+        except Exception as e:
+            logger.warning(f"Özet indeksi güncellenemedi ({user_id}): {str(e)}")
+
+    global _index_pool
+    with _pool_lock:
+        if _index_pool is None:
+            _index_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="digest-index")
+    submit(_index_pool, run)
+
+
+def index_profiles(profiles: Dict[str, dict]):
+    """Yeni oluşturulan kullanıcılar (henüz cihazı yok) için okumasız indeksleme."""
+    entries = {uid: (None, slot, []) for uid, slot in
+               ((uid, slot_for(profile)) for uid, profile in profiles.items()) if slot}
+    uids = list(entries)
+    for start in range(0, len(uids), WRITE_CHUNK):
+        DigestIndexRepository().place({uid: entries[uid] for uid in uids[start:start + WRITE_CHUNK]})
+
+
+def rebuild_index(page_size: int = REINDEX_PAGE) -> int:
+    """Tüm kullanıcıları sayfa sayfa tarar; kaldığı yerden sürdürülebilir değildir, idempotenttir."""
+    repository = DigestIndexRepository()
+    last_uid, total = None, 0
+    while True:
+        page = repository.page_users(last_uid, page_size)
+        if not page:
+            return total
+        devices = repository.get_many([f'/devices/{uid}' for uid in page])
+        entries = {}
+        for uid, profile in page.items():
+            slot = slot_for(profile) if isinstance(profile, dict) else None
+            if slot:
+                entries[uid] = (profile.get("digest_slot"), slot, _tokens(devices[f'/devices/{uid}']))
+        for start in range(0, len(entries), WRITE_CHUNK):
+            chunk = list(entries)[start:start + WRITE_CHUNK]
+            repository.place({uid: entries[uid] for uid in chunk})
+        total += len(entries)
+        last_uid = list(page)[-1]
+        logger.info(f"Özet indeksi: {total} kullanıcı")
+
+
+# -- Gönderim -------------------------------------------------------------------
+
+
+def render(forecast: dict, evening: bool) -> tuple:
+    """Hücre için (başlık, metin); aynı hücredeki herkes aynı mesajı alır."""
+    days = forecast.get("days") or [{}]
+    day = days[1] if evening and len(days) > 1 else days[0]
+    title = "🌙 Yarının hava durumu" if evening else "☀️ Bugünün hava durumu"
+    body = (f"{day.get('conditions', 'Bilinmiyor')}, "
+            f"{day.get('tempmin', 0):.0f}–{day.get('tempmax', 0):.0f}°C, "
+            f"yağış olasılığı %{day.get('precipprob') or 0:.0f}")
+    return title, body
+
+
+@dataclass
+class PreparedBucket:
+    minute: str
+    cells: Dict[str, Dict[str, object]]                 # cell -> uid -> tokens
+    forecasts: Dict[str, dict] = field(default_factory=dict)
+
+
+class DigestEngine:
+    def __init__(self, timezone: ZoneInfo = DIGEST_TIMEZONE, lead_minutes: int = PREFETCH_MINUTES):
+        self.timezone = timezone
+        self.lead_minutes = lead_minutes
+        self._prepared: Dict[str, PreparedBucket] = {}
+        self._lock = threading.Lock()
+        self._fetch_pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="digest-fetch")
+        self._send_pool = ThreadPoolExecutor(max_workers=SEND_WORKERS, thread_name_prefix="digest-send")
+        self._scheduler: Optional[BackgroundScheduler] = None
+
+    def _fetch_forecasts(self, bucket: PreparedBucket, lane: str):
+        def fetch(cell):
+            with priority(lane):
+                return fetch_timeline(cell_location(cell), "next7days", "days", "digest")
+
+        missing = [cell for cell in bucket.cells if cell not in bucket.forecasts]
+        futures = {cell: submit(self._fetch_pool, fetch, cell) for cell in missing}
+        for cell, future in futures.items():
+            try:
+                bucket.forecasts[cell] = future.result()
+            except Exception as e:
+                logger.warning(f"Özet tahmini çekilemedi ({cell}, {lane}): {str(e)}")
+
+    def prepare(self, at: datetime) -> PreparedBucket:
+        minute = at.strftime("%H%M")
+        bucket = PreparedBucket(minute, DigestIndexRepository().bucket(minute))
+        # Kota sıkışıksa atlanan hücreler gönderim anında etkileşimli öncelikle tekrar denenir
+        self._fetch_forecasts(bucket, PRIORITY_BACKGROUND)
+        with self._lock:
+            self._prepared[minute] = bucket
+        users = sum(len(users) for users in bucket.cells.values())
+        logger.info(f"Özet {minute} hazır: {len(bucket.cells)} hücre, {users} kullanıcı, "
+                    f"{len(bucket.forecasts)} tahmin")
+        return bucket
+
+    def _claim(self, at: datetime) -> bool:
+        """Aynı dakikayı makinedeki yalnızca bir süreç gönderir."""
+        key = f"digest:{at.strftime('%Y%m%d%H%M')}"
+        return get_cache().backend.incr(key, 1, 1, CLAIM_TTL) is not None
+
+    def _send_cell(self, notification_id: str, users: Dict[str, object], title: str, body: str,
+                   metadata: dict) -> dict:
+        uids = list(users)
+        record = {
+            "type": "daily_digest",
+            "message": body,
+            "timestamp": datetime.now().isoformat(),
+            "read": False,
+            "metadata": metadata
+        }
+        notifications = NotificationRepository()
+        for start in range(0, len(uids), WRITE_CHUNK):
+            notifications.create_many(notification_id, {uid: record for uid in uids[start:start + WRITE_CHUNK]})
+        tokens = [token for uid in uids if isinstance(users[uid], list) for token in users[uid]]
+        return send_bulk_push(tokens, title, body, {"type": "daily_digest", "notification_id": notification_id})
+
+    def fire(self, at: datetime) -> dict:
+        minute = at.strftime("%H%M")
+        with self._lock:
+            bucket = self._prepared.pop(minute, None)
+        if not self._claim(at):
+            return {"minute": minute, "skipped": "başka süreç gönderdi"}
+        if bucket is None:
+            bucket = PreparedBucket(minute, DigestIndexRepository().bucket(minute))
+        self._fetch_forecasts(bucket, PRIORITY_INTERACTIVE)
+
+        evening = at.hour >= EVENING_HOUR
+        notification_id = f"digest_{at.strftime('%Y%m%d_%H%M')}"
+        futures = []
+        for cell, users in bucket.cells.items():
+            forecast = bucket.forecasts.get(cell)
+            if forecast is None:
+                continue
+            title, body = render(forecast, evening)
+            futures.append(submit(self._send_pool, self._send_cell, notification_id, users, title, body,
+                                  {"cell": cell, "minute": minute}))
+
+        stats = {"minute": minute, "cells": len(bucket.cells), "sent_cells": len(futures),
+                 "users": sum(len(users) for cell, users in bucket.cells.items() if cell in bucket.forecasts),
+                 "push_success": 0, "push_failure": 0}
+        for future in futures:
+            try:
+                result = future.result()
+                stats["push_success"] += result["success"]
+                stats["push_failure"] += result["failure"]
+            except Exception as e:
+                logger.error(f"Özet gönderim hatası ({minute}): {str(e)}")
+        logger.info(f"Özet gönderildi: {stats}")
+        return stats
+
+    def tick(self, now: Optional[datetime] = None):
+        now = (now or datetime.now(self.timezone)).replace(second=0, microsecond=0)
+        started = time.monotonic()
+        self.fire(now)
+        if self.lead_minutes:
+            self.prepare(now + timedelta(minutes=self.lead_minutes))
+        logger.debug(f"Özet tick {now:%H:%M}: {time.monotonic() - started:.1f} sn")
+
+    def start(self):
+        self._scheduler = BackgroundScheduler(timezone=self.timezone)
+        self._scheduler.add_job(self.tick, CronTrigger(second=0, timezone=self.timezone),
+                                max_instances=1, coalesce=True, misfire_grace_time=30)
+        self._scheduler.start()
+        logger.info(f"Özet zamanlayıcısı başladı ({self.timezone}, {self.lead_minutes} dk önden hazırlık)")
+
+    def shutdown(self):
+        if self._scheduler:
+            self._scheduler.shutdown(wait=False)
+
+
+def init_digest(app):
+    """DIGEST_SCHEDULER=1 ise zamanlayıcıyı arka plan işi olarak kaydeder (bkz. routes/background_jobs.py)."""
+    if os.getenv("DIGEST_SCHEDULER", "").lower() in ("1", "true", "yes"):
+        def start():
+            app.extensions["digest_engine"] = engine = DigestEngine()
+            engine.start()
+        register_job("digest", start)
+
+
+if __name__ == "__main__":
+    from routes.bulk_import import init_firebase
+
+    parser = argparse.ArgumentParser(description="Sabah / akşam hava durumu özetleri")
+    parser.add_argument("command", choices=["run", "reindex", "send"])
+    parser.add_argument("--minute", help="send için HH:MM (varsayılan: şimdi)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    init_firebase()
+    if args.command == "reindex":
+        logger.info(f"İndekslenen kullanıcı: {rebuild_index()}")
+    elif args.command == "send":
+        now = datetime.now(DIGEST_TIMEZONE)
+        if args.minute:
+            hour, minute = (int(part) for part in args.minute.split(":"))
+            now = now.replace(hour=hour, minute=minute)
+        DigestEngine(lead_minutes=0).fire(now.replace(second=0, microsecond=0))
+    else:
+        DigestEngine().start()
+        while True:
+            time.sleep(3600)
@@ -0,0 +1,403 @@
+"""
+Sağlık ölçümleri için vektörel akış dedektörü.
+
+EmergencyMonitor, acil durum kişisi tanımlı kullanıcıların giyilebilir cihazdan gelen
+son ölçümlerini MONITOR_INTERVAL_SECONDS'da bir okur (sentetik veri kullanılmaz; ölçümü
+olmayan kullanıcı o tick atlanır); acil duruma geçişler olay yöneticisine
+(IncidentManager.open_from_event) iletilir. İzleyici tek bir süreçte çalışmalıdır:
+    python -m routes.emergency_detector run     # ayrı süreç olarak
+    EMERGENCY_MONITOR=1 (uygulama içinde)        # worker'lardan biri çalıştırır
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from firebase_admin import db
+
+from models.repository import UserRepository
+from routes.background_jobs import register_job
+from routes.health import get_health_sample
+from routes.metrics import inc, register
+from routes.tracing import submit
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# check_emergency ile aynı sabit eşikler
+HEART_RATE_LOW = 50
+HEART_RATE_HIGH = 120
+SLEEP_LIMIT_HOURS = 12
+
+EWMA_ALPHA = 0.1        # Bazal nabız için EWMA katsayısı
+Z_THRESHOLD = 3.5       # Kişisel bazalden sapma eşiği (z-skoru)
+WARMUP_SAMPLES = 10     # z-skoru kuralı bu kadar örnekten sonra devreye girer
+SUSTAIN_TICKS = 3       # Alarm için art arda ihlal sayısı
+CLEAR_TICKS = 5         # Alarmın kapanması için art arda normal ölçüm sayısı
+
+# İhlal sebepleri (bit maskesi)
+REASON_HR_LOW = 1
+REASON_HR_HIGH = 2
+REASON_HR_ZSCORE = 4
+REASON_INACTIVE = 8
+
+MONITOR_INTERVAL_SECONDS = float(os.getenv("EMERGENCY_MONITOR_INTERVAL_SECONDS", "60"))
+USER_REFRESH_SECONDS = 600      # İzlenen kullanıcı listesi bu aralıkla yeniden taranır
+USER_PAGE_SIZE = 1000
+READ_WORKERS = 8
+
+REASON_NAMES = {
+    REASON_HR_LOW: "heart_rate_low",
+    REASON_HR_HIGH: "heart_rate_high",
+    REASON_HR_ZSCORE: "heart_rate_deviation",
+    REASON_INACTIVE: "inactivity",
+}
+
+
+def reason_names(mask: int) -> List[str]:
+    return [name for bit, name in REASON_NAMES.items() if mask & bit]
+
+
+class EmergencyDetector:
+    """
+    Tüm kullanıcıların sağlık ölçümlerini tek seferde değerlendiren akış dedektörü.
+
+    Kullanıcı başına durum (EWMA bazal, varyans, ihlal sayaçları) sabit tipli NumPy
+    dizilerinde tutulur; her tick binlerce kullanıcı vektörel olarak işlenir ve
+    yalnızca durum değişimlerinde (normal -> acil, acil -> normal) olay üretilir.
+    """
+
+    def __init__(self, capacity: int = 1024, alpha: float = EWMA_ALPHA,
+                 z_threshold: float = Z_THRESHOLD, sustain_ticks: int = SUSTAIN_TICKS,
+                 clear_ticks: int = CLEAR_TICKS, warmup_samples: int = WARMUP_SAMPLES):
+        self.alpha = np.float32(alpha)
+        self.z_threshold = np.float32(z_threshold)
+        self.sustain_ticks = sustain_ticks
+        self.clear_ticks = clear_ticks
+        self.warmup_samples = warmup_samples
+
+        self._index: Dict[str, int] = {}
+        self._user_ids: List[str] = []
+        self._lock = threading.Lock()
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        self.hr_mean = np.zeros(capacity, dtype=np.float32)
+        self.hr_var = np.zeros(capacity, dtype=np.float32)
+        self.samples = np.zeros(capacity, dtype=np.uint16)
+        self.breach_ticks = np.zeros(capacity, dtype=np.uint16)
+        self.normal_ticks = np.zeros(capacity, dtype=np.uint16)
+        self.reasons = np.zeros(capacity, dtype=np.uint8)
+        self.active = np.zeros(capacity, dtype=bool)
+
+    def _grow(self, capacity: int):
+        old = (self.hr_mean, self.hr_var, self.samples, self.breach_ticks,
+               self.normal_ticks, self.reasons, self.active)
+        size = len(self._user_ids)
+        self._allocate(capacity)
+        new = (self.hr_mean, self.hr_var, self.samples, self.breach_ticks,
+               self.normal_ticks, self.reasons, self.active)
+        for src, dst in zip(old, new):
+            dst[:size] = src[:size]
+
+    @property
+    def size(self) -> int:
+        return len(self._user_ids)
+
+    def register(self, user_ids: Iterable[str]) -> np.ndarray:
+        """Kullanıcıları izlemeye alır ve dizi indekslerini döner (mevcutlar korunur)."""
+        with self._lock:
+            indices = []
+            for user_id in user_ids:
+                idx = self._index.get(user_id)
+                if idx is None:
+                    idx = len(self._user_ids)
+                    self._index[user_id] = idx
+                    self._user_ids.append(user_id)
+                indices.append(idx)
+
+            if len(self._user_ids) > len(self.hr_mean):
+                self._grow(max(len(self._user_ids), len(self.hr_mean) * 2))
+            return np.asarray(indices, dtype=np.int64)
+
+    def user_id(self, idx: int) -> str:
+        return self._user_ids[idx]
+
+    def is_active(self, user_id: str) -> bool:
+        idx = self._index.get(user_id)
+        return bool(idx is not None and self.active[idx])
+
+    def update(self, idx: np.ndarray, heart_rate: np.ndarray, steps: np.ndarray,
+               sleep_duration: np.ndarray) -> List[Dict]:
+        """
+        Bir tick'lik ölçümü işler. `idx` register() ile alınan indekslerdir; aynı
+        tick içinde bir kullanıcı en fazla bir kez yer almalıdır. Bilinmeyen adım
+        sayısı -1, uyku süresi NaN verilir; bu durumda hareketsizlik kuralı uygulanmaz.
+        Yalnızca durum geçişlerini olay listesi olarak döner.
+        """
+        hr = np.asarray(heart_rate, dtype=np.float32)
+        steps = np.asarray(steps)
+        sleep = np.asarray(sleep_duration, dtype=np.float32)
+
+        with self._lock:
+            mean = self.hr_mean[idx]
+            var = self.hr_var[idx]
+            samples = self.samples[idx]
+
+            # Kişisel bazalden sapma (yeterli örnek yoksa devre dışı)
+            std = np.sqrt(var) + np.float32(1.0)
+            z = np.abs(hr - mean) / std
+            warm = samples >= self.warmup_samples
+
+            reasons = np.zeros(len(idx), dtype=np.uint8)
+            reasons |= np.where(hr < HEART_RATE_LOW, REASON_HR_LOW, 0).astype(np.uint8)
+            reasons |= np.where(hr > HEART_RATE_HIGH, REASON_HR_HIGH, 0).astype(np.uint8)
+            reasons |= np.where(warm & (z > self.z_threshold), REASON_HR_ZSCORE, 0).astype(np.uint8)
+            reasons |= np.where((steps == 0) & (sleep > SLEEP_LIMIT_HOURS), REASON_INACTIVE, 0).astype(np.uint8)
+            breach = reasons != 0
+
+            # Bazal yalnızca normal ölçümlerle güncellenir, ilk ölçüm bazalı başlatır
+            first = samples == 0
+            delta = hr - mean
+            learn = ~breach | first
+            new_mean = np.where(first, hr, mean + self.alpha * delta)
+            new_var = np.where(first, np.float32(0.0),
+                               (1 - self.alpha) * (var + self.alpha * delta * delta))
+            self.hr_mean[idx] = np.where(learn, new_mean, mean)
+            self.hr_var[idx] = np.where(learn, new_var, var)
+            self.samples[idx] = np.minimum(samples.astype(np.int32) + learn, 0xFFFF)
+
+            # Sayaçlar uint16 sınırında doyuma ulaşır, taşma olmaz
+            breach_ticks = np.where(breach, np.minimum(self.breach_ticks[idx].astype(np.int32) + 1, 0xFFFF), 0)
+            normal_ticks = np.where(breach, 0, np.minimum(self.normal_ticks[idx].astype(np.int32) + 1, 0xFFFF))
+            self.breach_ticks[idx] = breach_ticks
+            self.normal_ticks[idx] = normal_ticks
+            self.reasons[idx] = np.where(breach, self.reasons[idx] | reasons, 0)
+
+            was_active = self.active[idx]
+            raised = ~was_active & (breach_ticks >= self.sustain_ticks)
+            cleared = was_active & (normal_ticks >= self.clear_ticks)
+            self.active[idx] = (was_active | raised) & ~cleared
+
+            if not raised.any() and not cleared.any():
+                return []
+
+            events = []
+            now = datetime.now().isoformat()
+            for pos in np.flatnonzero(raised):
+                user_idx = int(idx[pos])
+                events.append({
+                    "user_id": self._user_ids[user_idx],
+                    "state": "emergency",
+                    "reasons": reason_names(int(self.reasons[user_idx])),
+                    "heart_rate": float(hr[pos]),
+                    "baseline": round(float(self.hr_mean[user_idx]), 1),
+                    "timestamp": now,
+                })
+            for pos in np.flatnonzero(cleared):
+                user_idx = int(idx[pos])
+                events.append({
+                    "user_id": self._user_ids[user_idx],
+                    "state": "resolved",
+                    "heart_rate": float(hr[pos]),
+                    "timestamp": now,
+                })
+            return events
+
+    def observe(self, user_id: str, health_data: dict) -> List[Dict]:
+        """Tek kullanıcılık ölçüm için kısa yol (ör. generate_synthetic_health_data çıktısı)."""
+        heart_rate, steps, sleep_duration = _sample_values(health_data)
+        return self.update(self.register([user_id]), [heart_rate], [steps], [sleep_duration])
+
+
+def save_emergency_event(event: Dict):
+    """Acil duruma geçişi check_emergency ile aynı formatta Firebase'e kaydeder."""
+    if event["state"] != "emergency":
+        return
+    try:
+        db.reference(f'/emergency_alerts/{event["user_id"]}').push().set({
+            "message": "Acil durum tespit edildi!",
+            "data": event,
+            "timestamp": event["timestamp"]
+        })
+    except Exception as e:
+        logger.error(f"Acil durum kaydı hatası: {str(e)}")
+
+
+def monitored_users(page_size: int = USER_PAGE_SIZE) -> List[str]:
+    """Acil durum kişisi tanımlı kullanıcılar (kullanıcılar sayfa sayfa taranır)."""
+    repository = UserRepository()
+    user_ids, cursor = [], None
+    while True:
+        page = repository.page(cursor, page_size)
+        user_ids.extend(uid for uid, profile in page.items()
+                        if isinstance(profile, dict) and profile.get("emergency_contacts"))
+        if len(page) < page_size:
+            return user_ids
+        cursor = next(reversed(page))
+
+
+register("emergency_monitor_reads_total", "counter",
+         "Acil durum izleyicisinin ölçüm okumaları", ("result",))
+
+
+def _sample_values(data: dict) -> tuple:
+    """(heart_rate, steps, sleep_duration); adım / uyku bilinmiyorsa -1 / NaN."""
+    steps, sleep = data.get("steps"), data.get("sleep_duration")
+    return (float(data["heart_rate"]), -1 if steps is None else int(steps),
+            float("nan") if sleep is None else float(sleep))
+
+
+class HealthBatchReader:
+    """
+    EmergencyMonitor için ölçüm kaynağı: izlenen kullanıcıların son gerçek ölçümlerini
+    `read(user_id)` ile paralel okur (varsayılan: routes.health.get_health_sample).
+    Ölçümü olmayan ya da heart_rate alanı geçersiz kullanıcılar o tick için atlanır;
+    atlananların sayısı uyarı olarak loglanır ve emergency_monitor_reads_total'a yazılır.
+    """
+
+    def __init__(self, read: Callable[[str], Optional[dict]] = get_health_sample,
+                 users: Callable[[], List[str]] = monitored_users,
+                 refresh_seconds: float = USER_REFRESH_SECONDS):
+        self.read = read
+        self.users = users
+        self.refresh_seconds = refresh_seconds
+        self._user_ids: List[str] = []
+        self._refreshed_at = 0.0
+        self._pool = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="emergency-read")
+
+    def _current_users(self) -> List[str]:
+        if time.monotonic() - self._refreshed_at >= self.refresh_seconds:
+            try:
+                self._user_ids = self.users()
+                self._refreshed_at = time.monotonic()
+            except Exception as e:
+                # Liste yenilenemezse eskisiyle devam edilir
+                logger.error(f"İzlenen kullanıcılar okunamadı: {str(e)}")
+        return self._user_ids
+
+    def __call__(self) -> tuple:
+        user_ids = self._current_users()
+        futures = {user_id: submit(self._pool, self.read, user_id) for user_id in user_ids}
+        read_ids, heart_rate, steps, sleep = [], [], [], []
+        missing, failed = [], []
+        for user_id, future in futures.items():
+            try:
+                data = future.result()
+                if not data:
+                    missing.append(user_id)
+                    continue
+                values = _sample_values(data)
+            except Exception as e:
+                failed.append(user_id)
+                logger.debug(f"Ölçüm okunamadı ({user_id}): {str(e)}")
+                continue
+            read_ids.append(user_id)
+            heart_rate.append(values[0])
+            steps.append(values[1])
+            sleep.append(values[2])
+
+        inc("emergency_monitor_reads_total", ("ok",), len(read_ids))
+        inc("emergency_monitor_reads_total", ("missing",), len(missing))
+        inc("emergency_monitor_reads_total", ("error",), len(failed))
+        if missing or failed:
+            logger.warning(f"{len(missing) + len(failed)}/{len(user_ids)} kullanıcının ölçümü bu tick "
+                           f"değerlendirilemedi (veri yok: {len(missing)}, hatalı: {len(failed)}; "
+                           f"ör. {(missing + failed)[0]})")
+        return (read_ids, np.asarray(heart_rate, dtype=np.float32), np.asarray(steps, dtype=np.int32),
+                np.asarray(sleep, dtype=np.float32))
+
+
+def incident_event_handler(incidents) -> Callable[[Dict], None]:
+    """Acil duruma geçişleri kaydeder ve olay yöneticisinde olay açar (SMS + push bir kez)."""
+    def on_event(event: Dict):
+        if event["state"] != "emergency":
+            # Kapanış kullanıcı onayıyla yapılır; dedektörün normale dönüşü yalnızca loglanır
+            logger.info(f"Ölçümler normale döndü: {event['user_id']}")
+            return
+        save_emergency_event(event)
+        incidents.open_from_event(event["user_id"], event)
+    return on_event
+
+
+class EmergencyMonitor:
+    """
+    Dedektörü arka planda periyodik olarak çalıştırır.
+    `read_batch` her tick için (user_ids, heart_rate, steps, sleep_duration) döndürmelidir.
+    """
+
+    def __init__(self, detector: EmergencyDetector, read_batch: Callable,
+                 on_event: Callable[[Dict], None] = save_emergency_event,
+                 interval: float = MONITOR_INTERVAL_SECONDS):
+        self.detector = detector
+        self.read_batch = read_batch
+        self.on_event = on_event
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def tick(self) -> List[Dict]:
+        user_ids, heart_rate, steps, sleep_duration = self.read_batch()
+        if len(user_ids) == 0:
+            return []
+        idx = self.detector.register(user_ids)
+        events = self.detector.update(idx, heart_rate, steps, sleep_duration)
+        for event in events:
+            try:
+                self.on_event(event)
+            except Exception as e:
+                logger.error(f"Acil durum olayı işlenemedi: {str(e)}")
+        return events
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Acil durum izleme hatası: {str(e)}")
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="emergency-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+
+def init_emergency_monitor(app, on_event: Callable[[Dict], None]):
+    """EMERGENCY_MONITOR=1 ise izleyiciyi arka plan işi olarak kaydeder (bkz. routes/background_jobs.py)."""
+    if os.getenv("EMERGENCY_MONITOR", "").lower() in ("1", "true", "yes"):
+        def start():
+            app.extensions["emergency_monitor"] = monitor = EmergencyMonitor(
+                EmergencyDetector(), HealthBatchReader(), on_event=on_event)
+            monitor.start()
+        register_job("emergency_monitor", start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sağlık ölçümleri için acil durum izleyicisi")
+    parser.add_argument("command", choices=["run"])
+    parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    # Olaylar uygulamanın bildirim / eskalasyon akışıyla açılır (Firebase de orada başlatılır)
+    from app import incident_manager
+
+    EmergencyMonitor(EmergencyDetector(), HealthBatchReader(),
+                     on_event=incident_event_handler(incident_manager)).start()
+    while True:
+        time.sleep(3600)
@@ -0,0 +1,391 @@
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from firebase_admin import db
+
+from routes.cache_backend import CacheBackend, TieredCache, get_cache
+from routes.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# Olay durumları
+STATE_OPEN = "open"
+STATE_ACKNOWLEDGED = "acknowledged"
+STATE_RESOLVED = "resolved"
+
+DEBOUNCE_SECONDS = 30          # Bu süre içindeki tekrar tetiklemeler son sonucu döner
+REOPEN_WINDOW_SECONDS = 600    # Kapanan olay bu süre içinde tekrar tetiklenirse aynı kayıt yeniden açılır (bildirim yine yapılır)
+ESCALATION_SECONDS = (300, 900)  # Onaylanmayan olay için eskalasyon zamanları (açılış ya da yeniden açılıştan itibaren)
+CLAIM_TTL = 60                 # Aynı durum geçişini makinedeki tek bir worker yapar
+CLAIM_WAIT_SECONDS = 2         # Geçişi kaybeden worker kazananın kaydını bu kadar bekler
+CLAIM_POLL_INTERVAL = 0.1
+PRUNE_INTERVAL = 300
+OPEN_CACHE_TTL = 10            # Açık olay paylaşımlı önbellekten okunur; başka makinedeki kapanış en geç bu sürede görülür
+TRIGGER_FLUSH_SECONDS = 30     # Açık olaya gelen tekrar tetiklemeler bu aralıkla toplu yazılır
+KEY_LOCK_STRIPES = 64
+
+
+def _timestamp(value) -> float:
+    return datetime.fromisoformat(value).timestamp() if value else time.time()
+
+
+def _open_store() -> CacheBackend:
+    """Açık olaylar için makinedeki worker'ların paylaştığı katman (yerel kopya tutulmaz)."""
+    backend = get_cache().backend
+    return backend.shared if isinstance(backend, TieredCache) else backend
+
+
+class Incident:
+    def __init__(self, user_id: str, data: Optional[dict] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.user_id = user_id
+        self.state = STATE_OPEN
+        self.data = data or {}
+        self.opened_at = time.time()
+        self.updated_at = self.opened_at
+        self.escalation_base = self.opened_at   # Eskalasyon süreleri buradan sayılır (yeniden açılışta sıfırlanır)
+        self.trigger_count = 1
+        self.escalation_level = 0
+        self.notified = False
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "state": self.state,
+            "data": self.data,
+            "opened_at": datetime.fromtimestamp(self.opened_at).isoformat(),
+            "updated_at": datetime.fromtimestamp(self.updated_at).isoformat(),
+            "escalation_base": datetime.fromtimestamp(self.escalation_base).isoformat(),
+            "trigger_count": self.trigger_count,
+            "escalation_level": self.escalation_level,
+            "notified": self.notified,
+        }
+
+    @classmethod
+    def from_dict(cls, record: dict) -> "Incident":
+        incident = cls(record["user_id"], record.get("data"))
+        incident.id = record["id"]
+        incident.state = record.get("state", STATE_OPEN)
+        incident.opened_at = _timestamp(record.get("opened_at"))
+        incident.updated_at = _timestamp(record.get("updated_at"))
+        incident.escalation_base = _timestamp(record.get("escalation_base") or record.get("opened_at"))
+        incident.trigger_count = record.get("trigger_count", 1)
+        incident.escalation_level = record.get("escalation_level", 0)
+        incident.notified = record.get("notified", False)
+        return incident
+
+
+class IncidentManager:
+    """
+    Kullanıcı başına acil durum olay makinesi: open -> acknowledged -> resolved.
+
+    Güncel olay /emergency_incident_current/{uid} altında tutulur; açık olaylar ayrıca
+    paylaşımlı önbellekte (OPEN_CACHE_TTL) durur, böylece açık olaya gelen tekrar
+    tetiklemeler veritabanına gitmez ve trigger_count TRIGGER_FLUSH_SECONDS'da bir
+    toplu yazılır. Açık olay yoksa karar her zaman kayıttan okunarak verilir; onay,
+    kapanış ve eskalasyon da kayıttaki durumu kontrol eder. Aynı anda gelen
+    tetiklemelerde olayı yalnızca paylaşımlı önbellekte geçişi sahiplenen worker açar
+    ve SMS / push'u yalnızca o gönderir. Kısa süre önce kapanan olay yeniden açılırsa
+    bildirim tekrarlanır. Onaylanmayan olaylar için zamanlayıcılarla eskalasyon yapılır.
+    """
+
+    def __init__(self, detect: Callable[[str], Optional[dict]],
+                 notify: Callable[[str, Incident], None],
+                 escalate: Optional[Callable[[str, Incident], None]] = None,
+                 debounce_seconds: float = DEBOUNCE_SECONDS,
+                 reopen_window_seconds: float = REOPEN_WINDOW_SECONDS,
+                 escalation_seconds=ESCALATION_SECONDS,
+                 on_change: Optional[Callable[[Incident], None]] = None):
+        self.detect = detect
+        self.notify = notify
+        self.escalate = escalate
+        self.debounce_seconds = debounce_seconds
+        self.reopen_window_seconds = reopen_window_seconds
+        self.escalation_seconds = tuple(escalation_seconds)
+        self.on_change = on_change
+
+        self._last_check: Dict[str, tuple] = {}   # user_id -> (zaman, acil_mi)
+        self._timers: Dict[str, list] = {}
+        self._pending: Dict[str, list] = {}       # user_id -> [olay kimliği, yazılmamış tetikleme sayısı]
+        # Kullanıcı başına kilit yerine sabit sayıda kilit: bellek büyümez
+        self._locks = [threading.Lock() for _ in range(KEY_LOCK_STRIPES)]
+        self._guard = threading.Lock()
+        self._pruned_at = time.time()
+
+    def _lock_for(self, user_id: str) -> threading.Lock:
+        return self._locks[hash(user_id) % KEY_LOCK_STRIPES]
+
+    def current(self, user_id: str) -> Optional[Incident]:
+        return self._cached(user_id) or self._load(user_id)
+
+    def trigger(self, user_id: str) -> tuple:
+        """
+        Tetiklemeyi idempotent olarak işler.
+        (incident, bildirim_yapıldı_mı) döner (yeniden açılış dahil); acil durum yoksa incident None'dır.
+        """
+        self._prune()
+        with self._lock_for(user_id):
+            now = time.time()
+            # 1. Açık olay varsa (hangi worker'da açılmış olursa olsun) tam fan-out yapılmaz
+            incident = self._cached(user_id)
+            if incident:
+                self._count_trigger(incident)
+                return incident, False
+
+            incident = self._load(user_id)
+            if incident and incident.state != STATE_RESOLVED:
+                self._count_trigger(incident)
+                return incident, False
+
+            # 2. Kısa süre önce kontrol edildiyse sonucu tekrar kullan
+            last = self._last_check.get(user_id)
+            if last and now - last[0] < self.debounce_seconds and not last[1]:
+                return None, False
+
+            data = self.detect(user_id)
+            self._last_check[user_id] = (now, data is not None)
+            if data is None:
+                return None, False
+
+            # 3. Geçişi başka bir worker sahiplendiyse onun kaydı döner
+            claimed = self._claim(user_id, incident)
+            if claimed:
+                # Yakın zamanda kapanan olay yeni kayıt açılmadan yeniden açılır
+                if incident and now - incident.updated_at < self.reopen_window_seconds:
+                    self._reopen(incident, data, now)
+                else:
+                    incident = Incident(user_id, data)
+                self._persist(incident)
+
+        if not claimed:
+            return self._wait_for_transition(user_id, incident), False
+
+        # Yavaş dış çağrılar kilit dışında yapılır
+        self._fan_out(incident)
+        self._schedule_escalation(incident)
+        return incident, True
+
+    def open_from_event(self, user_id: str, data: dict) -> Optional[Incident]:
+        """Dedektör gibi dış kaynaklardan gelen acil durum geçişiyle olay açar."""
+        with self._lock_for(user_id):
+            now = time.time()
+            incident = self._cached(user_id) or self._load(user_id)
+            if incident and incident.state != STATE_RESOLVED:
+                self._count_trigger(incident)
+                return incident
+            self._last_check[user_id] = (now, True)
+            claimed = self._claim(user_id, incident)
+            if claimed:
+                incident = Incident(user_id, data)
+                self._persist(incident)
+
+        if not claimed:
+            return self._wait_for_transition(user_id, incident)
+        self._fan_out(incident)
+        self._schedule_escalation(incident)
+        return incident
+
+    def acknowledge(self, user_id: str, incident_id: str) -> Optional[Incident]:
+        return self._transition(user_id, incident_id, STATE_ACKNOWLEDGED)
+
+    def resolve(self, user_id: str, incident_id: str) -> Optional[Incident]:
+        return self._transition(user_id, incident_id, STATE_RESOLVED)
+
+    def _transition(self, user_id: str, incident_id: str, state: str) -> Optional[Incident]:
+        with self._lock_for(user_id):
+            incident = self._load(user_id)
+            if not incident or incident.id != incident_id or incident.state == STATE_RESOLVED:
+                return None
+            incident.state = state
+            incident.updated_at = time.time()
+            self._cancel_escalation(user_id)
+            self._persist(incident)
+            return incident
+
+    def _reopen(self, incident: Incident, data: dict, now: float):
+        incident.state = STATE_OPEN
+        incident.data = data
+        incident.trigger_count += 1
+        incident.updated_at = now
+        # Eskalasyon yeniden açılıştan itibaren sayılır; eski zamanlar hemen SMS'e yol açmasın
+        incident.escalation_base = now
+        incident.escalation_level = 0
+        incident.notified = False
+
+    def _claim(self, user_id: str, previous: Optional[Incident]) -> bool:
+        """Kullanıcının mevcut durumundan tek bir geçiş: anahtar önceki kaydın kimliği ve zamanıdır."""
+        state = f"{previous.id}:{previous.updated_at:.3f}" if previous else "none"
+        try:
+            return get_cache().backend.incr(f"incident:{user_id}:{state}", 1, 1, CLAIM_TTL) is not None
+        except Exception as e:
+            # Paylaşımlı önbellek yoksa süreç içi kilit yeterli kabul edilir
+            logger.warning(f"Olay sahiplenilemedi, yerel olarak devam ediliyor: {str(e)}")
+            return True
+
+    def _wait_for_transition(self, user_id: str, previous: Optional[Incident]) -> Optional[Incident]:
+        """Geçişi sahiplenen worker'ın kaydını bekler; gelmezse mevcut açık olay (ya da None) döner."""
+        deadline = time.monotonic() + CLAIM_WAIT_SECONDS
+        while True:
+            incident = self._load(user_id)
+            changed = incident and (previous is None or incident.id != previous.id
+                                    or incident.updated_at != previous.updated_at)
+            if changed or time.monotonic() >= deadline:
+                return incident if incident and incident.state != STATE_RESOLVED else None
+            time.sleep(CLAIM_POLL_INTERVAL)
+
+    def _fan_out(self, incident: Incident):
+        try:
+            self.notify(incident.user_id, incident)
+            incident.notified = True
+            self._persist(incident)
+        except Exception as e:
+            logger.error(f"Acil durum bildirimi gönderilemedi: {str(e)}")
+
+    def _schedule_escalation(self, incident: Incident):
+        if not self.escalate:
+            return
+        self._cancel_escalation(incident.user_id)
+        elapsed = time.time() - incident.escalation_base
+        timers = []
+        for level, delay in enumerate(self.escalation_seconds, 1):
+            if level <= incident.escalation_level:
+                continue
+            timer = threading.Timer(max(0.0, delay - elapsed), self._on_escalation,
+                                    args=(incident.user_id, incident.id, level))
+            timer.daemon = True
+            timer.start()
+            timers.append(timer)
+        self._timers[incident.user_id] = timers
+
+    def _cancel_escalation(self, user_id: str):
+        for timer in self._timers.pop(user_id, []):
+            timer.cancel()
+
+    def _on_escalation(self, user_id: str, incident_id: str, level: int):
+        with self._lock_for(user_id):
+            # Olay başka bir worker'da onaylanmış ya da kapatılmış olabilir
+            incident = self._load(user_id)
+            if not incident or incident.id != incident_id or incident.state != STATE_OPEN \
+                    or incident.escalation_level >= level:
+                return
+            incident.escalation_level = level
+            incident.updated_at = time.time()
+            self._persist(incident)
+        try:
+            self.escalate(user_id, incident)
+        except Exception as e:
+            logger.error(f"Eskalasyon hatası: {str(e)}")
+
+    def _prune(self):
+        """Debounce süresi geçmiş kontroller ve biten zamanlayıcılar bellekten atılır."""
+        now = time.time()
+        with self._guard:
+            if now - self._pruned_at < PRUNE_INTERVAL:
+                return
+            self._pruned_at = now
+            for user_id, (checked_at, _) in list(self._last_check.items()):
+                if now - checked_at >= self.debounce_seconds:
+                    self._last_check.pop(user_id, None)
+            for user_id, timers in list(self._timers.items()):
+                if not any(timer.is_alive() for timer in timers):
+                    self._timers.pop(user_id, None)
+
+    def _count_trigger(self, incident: Incident):
+        """
+        Açık olaya gelen tekrar tetikleme: sayaç bellekte biriktirilir, ilk tetiklemeden
+        TRIGGER_FLUSH_SECONDS sonra tek transaction ile yazılır (ya da bir sonraki kayıtta).
+        """
+        with self._guard:
+            pending = self._pending.get(incident.user_id)
+            if pending is None or pending[0] != incident.id:
+                pending = self._pending[incident.user_id] = [incident.id, 0]
+                timer = threading.Timer(TRIGGER_FLUSH_SECONDS, self._flush_triggers, args=(incident.user_id,))
+                timer.daemon = True
+                timer.start()
+            pending[1] += 1
+            incident.trigger_count += pending[1]
+
+    def _take_pending(self, user_id: str, incident_id: str) -> int:
+        with self._guard:
+            pending = self._pending.get(user_id)
+            if pending is None or pending[0] != incident_id:
+                return 0
+            del self._pending[user_id]
+            return pending[1]
+
+    def _flush_triggers(self, user_id: str):
+        with self._guard:
+            pending = self._pending.pop(user_id, None)
+        if not pending:
+            return
+        incident_id, count = pending
+
+        def add(record):
+            # Olay bu arada değiştiyse ya da kapandıysa sayı eklenmez
+            if record and record.get("id") == incident_id and record.get("state") != STATE_RESOLVED:
+                record["trigger_count"] = record.get("trigger_count", 1) + count
+            return record
+
+        try:
+            record = db.reference(f'/emergency_incident_current/{user_id}').transaction(add)
+        except Exception as e:
+            logger.error(f"Tetikleme sayısı yazılamadı: {str(e)}")
+            return
+        if record and record.get("id") == incident_id:
+            self._cache_open(Incident.from_dict(record))
+
+    def _cached(self, user_id: str) -> Optional[Incident]:
+        """Paylaşımlı önbellekteki açık (ya da onaylanmış) olay; yoksa None."""
+        try:
+            record = _open_store().get(f"incident_open:{user_id}")
+        except Exception as e:
+            logger.warning(f"Olay önbelleği okunamadı: {str(e)}")
+            record = None
+        record_cache("incident_open", record is not None)
+        return Incident.from_dict(record) if record else None
+
+    def _cache_open(self, incident: Incident):
+        key = f"incident_open:{incident.user_id}"
+        try:
+            if incident.state == STATE_RESOLVED:
+                _open_store().delete(key)
+            else:
+                _open_store().set(key, incident.to_dict(), OPEN_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Olay önbelleği güncellenemedi: {str(e)}")
+
+    def _load(self, user_id: str) -> Optional[Incident]:
+        try:
+            record = db.reference(f'/emergency_incident_current/{user_id}').get()
+        except Exception as e:
+            logger.error(f"Olay kaydı okunamadı: {str(e)}")
+            return None
+        if not record:
+            return None
+        incident = Incident.from_dict(record)
+        self._cache_open(incident)
+        return incident
+
+    def _persist(self, incident: Incident):
+        # Bellekte biriken tekrar tetiklemeler bu kayıtla birlikte yazılır
+        incident.trigger_count += self._take_pending(incident.user_id, incident.id)
+        self._cache_open(incident)
+        record = incident.to_dict()
+        try:
+            # Geçmiş kaydı ve güncel olay göstergesi tek multi-path update ile
+            db.reference('/').update({
+                f'emergency_incidents/{incident.user_id}/{incident.id}': record,
+                f'emergency_incident_current/{incident.user_id}': record,
+            })
+        except Exception as e:
+            logger.error(f"Olay kaydı hatası: {str(e)}")
+        if self.on_change:
+            try:
+                self.on_change(incident)
+            except Exception as e:
+                logger.warning(f"Olay değişikliği yayınlanamadı: {str(e)}")
@@ -0,0 +1,445 @@
+"""
+Yayın/abone merkezi (SSE akışları için).
+
+Üreticiler (bildirim yazımı, acil durum olayı değişimi, sağlık örnekleyicisi,
+zamanlayıcılar) olayı kullanıcının konusuna bir kez yayınlar; olay makinedeki
+worker'ların paylaştığı olay günlüğüne (paylaşımlı önbellekle aynı sqlite dosyası)
+yazılır. Her süreçte tek bir aktarıcı thread günlüğü izler ve olayı o süreçteki
+açık bağlantılara dağıtır; bağlantı başına veritabanı okuması yapılmaz. Böylece
+olayı hangi worker ya da ayrı süreç (ör. `python -m routes.weather_monitor run`)
+üretirse üretsin, bağlantı hangi worker'daysa oraya ulaşır.
+
+- Günlüğe yalnızca son REPLAY_TTL_SECONDS içinde makinede abonesi olan konuların
+  olayları yazılır; hiç dinlenmeyen kullanıcılar için yayın tek bir okumadır.
+- Her bağlantının sınırlı bir kuyruğu vardır. Kuyruk dolarsa aktarıcı beklemez;
+  bağlantı "taşmış" işaretlenir ve kapatılır, istemci Last-Event-ID ile yeniden
+  bağlanıp kaçırdıklarını günlükten (herhangi bir worker'da) tekrar alır.
+- Olay kimlikleri "<günlük dönemi>-<sıra>" biçimindedir. Başka bir günlükten ya da
+  günlükten düşmüş bir kimlikle gelen istemciye "resync" gönderilir.
+
+Paylaşım makine düzeyindedir (bkz. routes/cache_backend.py). CACHE_BACKEND=memory
+iken günlük süreç içidir; bu yalnızca tek süreçli kurulumlar için uygundur.
+Birden fazla makinede olaylar yalnızca üretildikleri makinedeki bağlantılara ulaşır.
+"""
+import abc
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from routes.cache_backend import TieredCache, get_cache
+from routes.metrics import inc, register
+
+logger = logging.getLogger(__name__)
+
+REPLAY_SIZE = int(os.getenv("EVENT_REPLAY_SIZE", "200"))            # Tekrar oynatılacak en fazla olay
+REPLAY_TTL_SECONDS = int(os.getenv("EVENT_REPLAY_TTL_SECONDS", "300"))
+SUBSCRIBER_BUFFER = int(os.getenv("EVENT_SUBSCRIBER_BUFFER", "100"))  # Bağlantı başına bekleyen olay
+RELAY_INTERVAL = float(os.getenv("EVENT_RELAY_INTERVAL", "0.2"))    # Paylaşımlı günlüğün yoklanma aralığı
+RELAY_BATCH = 1000
+TOPIC_TOUCH_SECONDS = REPLAY_TTL_SECONDS / 3                       # Dinlenen konuların tazelenme aralığı
+PRUNE_SECONDS = 60
+
+register("event_hub_published_total", "counter", "Yayınlanan olaylar (dinleyicisi olan konulara)", ("type",))
+register("event_hub_overflows_total", "counter", "Kuyruğu dolduğu için kapatılan bağlantılar")
+
+
+@dataclass(frozen=True)
+class Event:
+    id: str
+    seq: int
+    type: str
+    data: dict
+
+
+class Subscription:
+    """Tek bir bağlantının sınırlı olay kuyruğu."""
+
+    def __init__(self, topic: str, maxsize: int = SUBSCRIBER_BUFFER):
+        self.topic = topic
+        self.maxsize = maxsize
+        self.overflowed = False
+        self._queue: Deque[Event] = deque()
+        self._cond = threading.Condition()
+
+    def put(self, event: Event) -> bool:
+        with self._cond:
+            if self.overflowed:
+                return False
+            if len(self._queue) >= self.maxsize:
+                self.overflowed = True
+                self._cond.notify()
+                return False
+            self._queue.append(event)
+            self._cond.notify()
+            return True
+
+    def get(self, timeout: float) -> Optional[Event]:
+        """Sıradaki olay; süre dolarsa ya da bağlantı taştıysa None."""
+        with self._cond:
+            if not self._queue and not self.overflowed:
+                self._cond.wait(timeout)
+            if self.overflowed or not self._queue:
+                return None
+            return self._queue.popleft()
+
+
+class EventLog(abc.ABC):
+    """
+    Olay günlüğünün ortak arayüzü. Sıralar günlük içinde artan tamsayılardır.
+    `touch` bir konuyu dinleniyor işaretler ve konunun kesintisiz dinlendiği
+    ilk sırayı döner; o sıradan sonraki olaylarının hepsi günlüktedir.
+    """
+    epoch: str
+
+    @abc.abstractmethod
+    def append(self, topic: str, event_type: str, data: dict) -> int:
+        ...
+
+    @abc.abstractmethod
+    def read_after(self, after: int, topic: Optional[str] = None, limit: int = RELAY_BATCH) -> List[tuple]:
+        """(sıra, konu, tür, veri) satırları, sıraya göre."""
+
+    @abc.abstractmethod
+    def last_seq(self) -> int:
+        ...
+
+    @abc.abstractmethod
+    def pruned_through(self) -> int:
+        """Bu sıraya kadarki (dahil) olaylar silinmiştir."""
+
+    @abc.abstractmethod
+    def listening(self, topic: str) -> bool:
+        ...
+
+    @abc.abstractmethod
+    def touch(self, topics: List[str]) -> Dict[str, int]:
+        ...
+
+    @abc.abstractmethod
+    def prune(self):
+        ...
+
+    def wait(self, after: int, timeout: float):
+        time.sleep(timeout)
+
+
+class MemoryEventLog(EventLog):
+    """Süreç içi günlük (CACHE_BACKEND=memory, tek süreçli kurulumlar)."""
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._rows: Deque[tuple] = deque()      # (sıra, konu, tür, veri, zaman)
+        self._topics: Dict[str, list] = {}      # konu -> [dinlenme başlangıcı, bitiş zamanı]
+        self._seq = 0
+        self._pruned = 0
+        self._cond = threading.Condition()
+
+    def append(self, topic: str, event_type: str, data: dict) -> int:
+        with self._cond:
+            self._seq += 1
+            self._rows.append((self._seq, topic, event_type, data, time.time()))
+            self._cond.notify_all()
+            return self._seq
+
+    def read_after(self, after: int, topic: Optional[str] = None, limit: int = RELAY_BATCH) -> List[tuple]:
+        with self._cond:
+            rows = [row[:4] for row in self._rows if row[0] > after and (topic is None or row[1] == topic)]
+        return rows[:limit]
+
+    def last_seq(self) -> int:
+        return self._seq
+
+    def pruned_through(self) -> int:
+        return self._pruned
+
+    def listening(self, topic: str) -> bool:
+        state = self._topics.get(topic)
+        return state is not None and state[1] > time.time()
+
+    def touch(self, topics: List[str]) -> Dict[str, int]:
+        now = time.time()
+        with self._cond:
+            for topic in topics:
+                state = self._topics.get(topic)
+                if state is None or state[1] <= now:
+                    state = self._topics[topic] = [self._seq, 0.0]
+                state[1] = now + REPLAY_TTL_SECONDS
+            return {topic: self._topics[topic][0] for topic in topics}
+
+    def prune(self):
+        cutoff = time.time() - REPLAY_TTL_SECONDS
+        with self._cond:
+            while self._rows and self._rows[0][4] < cutoff:
+                self._pruned = self._rows.popleft()[0]
+            for topic in [topic for topic, state in self._topics.items() if state[1] <= time.time()]:
+                del self._topics[topic]
+
+    def wait(self, after: int, timeout: float):
+        with self._cond:
+            if self._seq <= after:
+                self._cond.wait(timeout)
+
+
+class SqliteEventLog(EventLog):
+    """Aynı makinedeki tüm süreçlerin paylaştığı günlük (WAL; her thread kendi bağlantısı)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS event_log (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                     "topic TEXT NOT NULL, type TEXT NOT NULL, data TEXT NOT NULL, created_at REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS event_log_topic ON event_log (topic, id)")
+        conn.execute("CREATE TABLE IF NOT EXISTS event_topics ("
+                     "topic TEXT PRIMARY KEY, since INTEGER NOT NULL, expires_at REAL NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS event_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        # Dosya silinip yeniden oluşursa sıralar baştan başlar; yeni dönem eski kimlikleri geçersiz kılar
+        conn.execute("INSERT OR IGNORE INTO event_meta (key, value) VALUES ('epoch', ?)", (uuid.uuid4().hex[:8],))
+        self.epoch = conn.execute("SELECT value FROM event_meta WHERE key = 'epoch'").fetchone()[0]
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # fork sonrası üst süreçten kalan bağlantı kullanılmaz
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def append(self, topic: str, event_type: str, data: dict) -> int:
+        cursor = self._connection().execute(
+            "INSERT INTO event_log (topic, type, data, created_at) VALUES (?, ?, ?, ?)",
+            (topic, event_type, json.dumps(data, ensure_ascii=False, default=str), time.time()))
+        return cursor.lastrowid
+
+    def read_after(self, after: int, topic: Optional[str] = None, limit: int = RELAY_BATCH) -> List[tuple]:
+        if topic is None:
+            rows = self._connection().execute(
+                "SELECT id, topic, type, data FROM event_log WHERE id > ? ORDER BY id LIMIT ?", (after, limit))
+        else:
+            rows = self._connection().execute(
+                "SELECT id, topic, type, data FROM event_log WHERE topic = ? AND id > ? ORDER BY id LIMIT ?",
+                (topic, after, limit))
+        return [(seq, row_topic, event_type, json.loads(data)) for seq, row_topic, event_type, data in rows]
+
+    def last_seq(self) -> int:
+        row = self._connection().execute("SELECT seq FROM sqlite_sequence WHERE name = 'event_log'").fetchone()
+        return row[0] if row else 0
+
+    def pruned_through(self) -> int:
+        row = self._connection().execute("SELECT value FROM event_meta WHERE key = 'pruned_through'").fetchone()
+        return int(row[0]) if row else 0
+
+    def listening(self, topic: str) -> bool:
+        row = self._connection().execute(
+            "SELECT 1 FROM event_topics WHERE topic = ? AND expires_at > ?", (topic, time.time())).fetchone()
+        return row is not None
+
+    def touch(self, topics: List[str]) -> Dict[str, int]:
+        now = time.time()
+        conn = self._connection()
+        last = self.last_seq()
+        since = {}
+        for topic in topics:
+            # Süresi dolmuş konu yeniden dinlenmeye başlarsa aradaki olaylar yazılmamıştır
+            since[topic] = conn.execute(
+                "INSERT INTO event_topics (topic, since, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(topic) DO UPDATE SET "
+                "since = CASE WHEN event_topics.expires_at <= ? THEN excluded.since ELSE event_topics.since END, "
+                "expires_at = excluded.expires_at RETURNING since",
+                (topic, last, now + REPLAY_TTL_SECONDS, now)
+            ).fetchone()[0]
+        return since
+
+    def prune(self):
+        now = time.time()
+        conn = self._connection()
+        row = conn.execute("SELECT MAX(id) FROM event_log WHERE created_at < ?",
+                           (now - REPLAY_TTL_SECONDS,)).fetchone()
+        if row[0] is not None:
+            conn.execute("DELETE FROM event_log WHERE id <= ?", (row[0],))
+            conn.execute("INSERT INTO event_meta (key, value) VALUES ('pruned_through', ?) "
+                         "ON CONFLICT(key) DO UPDATE SET value = MAX(CAST(value AS INTEGER), excluded.value)",
+                         (row[0],))
+        conn.execute("DELETE FROM event_topics WHERE expires_at <= ?", (now,))
+
+
+def _default_log() -> EventLog:
+    backend = get_cache().backend
+    if isinstance(backend, TieredCache):
+        try:
+            return SqliteEventLog(backend.shared.path)
+        except sqlite3.Error as e:
+            logger.error(f"Paylaşımlı olay günlüğü açılamadı, süreç içi günlük kullanılacak: {str(e)}")
+    return MemoryEventLog()
+
+
+class EventHub:
+    def __init__(self, log_factory=_default_log):
+        self._log_factory = log_factory
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # Fork'tan sonra (gunicorn worker'ı) her süreç kendi aktarıcısını başlatır
+        self._pid = os.getpid()
+        self._log: Optional[EventLog] = None
+        self._cursor = 0
+        self._topics: Dict[str, Set[Subscription]] = {}
+        self._relay: Optional[threading.Thread] = None
+        self._touched = self._pruned = 0.0
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            self._reset()
+
+    @property
+    def log(self) -> EventLog:
+        if self._log is None:
+            self._log = self._log_factory()
+        return self._log
+
+    def _event_id(self, seq: int) -> str:
+        return f"{self.log.epoch}-{seq}"
+
+    def publish(self, topic: str, event_type: str, data: dict) -> Optional[Event]:
+        """Konuyu makinede dinleyen yoksa (ve yakın zamanda dinlenmediyse) hiçbir şey yapmaz."""
+        with self._lock:
+            self._check_pid()
+            log = self.log
+        try:
+            if not log.listening(topic):
+                return None
+            seq = log.append(topic, event_type, data)
+        except sqlite3.Error as e:
+            # Canlı akış en iyi çaba: kaydı zaten yazılmış işlemi bozmaz
+            logger.warning(f"Olay günlüğe yazılamadı ({topic}, {event_type}): {str(e)}")
+            return None
+        inc("event_hub_published_total", (event_type,))
+        return Event(self._event_id(seq), seq, event_type, data)
+
+    def subscribe(self, topic: str, last_event_id: Optional[str] = None,
+                  maxsize: int = SUBSCRIBER_BUFFER) -> Tuple[Subscription, List[Event], Optional[str]]:
+        """
+        (abonelik, tekrar oynatılacak olaylar, resync kimliği) döner. Last-Event-ID
+        günlükte bulunamıyorsa resync kimliği istemcinin yeni imlecidir. Kayıt ve
+        tekrar oynatma aktarıcıyla aynı kilit altında yapılır; arada olay kaçmaz,
+        iki kez de gönderilmez.
+        """
+        subscription = Subscription(topic, maxsize)
+        with self._lock:
+            self._check_pid()
+            log = self.log
+            self._ensure_relay()
+            since = log.touch([topic])[topic]
+            self._topics.setdefault(topic, set()).add(subscription)
+
+            replay, resync = [], None
+            if last_event_id:
+                epoch, _, seq = last_event_id.partition("-")
+                if epoch == log.epoch and seq.isdigit() and int(seq) >= max(since, log.pruned_through()):
+                    rows = [row for row in log.read_after(int(seq), topic, REPLAY_SIZE + 1) if row[0] <= self._cursor]
+                    if len(rows) <= REPLAY_SIZE:
+                        replay = [self._event(row) for row in rows]
+                    else:
+                        resync = self._event_id(self._cursor)
+                else:
+                    resync = self._event_id(self._cursor)
+        return subscription, replay, resync
+
+    def unsubscribe(self, subscription: Subscription):
+        # Konu günlükte REPLAY_TTL_SECONDS daha dinleniyor sayılır; yeniden bağlanan istemci kaçırmaz
+        with self._lock:
+            subscribers = self._topics.get(subscription.topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[subscription.topic]
+
+    def _event(self, row: tuple) -> Event:
+        seq, _, event_type, data = row
+        return Event(self._event_id(seq), seq, event_type, data)
+
+    def _ensure_relay(self):
+        """Kilit altında çağrılır; aktarıcı günlüğün o anki sonundan başlar."""
+        if self._relay is None:
+            self._cursor = self.log.last_seq()
+            self._relay = threading.Thread(target=self._run, name="event-relay", daemon=True)
+            self._relay.start()
+
+    def _run(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            try:
+                self.log.wait(self._cursor, RELAY_INTERVAL)
+                self.relay()
+            except Exception as e:
+                logger.error(f"Olay aktarıcı hatası: {str(e)}")
+                time.sleep(RELAY_INTERVAL)
+
+    def relay(self) -> int:
+        """Günlükteki yeni olayları bu süreçteki bağlantılara dağıtır; dağıtılan olay sayısı."""
+        deliveries = []
+        with self._lock:
+            log = self.log
+            if not self._topics:
+                self._cursor = max(self._cursor, log.last_seq())
+            else:
+                while True:
+                    rows = log.read_after(self._cursor)
+                    for row in rows:
+                        self._cursor = row[0]
+                        subscribers = self._topics.get(row[1])
+                        if subscribers:
+                            event = self._event(row)
+                            deliveries.extend((subscription, event) for subscription in subscribers)
+                    if len(rows) < RELAY_BATCH:
+                        break
+            topics = list(self._topics)
+        for subscription, event in deliveries:
+            if not subscription.put(event):
+                inc("event_hub_overflows_total")
+
+        now = time.monotonic()
+        if topics and now - self._touched >= TOPIC_TOUCH_SECONDS:
+            self._touched = now
+            log.touch(topics)
+        if now - self._pruned >= PRUNE_SECONDS:
+            self._pruned = now
+            log.prune()
+        return len(deliveries)
+
+    def active_topics(self) -> List[str]:
+        with self._lock:
+            self._check_pid()
+            return [topic for topic, subscribers in self._topics.items() if subscribers]
+
+    def connection_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._topics.values())
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "epoch": self.log.epoch,
+                "log": type(self.log).__name__,
+                "last_seq": self._cursor,
+                "topics": len(self._topics),
+                "connections": sum(len(subscribers) for subscribers in self._topics.values()),
+            }
+
+
+_hub = EventHub()
+
+
+def get_event_hub() -> EventHub:
+    return _hub
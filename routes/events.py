@@ -0,0 +1,143 @@
+"""
+Kullanıcı başına Server-Sent Events akışı: yeni bildirimler, acil durum olayı
+değişimleri ve canlı sağlık ölçümleri tek bağlantıda.
+
+    GET /api/events/<user_id>        (Last-Event-ID başlığı ya da ?last_event_id=)
+
+Olaylar routes/event_hub.py üzerinden gelir; makinedeki hangi worker ya da
+zamanlayıcı süreci üretirse üretsin bağlantının olduğu worker'a ulaşır. Sağlık ölçümleri, bağlı kullanıcılar
+için süreç başına tek bir örnekleyici tarafından HEALTH_SAMPLE_SECONDS'da bir
+giyilebilir cihazdan okunur (bağlantı sayısından bağımsız); yalnızca gerçek ve
+yeni ölçümler yayınlanır, cihazı bağlı olmayan kullanıcılara sağlık olayı gitmez. Bağlantılar en fazla STREAM_MAX_SECONDS
+açık kalır; istemci `retry` süresi sonunda Last-Event-ID ile devam eder.
+
+gthread modunda her açık akış bir thread tutar; SSE_MAX_CONNECTIONS bu yüzden
+GUNICORN_THREADS ile birlikte ayarlanmalıdır.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+from flask import Blueprint, Response, g, jsonify, request
+
+from routes.auth_middleware import require_auth
+from routes.event_hub import Event, Subscription, get_event_hub
+from routes.health import get_health_sample
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_SECONDS = 15
+STREAM_MAX_SECONDS = int(os.getenv("SSE_STREAM_MAX_SECONDS", "300"))
+RETRY_MILLISECONDS = 2000
+MAX_CONNECTIONS = int(os.getenv("SSE_MAX_CONNECTIONS", "32"))
+HEALTH_SAMPLE_SECONDS = float(os.getenv("HEALTH_SAMPLE_SECONDS", "5"))
+events_bp = Blueprint('events', __name__, url_prefix='/api/events')
+
+
+class HealthSampler:
+    """Akışı açık kullanıcılar için giyilebilir cihazdan okunan yeni ölçümleri yayınlar."""
+
+    def __init__(self, interval: float = HEALTH_SAMPLE_SECONDS):
+        self.interval = interval
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._last: Dict[str, str] = {}     # Kullanıcı -> yayınlanan son ölçümün zamanı
+
+    def ensure_started(self):
+        # Fork'tan sonra (gunicorn worker'ı) thread yeniden başlatılır
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="health-sampler", daemon=True).start()
+
+    def sample(self) -> int:
+        """Yayınlanan ölçüm sayısı. Verisi olmayan ya da ölçümü değişmeyen kullanıcılar atlanır."""
+        hub = get_event_hub()
+        users = hub.active_topics()
+        active = set(users)
+        self._last = {user_id: ts for user_id, ts in self._last.items() if user_id in active}
+        published = 0
+        for user_id in users:
+            try:
+                reading = get_health_sample(user_id)
+                if reading is None or self._last.get(user_id) == reading["timestamp"]:
+                    continue
+                hub.publish(user_id, "health", reading)
+                self._last[user_id] = reading["timestamp"]
+                published += 1
+            except Exception as e:
+                logger.warning(f"Sağlık ölçümü okunamadı ({user_id}): {str(e)}")
+        return published
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Sağlık örnekleyici hatası: {str(e)}")
+
+
+sampler = HealthSampler()
+
+
+def _format(event_type: str, data: dict, event_id: Optional[str] = None) -> str:
+    lines = [f"id: {event_id}"] if event_id else []
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _stream(subscription: Subscription, replay: List[Event], resync: Optional[str]) -> Iterator[str]:
+    hub = get_event_hub()
+    try:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        if resync:
+            # Kaçırılan olaylar bilinmiyor: istemci REST uçlarından yeniden yüklemeli
+            yield _format("resync", {}, resync)
+        for event in replay:
+            yield _format(event.type, event.data, event.id)
+
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            event = subscription.get(min(HEARTBEAT_SECONDS, remaining))
+            if subscription.overflowed:
+                # İstemci yetişemiyor; yeniden bağlanınca tekrar oynatma halkasından devam eder
+                logger.info(f"SSE kuyruğu doldu, bağlantı kapatılıyor ({subscription.topic})")
+                return
+            yield _format(event.type, event.data, event.id) if event else ": keepalive\n\n"
+    finally:
+        hub.unsubscribe(subscription)
+
+
+@events_bp.route('/<user_id>', methods=['GET'])
+@require_auth
+def event_stream(user_id: str):
+    """Bildirim, acil durum ve sağlık olaylarının SSE akışı"""
+    if g.uid != user_id and not (g.claims or {}).get("admin"):
+        return jsonify({"error": "Bu kullanıcının verisine erişim yetkiniz yok"}), 403
+
+    hub = get_event_hub()
+    if hub.connection_count() >= MAX_CONNECTIONS:
+        response = jsonify({"error": "Canlı akış kapasitesi dolu, lütfen daha sonra tekrar deneyin"})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(RETRY_MILLISECONDS // 1000)
+        return response
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    subscription, replay, resync = hub.subscribe(user_id, last_event_id)
+    sampler.ensure_started()
+    return Response(_stream(subscription, replay, resync), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",     # nginx arkasında tamponlanmasın
+    })
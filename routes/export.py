@@ -0,0 +1,112 @@
+"""
+Kullanıcı verisi dışa aktarımı (destek talepleri ve veri taşınabilirliği).
+
+Bildirimler ve acil durum uyarıları anahtar imleciyle sayfa sayfa okunur ve
+NDJSON satırları olarak akıtılır; bellekte aynı anda yalnızca bir sayfa bulunur.
+İstemci kabul ediyorsa akış gzip ile sıkıştırılır.
+
+    {"type": "export", "user_id": ..., "generated_at": ..., "format_version": 1}
+    {"type": "health_info", "data": {...}}
+    {"type": "notification", "id": "...", "data": {...}}
+    {"type": "emergency_alert", "id": "...", "data": {...}}
+    {"type": "end", "counts": {...}}
+"""
+import json
+import logging
+import os
+import zlib
+from datetime import datetime
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from flask import Blueprint, Response, g, jsonify, request, stream_with_context
+
+from models.repository import EmergencyAlertRepository, NotificationRepository, UserRepository
+from routes.auth_middleware import require_auth
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "500"))
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+export_bp = Blueprint('export', __name__, url_prefix='/api/export')
+
+
+def iter_children(page: Callable[[Optional[str], int], Dict[str, dict]],
+                  page_size: int = EXPORT_PAGE_SIZE) -> Iterator[Tuple[str, dict]]:
+    """page(start_after, limit) ile tüm çocukları anahtar sırasıyla gezer."""
+    cursor = None
+    while True:
+        children = page(cursor, page_size)
+        yield from children.items()
+        if len(children) < page_size:
+            return
+        cursor = next(reversed(children))
+
+
+def _line(record: dict) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+def export_chunks(user_id: str, page_size: int = EXPORT_PAGE_SIZE) -> Iterator[bytes]:
+    """Sayfa başına bir parça (birden çok NDJSON satırı) üretir."""
+    yield _line({"type": "export", "user_id": user_id, "generated_at": datetime.now().isoformat(),
+                 "format_version": FORMAT_VERSION})
+    yield _line({"type": "health_info", "data": UserRepository().get_health_info(user_id)})
+
+    counts = {}
+    sources = (
+        ("notification", lambda cursor, limit: NotificationRepository().page(user_id, cursor, limit)),
+        ("emergency_alert", lambda cursor, limit: EmergencyAlertRepository().page(user_id, cursor, limit)),
+    )
+    for record_type, page in sources:
+        counts[record_type] = 0
+        chunk = []
+        for key, value in iter_children(page, page_size):
+            chunk.append(_line({"type": record_type, "id": key, "data": value}))
+            counts[record_type] += 1
+            if len(chunk) >= page_size:
+                yield b"".join(chunk)
+                chunk = []
+        if chunk:
+            yield b"".join(chunk)
+    yield _line({"type": "end", "counts": counts})
+
+
+def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    # Her parçadan sonra flush: istemci veriyi akış bitmeden almaya başlar
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _guarded(user_id: str, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Akış başladıktan sonra durum kodu değiştirilemez; hata son satır olarak yazılır."""
+    try:
+        yield from chunks
+    except Exception as e:
+        logger.error(f"Dışa aktarım yarıda kaldı ({user_id}): {str(e)}")
+        yield _line({"type": "error", "message": "Dışa aktarım tamamlanamadı"})
+
+
+@export_bp.route('/<user_id>', methods=['GET'])
+@require_auth
+def export_user_data(user_id: str):
+    """Kullanıcının bildirim, acil durum ve sağlık geçmişi (NDJSON akışı)"""
+    if g.uid != user_id and not (g.claims or {}).get("admin"):
+        return jsonify({"error": "Bu kullanıcının verisine erişim yetkiniz yok"}), 403
+
+    chunks = _guarded(user_id, export_chunks(user_id))
+    headers = {
+        "Content-Disposition": f"attachment; filename=export_{user_id}_{datetime.now():%Y%m%d}.ndjson",
+        "Cache-Control": "no-store",
+    }
+    if request.accept_encodings["gzip"]:
+        chunks = _gzip(chunks)
+        headers["Content-Encoding"] = "gzip"
+    response = Response(stream_with_context(chunks), mimetype=NDJSON_MIMETYPE, headers=headers)
+    response.vary.add("Accept-Encoding")
+    return response
@@ -0,0 +1,308 @@
+"""
+Çevrimdışı ters coğrafi kodlayıcı: koordinat -> il / ilçe.
+
+Paketle gelen il/ilçe listesi (data/geo/tr_places.csv) düzlemsel bir ızgara
+indeksine çevrilir ve numpy dosyaları olarak bellek eşlemeli (mmap) açılır.
+Her ızgara hücresi, hücredeki herhangi bir noktaya en yakın olabilecek yerlerin
+listesini tutar; sorgu tek hücre okuması ve birkaç mesafe hesabıdır, ağ çağrısı
+yapılmaz. Bir nokta en yakın ilçe merkezine atanır (merkezlerin Voronoi bölgeleri).
+
+Veri sınır değil merkez noktasıdır ve seyrektir: en yakın merkez yüzlerce km²'lik bir
+alanı temsil edebilir. Bir noktayı bir ilçeye/ile *ait* saymak isteyen çağıranlar
+max_distance_km=DISTRICT_MATCH_KM ile sorgulamalıdır.
+
+Kimlikler ISO 3166-2 il kodlarıdır: "TR-06", ilçeler için "TR-06-cankaya".
+
+    python -m routes.geocoder build                                # indeksi CSV'den yeniden üretir
+    python -m routes.geocoder import-geonames TR.txt admin1CodesASCII.txt
+    python -m routes.geocoder lookup 39.92 32.85
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+GEO_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'geo')
+SOURCE_CSV = os.path.join(GEO_DIR, 'tr_places.csv')
+INDEX_DIR = os.getenv("GEOCODER_INDEX_DIR", os.path.join(GEO_DIR, 'index'))
+
+INDEX_VERSION = 1
+COUNTRY = "TR"
+# Türkiye sınırlarını biraz taşan kutu; dışındaki koordinatlar çözülmez
+LAT_MIN, LAT_MAX = 35.5, 42.5
+LON_MIN, LON_MAX = 25.5, 45.0
+REF_LAT = 39.0              # Eşdikdörtgen izdüşüm için referans enlem
+KM_PER_DEGREE = 111.32
+CELL_KM = 20.0
+MAX_DISTANCE_KM = 120.0     # En yakın merkez bundan uzaksa (deniz, sınır ötesi) sonuç yok
+DISTRICT_MATCH_KM = float(os.getenv("GEOCODER_DISTRICT_MATCH_KM", "5"))  # Merkezine bu kadar yakın nokta o ilçede sayılır
+_KM_PER_LON_DEGREE = KM_PER_DEGREE * math.cos(math.radians(REF_LAT))
+
+_TURKISH_ASCII = str.maketrans("çğıöşüÇĞİIÖŞÜâîû", "cgiosucgiiosuaiu")
+
+
+class Place(NamedTuple):
+    city_id: str
+    city: str
+    district_id: Optional[str]  # İlçe verisi olmayan illerde None
+    district: Optional[str]
+    lat: float                  # Yerin temsil noktası (ilçe ya da il merkezi)
+    lon: float
+    distance_km: float = 0.0
+
+    @property
+    def key(self) -> str:
+        return self.district_id or self.city_id
+
+    @property
+    def forecast_location(self) -> str:
+        """Aynı ilçedeki kullanıcılar için ortak "lat,lon" (tahmin önbellek anahtarı)."""
+        return f"{self.lat:.4f},{self.lon:.4f}"
+
+
+def slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", name.translate(_TURKISH_ASCII).lower()).strip("-")
+
+
+def _project(lat, lon):
+    """Derece -> kutunun köşesine göre km (x doğu, y kuzey)."""
+    x = (np.asarray(lon, dtype=np.float64) - LON_MIN) * _KM_PER_LON_DEGREE
+    y = (np.asarray(lat, dtype=np.float64) - LAT_MIN) * KM_PER_DEGREE
+    return x, y
+
+
+def _grid_shape() -> tuple:
+    width, height = _project(LAT_MAX, LON_MAX)
+    return int(math.ceil(float(height) / CELL_KM)), int(math.ceil(float(width) / CELL_KM))
+
+
+def _source_hash(source: str) -> str:
+    with open(source, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def _read_places(source: str) -> List[dict]:
+    places = []
+    with open(source, newline='', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            city_id = f"{COUNTRY}-{int(row['city_code']):02d}"
+            district = row['district'].strip() or None
+            places.append({
+                "city_id": city_id,
+                "city": row['city'].strip(),
+                "district_id": f"{city_id}-{slug(district)}" if district else None,
+                "district": district,
+                "lat": float(row['lat']),
+                "lon": float(row['lon']),
+            })
+    return places
+
+
+def build_index(source: str = SOURCE_CSV, index_dir: str = INDEX_DIR) -> dict:
+    """
+    CSV'den ızgara indeksini üretir. Bir hücrenin aday listesi, hücreye en az
+    uzaklığı "hücreyi tamamen kapsayan en küçük yarıçap"tan küçük olan yerlerdir;
+    bu sayede hücredeki her nokta için kesin en yakın yer listede bulunur.
+    """
+    places = _read_places(source)
+    x, y = _project([place["lat"] for place in places], [place["lon"] for place in places])
+    rows, cols = _grid_shape()
+
+    cell_x0 = np.tile(np.arange(cols) * CELL_KM, rows)[:, None]
+    cell_y0 = np.repeat(np.arange(rows) * CELL_KM, cols)[:, None]
+    cell_x1, cell_y1 = cell_x0 + CELL_KM, cell_y0 + CELL_KM
+    near_x = np.maximum(np.maximum(cell_x0 - x, x - cell_x1), 0)
+    near_y = np.maximum(np.maximum(cell_y0 - y, y - cell_y1), 0)
+    far_x = np.maximum(np.abs(x - cell_x0), np.abs(x - cell_x1))
+    far_y = np.maximum(np.abs(y - cell_y0), np.abs(y - cell_y1))
+    radius = np.hypot(far_x, far_y).min(axis=1)
+    mask = np.hypot(near_x, near_y) <= radius[:, None]
+
+    offsets = np.zeros(rows * cols + 1, dtype=np.int32)
+    np.cumsum(mask.sum(axis=1), out=offsets[1:])
+    candidates = np.nonzero(mask)[1].astype(np.int32)   # Satır sırası: hücre hücre gruplu
+    points = np.column_stack([x, y]).astype(np.float32)
+
+    meta = {
+        "version": INDEX_VERSION,
+        "source_sha1": _source_hash(source),
+        "rows": rows,
+        "cols": cols,
+        "cell_km": CELL_KM,
+        "places": places,
+    }
+    os.makedirs(index_dir, exist_ok=True)
+    # Dosyalar önce geçici adla yazılır; meta en son yazıldığı için yarım indeks okunmaz
+    for name, array in (("points", points), ("offsets", offsets), ("candidates", candidates)):
+        with tempfile.NamedTemporaryFile(dir=index_dir, suffix=".npy", delete=False) as file:
+            np.save(file, array)
+        os.replace(file.name, os.path.join(index_dir, f"{name}.npy"))
+    with tempfile.NamedTemporaryFile("w", dir=index_dir, suffix=".json", delete=False, encoding="utf-8") as file:
+        json.dump(meta, file, ensure_ascii=False)
+    os.replace(file.name, os.path.join(index_dir, "meta.json"))
+
+    logger.info(f"Coğrafi indeks üretildi: {len(places)} yer, {rows}x{cols} hücre, "
+                f"hücre başına ortalama {len(candidates) / (rows * cols):.1f} aday")
+    return meta
+
+
+class ReverseGeocoder:
+    def __init__(self, index_dir: str = INDEX_DIR, source: str = SOURCE_CSV):
+        self.index_dir = index_dir
+        self.source = source
+        self._places: Optional[List[Place]] = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._places is not None:
+                return
+            meta = self._read_meta()
+            if meta is None or meta.get("version") != INDEX_VERSION \
+                    or (os.path.exists(self.source) and meta.get("source_sha1") != _source_hash(self.source)):
+                meta = build_index(self.source, self.index_dir)
+            self._points = np.load(os.path.join(self.index_dir, "points.npy"), mmap_mode="r")
+            self._offsets = np.load(os.path.join(self.index_dir, "offsets.npy"), mmap_mode="r")
+            self._candidates = np.load(os.path.join(self.index_dir, "candidates.npy"), mmap_mode="r")
+            self._rows, self._cols = meta["rows"], meta["cols"]
+            self._cell_km = meta["cell_km"]
+            self._places = [Place(**place) for place in meta["places"]]
+
+    def _read_meta(self) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.index_dir, "meta.json"), encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def reverse(self, lat: float, lon: float, max_distance_km: float = MAX_DISTANCE_KM) -> Optional[Place]:
+        """En yakın ilçe (ya da il) merkezi; kapsam dışındaysa ya da max_distance_km'den uzaksa None."""
+        if self._places is None:
+            self._load()
+        if not (LAT_MIN <= lat < LAT_MAX and LON_MIN <= lon < LON_MAX):
+            return None
+        x = (lon - LON_MIN) * _KM_PER_LON_DEGREE
+        y = (lat - LAT_MIN) * KM_PER_DEGREE
+        row = min(int(y // self._cell_km), self._rows - 1)
+        col = min(int(x // self._cell_km), self._cols - 1)
+        cell = row * self._cols + col
+        candidates = self._candidates[self._offsets[cell]:self._offsets[cell + 1]]
+        if not len(candidates):
+            return None
+        points = self._points[candidates]
+        distances = np.hypot(points[:, 0] - x, points[:, 1] - y)
+        best = int(distances.argmin())
+        distance = float(distances[best])
+        if distance > max_distance_km:
+            return None
+        return self._places[candidates[best]]._replace(distance_km=round(distance, 2))
+
+    def resolve(self, location, max_distance_km: float = MAX_DISTANCE_KM) -> Optional[Place]:
+        """(lat, lon) ya da "lat,lon" kabul eder; şehir adları ve bozuk değerler için None."""
+        if isinstance(location, str):
+            location = location.strip("() ").split(",")
+        if not isinstance(location, (tuple, list)) or len(location) != 2:
+            return None
+        try:
+            lat, lon = float(location[0]), float(location[1])
+        except (TypeError, ValueError):
+            return None
+        return self.reverse(lat, lon, max_distance_km)
+
+    def places(self) -> List[Place]:
+        if self._places is None:
+            self._load()
+        return list(self._places)
+
+
+_geocoder = ReverseGeocoder()
+
+
+def get_geocoder() -> ReverseGeocoder:
+    return _geocoder
+
+
+def import_geonames(dump: str, admin1_codes: str, source: str = SOURCE_CSV) -> int:
+    """
+    GeoNames ülke dökümündeki ADM2 (ilçe) kayıtlarını CSV'ye aktarır. İller mevcut
+    CSV'deki adlarından eşleştirilir; ilçesi bulunamayan illerin mevcut satırları korunur.
+    """
+    provinces, existing = {}, {}
+    for place in _read_places(source):
+        provinces.setdefault(slug(place["city"]), place)
+        existing.setdefault(place["city_id"], []).append(place)
+
+    admin1 = {}
+    with open(admin1_codes, encoding="utf-8") as file:
+        for line in file:
+            code, name, ascii_name = line.rstrip("\n").split("\t")[:3]
+            if code.startswith(f"{COUNTRY}."):
+                province = provinces.get(slug(ascii_name)) or provinces.get(slug(name))
+                if province is None:
+                    logger.warning(f"GeoNames ili eşleşmedi: {name}")
+                    continue
+                admin1[code.split(".", 1)[1]] = province
+
+    districts = {}
+    with open(dump, encoding="utf-8") as file:
+        for line in file:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 11 or fields[7] != "ADM2" or fields[10] not in admin1:
+                continue
+            province = admin1[fields[10]]
+            districts.setdefault(province["city_id"], []).append(
+                (province, re.sub(r"\s+(İlçesi|Ilcesi|District)$", "", fields[1]), float(fields[4]), float(fields[5]))
+            )
+
+    rows = []
+    for province in sorted(provinces.values(), key=lambda place: place["city_id"]):
+        code = province["city_id"].split("-")[1]
+        entries = districts.get(province["city_id"])
+        if not entries:
+            rows.extend((code, place["city"], place["district"] or "", place["lat"], place["lon"])
+                        for place in existing[province["city_id"]])
+            continue
+        for _, district, lat, lon in sorted(entries, key=lambda entry: entry[1]):
+            rows.append((code, province["city"], district, lat, lon))
+
+    with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(source), suffix=".csv", delete=False,
+                                     newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["city_code", "city", "district", "lat", "lon"])
+        writer.writerows((code, city, district, f"{lat:.4f}", f"{lon:.4f}") for code, city, district, lat, lon in rows)
+    os.replace(file.name, source)
+    logger.info(f"GeoNames aktarımı: {sum(len(entries) for entries in districts.values())} ilçe, {len(rows)} satır")
+    return len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Çevrimdışı ters coğrafi kodlayıcı")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("build")
+    geonames = commands.add_parser("import-geonames")
+    geonames.add_argument("dump", help="GeoNames ülke dökümü (ör. TR.txt)")
+    geonames.add_argument("admin1_codes", help="admin1CodesASCII.txt")
+    lookup = commands.add_parser("lookup")
+    lookup.add_argument("lat", type=float)
+    lookup.add_argument("lon", type=float)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "import-geonames":
+        import_geonames(args.dump, args.admin1_codes)
+        build_index()
+    elif args.command == "build":
+        build_index()
+    else:
+        print(get_geocoder().reverse(args.lat, args.lon))
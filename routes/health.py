@@ -1,18 +1,29 @@
+import logging
 import random
+import threading
 from datetime import datetime
+from cachetools import TTLCache
 from firebase_admin import db
 from flask import jsonify, request
 import requests
 import os
 from dotenv import load_dotenv
+from routes.wearables import get_wearable_data
+from models.repository import EmergencyContactRepository, UserRepository
+from routes.metrics import record_cache
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+CONTACTS_CACHE_TTL = 300  # saniye
+_contacts_cache = TTLCache(maxsize=10000, ttl=CONTACTS_CACHE_TTL)
+_contacts_lock = threading.Lock()
+
 def save_user_health_data(user_id, data):
     """Kullanıcının boy, kilo, kan grubu gibi bilgilerini Firebase'e kaydeder."""
     try:
-        ref = db.reference(f'/users/{user_id}/health_info')
-        ref.set({
+        UserRepository().set_health_info(user_id, {
             "blood_type": data.get('blood_type', 'Unknown'),
             "height": data.get('height', 0),     # cm cinsinden (default: 0)
             "weight": data.get('weight', 0),     # kg cinsinden (default: 0)
@@ -24,8 +35,7 @@ def save_user_health_data(user_id, data):
 
 def get_user_health_data(user_id):
     try:
-        ref = db.reference(f'/users/{user_id}/health_info')
-        data = ref.get() or {}
+        data = UserRepository().get_health_info(user_id) or {}
         return jsonify(data), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -40,23 +50,37 @@ def generate_synthetic_health_data():
 
 
 def get_fitbit_data(user_id):
-    """Fitbit API'den gerçek veri çeker (OAuth 2.0 gerektirir)."""
-    access_token = os.getenv("FITBIT_ACCESS_TOKEN")
-    if not access_token:
-        return None
-    
-    try:
-        headers = {"Authorization": f"Bearer {access_token}"}
-        response = requests.get(
-            "https://api.fitbit.com/1/user/-/activities/heart/date/today/1d.json",
-            headers=headers
-        )
-        if response.status_code == 200:
-            return response.json()
+    """Fitbit API'den gerçek veri çeker (kullanıcı token'ı, önbellek ve kota ile)."""
+    return get_wearable_data(user_id, "fitbit")
+
+def fitbit_health_sample(body):
+    """
+    Fitbit kalp atışı yanıtını (activities-heart) ölçüm şemasına çevirir.
+    Nabız intraday serisinin son değeridir, yoksa günlük dinlenme nabzı kullanılır.
+    Bu uç adım ve uyku vermez: steps / sleep_duration None döner. Nabız yoksa None.
+    """
+    if not isinstance(body, dict):
         return None
-    except Exception as e:
-        print("Fitbit API Hatası:", str(e))
+    day = (body.get("activities-heart") or [{}])[-1]
+    dataset = (body.get("activities-heart-intraday") or {}).get("dataset") or []
+    if dataset:
+        heart_rate = dataset[-1].get("value")
+        timestamp = f"{day.get('dateTime', datetime.now().date().isoformat())}T{dataset[-1].get('time')}"
+    else:
+        heart_rate = (day.get("value") or {}).get("restingHeartRate")
+        timestamp = datetime.now().isoformat()
+    if heart_rate is None:
         return None
+    return {
+        "heart_rate": heart_rate,
+        "steps": None,
+        "sleep_duration": None,
+        "timestamp": timestamp
+    }
+
+def get_health_sample(user_id):
+    """Kullanıcının giyilebilir cihazından son gerçek ölçüm; veri yoksa None (sentetik veri üretilmez)."""
+    return fitbit_health_sample(get_fitbit_data(user_id))
 
 def get_realtime_health_data(user_id, use_real_api=False):
     if use_real_api:
@@ -66,6 +90,12 @@ def get_realtime_health_data(user_id, use_real_api=False):
 
 
 def check_emergency(user_id):
+    return detect_emergency(user_id) is not None
+
+def detect_emergency(user_id):
+    """
+    Acil durum varsa kaydedilen sağlık verisini, yoksa None döner.
+    """
     health_data = get_realtime_health_data(user_id)
     
     # Örnek Acil Durum Koşulları
@@ -82,23 +112,22 @@ def check_emergency(user_id):
             "data": health_data,
             "timestamp": datetime.now().isoformat()
         })
-        return True
-    return False
+        return health_data
+    return None
 
 def add_emergency_contact(user_id, contact_data):
     """
     Yeni acil durum kişisi ekler veya günceller.
     """
     try:
-        ref = db.reference(f'/users/{user_id}/emergency_contacts')
         # Otomatik ID oluştur ve veriyi kaydet
-        new_contact_ref = ref.push()
-        new_contact_ref.set({
+        contact_id = EmergencyContactRepository().add(user_id, {
             "name": contact_data.get('name'),
             "phone": contact_data.get('phone'),
             "relationship": contact_data.get('relationship')
         })
-        return jsonify({"success": True, "contact_id": new_contact_ref.key}), 200
+        invalidate_emergency_contacts(user_id)
+        return jsonify({"success": True, "contact_id": contact_id}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
@@ -107,48 +136,56 @@ def get_emergency_contacts(user_id):
     Kullanıcının tüm acil durum kişilerini listeler.
     """
     try:
-        ref = db.reference(f'/users/{user_id}/emergency_contacts')
-        contacts = ref.get() or {}
-        return jsonify(contacts), 200
+        return jsonify(load_emergency_contacts(user_id)), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+def load_emergency_contacts(user_id) -> dict:
+    """
+    Acil durum kişilerini dict olarak döner (TTL önbellekli).
+    """
+    with _contacts_lock:
+        contacts = _contacts_cache.get(user_id)
+    record_cache("emergency_contacts", contacts is not None)
+    if contacts is not None:
+        return contacts
+
+    contacts = EmergencyContactRepository().get_all(user_id)
+    with _contacts_lock:
+        _contacts_cache[user_id] = contacts
+    return contacts
+
+def invalidate_emergency_contacts(user_id):
+    with _contacts_lock:
+        _contacts_cache.pop(user_id, None)
     
 def delete_emergency_contact(user_id, contact_id):
     """
     Belirli bir acil durum kişisini siler.
     """
     try:
-        ref = db.reference(f'/users/{user_id}/emergency_contacts/{contact_id}')
-        ref.delete()
+        EmergencyContactRepository().delete(user_id, contact_id)
+        invalidate_emergency_contacts(user_id)
         return jsonify({"success": True}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
-from routes.health import *
-from twilio.rest import Client
-import os
+from routes.sms_dispatch import get_sms_dispatcher, unique_recipients
 
 def send_emergency_sms(user_id, message):
     """
-    Acil durum kişilerine SMS gönderir.
+    Acil durum kişilerine SMS gönderir (tekrarsız numaralara, paralel).
+    En az bir SMS iletildiyse True döner.
     """
     try:
-        # Acil durum kişilerini al
-        contacts = get_emergency_contacts(user_id).get_json()
-        
-        # Twilio client'ı başlat
-        client = Client(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
-        
-        # Her bir kişiye SMS gönder
-        for contact_id, contact in contacts.items():
-            client.messages.create(
-                body=f"ACİL DURUM: {message}",
-                from_=os.getenv("TWILIO_PHONE_NUMBER"),
-                to=contact['phone']
-            )
-        return True
+        recipients = unique_recipients(load_emergency_contacts(user_id))
+        if not recipients:
+            return False
+
+        results = get_sms_dispatcher().send_bulk(recipients, f"ACİL DURUM: {message}")
+        return any(result["status"] == "sent" for result in results)
     except Exception as e:
-        print("SMS gönderilemedi:", str(e))
+        logger.error(f"Acil durum SMS'i gönderilemedi ({user_id}): {str(e)}")
         return False
 
 def trigger_emergency(user_id):
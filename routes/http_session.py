@@ -0,0 +1,44 @@
+import logging
+import os
+import threading
+from typing import Iterable
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+POOL_CONNECTIONS = 16        # Farklı host sayısı
+POOL_MAXSIZE = 32            # Host başına açık tutulan bağlantı (worker thread sayısından büyük olmalı)
+
+_session = None
+_session_pid = None
+_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Süreç başına tek bir keep-alive bağlantı havuzu. fork sonrası üst sürecin
+    soketleri paylaşılmasın diye her süreç kendi oturumunu açar.
+    """
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        with _lock:
+            if _session is None or _session_pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+                _session_pid = os.getpid()
+    return _session
+
+
+def warm_up(urls: Iterable[str], timeout: float = 3):
+    """TLS el sıkışmasını trafikten önce yapmak için her hosta birer HEAD isteği atar."""
+    session = get_session()
+    for url in urls:
+        try:
+            session.head(url, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Bağlantı ısıtma başarısız ({url}): {str(e)}")
@@ -0,0 +1,213 @@
+"""
+/set_location için yazma tamponu (write-behind).
+
+Mobil istemciler her GPS ölçümünde konum gönderir. Tampon kullanıcı başına
+yalnızca son konumu tutar; kullanıcı son kaydedilen konumdan MIN_DISTANCE_M'den
+fazla uzaklaştıysa ya da son kayıttan bu yana MAX_INTERVAL_SECONDS geçtiyse
+giriş "kirli" işaretlenir. Kirli girişler FLUSH_INTERVAL_SECONDS'da bir tek bir
+multi-path update ile yazılır; yazılan kullanıcıların özet indeksi ardından
+güncellenir. Okuyucular (UserRepository.get_location) kirli girişin henüz
+yazılmamış konumunu hemen görür (app.py, LocationBuffer.latest'i init_repository
+ile bağlar); temiz girişler için veritabanı okunur.
+
+Tampon süreç başınadır: farklı worker'lara düşen ölçümler kendi kurallarıyla
+kaydedilir. Kaydedilmiş (temiz) giriş okumalarda kullanılmaz; kullanıcının sonraki
+konumu başka bir worker'da kaydedildiyse bu worker eski konumu vermez.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from models.repository import UserRepository
+from routes.cafe_recommendation_service import CafeRecommendationService
+from routes.digest import index_users
+from routes.metrics import inc, register
+from routes.weather_history import cell_id
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MIN_DISTANCE_M = float(os.getenv("LOCATION_MIN_DISTANCE_M", "100"))
+MAX_INTERVAL_SECONDS = float(os.getenv("LOCATION_MAX_INTERVAL_SECONDS", "600"))
+FLUSH_INTERVAL_SECONDS = float(os.getenv("LOCATION_FLUSH_INTERVAL_SECONDS", "2"))
+WRITE_CHUNK = 500               # Tek multi-path update'teki kullanıcı sayısı
+IDLE_EVICT_SECONDS = 2 * MAX_INTERVAL_SECONDS   # Kaydedilmiş ve sessiz girişler bellekten atılır
+
+register("location_updates_total", "counter",
+         "Konum güncellemeleri (received: istemciden gelen, persisted: veritabanına yazılan)", ("result",))
+register("location_flush_writes_total", "counter", "Konum tamponunun yaptığı veritabanı yazmaları")
+
+
+def _coordinates(location: str) -> Optional[Tuple[float, float]]:
+    parts = str(location).strip("() ").split(",")
+    if len(parts) != 2:
+        return None
+    try:
+        return float(parts[0]), float(parts[1])
+    except ValueError:
+        return None
+
+
+@dataclass
+class _Entry:
+    location: str                       # Okuyuculara verilen son konum
+    persisted: Optional[str] = None     # Veritabanındaki son konum (bilinmiyorsa None)
+    persisted_at: float = 0.0
+    updated_at: float = 0.0
+    dirty: bool = True
+
+
+class LocationBuffer:
+    def __init__(self, min_distance_m: float = MIN_DISTANCE_M, max_interval: float = MAX_INTERVAL_SECONDS,
+                 flush_interval: float = FLUSH_INTERVAL_SECONDS):
+        self.min_distance_m = min_distance_m
+        self.max_interval = max_interval
+        self.flush_interval = flush_interval
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stop = threading.Event()
+        self.stats = {"updates": 0, "persisted": 0, "writes": 0}
+
+    def _moved(self, entry: _Entry, location: str) -> bool:
+        if entry.persisted is None:
+            return True
+        new, old = _coordinates(location), _coordinates(entry.persisted)
+        if new is None or old is None:
+            return location != entry.persisted
+        return CafeRecommendationService.calculate_distance(*old, *new) > self.min_distance_m
+
+    def update(self, user_id: str, location: str):
+        """Son konumu tampona yazar; kaydedilmesi gerekiyorsa bir sonraki flush'ta yazılır."""
+        self._ensure_started()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                entry = self._entries[user_id] = _Entry(location)
+            entry.location = location
+            entry.updated_at = now
+            if not entry.dirty and (self._moved(entry, location) or now - entry.persisted_at >= self.max_interval):
+                entry.dirty = True
+            self.stats["updates"] += 1
+        inc("location_updates_total", ("received",))
+
+    def latest(self, user_id: str) -> Optional[str]:
+        """Kaydedilmeyi bekleyen (kirli) son konum; giriş yoksa ya da temizse None."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            return entry.location if entry and entry.dirty else None
+
+    def flush(self, force: bool = False) -> int:
+        """
+        Kirli girişleri yazar. `force` ise kaydedilenden farklı olan tüm girişler
+        yazılır (kapanışta son konumlar kaybolmasın). Yazılan kullanıcı sayısını döner.
+        """
+        # Zamanlayıcı ve kapanış aynı anda flush etmesin
+        with self._flush_lock:
+            now = time.monotonic()
+            with self._lock:
+                pending = {uid: entry.location for uid, entry in self._entries.items()
+                           if entry.dirty or (force and entry.location != entry.persisted)}
+                previous = {uid: self._entries[uid].persisted for uid in pending}
+                for uid, entry in list(self._entries.items()):
+                    if not entry.dirty and now - entry.updated_at > IDLE_EVICT_SECONDS:
+                        del self._entries[uid]
+            if not pending:
+                return 0
+
+            uids = list(pending)
+            repository = UserRepository()
+            written = []
+            for start in range(0, len(uids), WRITE_CHUNK):
+                chunk = uids[start:start + WRITE_CHUNK]
+                try:
+                    repository.set_locations({uid: pending[uid] for uid in chunk})
+                except Exception as e:
+                    # Girişler kirli kalır; bir sonraki flush'ta tekrar denenir
+                    logger.error(f"Konum tamponu yazılamadı ({len(chunk)} kullanıcı): {str(e)}")
+                    continue
+                written.extend(chunk)
+
+            with self._lock:
+                for uid in written:
+                    entry = self._entries.get(uid)
+                    if entry is None:
+                        continue
+                    entry.persisted = pending[uid]
+                    entry.persisted_at = now
+                    # Flush sırasında yeni konum geldiyse kural yeniden değerlendirilir
+                    entry.dirty = entry.location != pending[uid] and self._moved(entry, entry.location)
+            self._count(len(written), -(-len(written) // WRITE_CHUNK))
+            self._reindex([uid for uid in written
+                           if previous[uid] is None or cell_id(previous[uid]) != cell_id(pending[uid])])
+            return len(written)
+
+    def _count(self, persisted: int, writes: int):
+        with self._lock:
+            self.stats["persisted"] += persisted
+            self.stats["writes"] += writes
+        inc("location_updates_total", ("persisted",), persisted)
+        inc("location_flush_writes_total", (), writes)
+
+    def _reindex(self, user_ids):
+        """Hücresi değişen kullanıcıların özet indeksi (veritabanındaki yeni konumla)."""
+        if not user_ids:
+            return
+        try:
+            index_users(user_ids)
+        except Exception as e:
+            logger.warning(f"Özet indeksi güncellenemedi ({len(user_ids)} kullanıcı): {str(e)}")
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Konum tamponu flush hatası: {str(e)}")
+
+    def _ensure_started(self):
+        # Fork'tan sonra (gunicorn worker'ı) flush thread'i yeniden başlatılır
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is None:
+                atexit.register(self.flush, True)
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="location-buffer", daemon=True)
+            self._thread.start()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            pending = sum(1 for entry in self._entries.values() if entry.dirty)
+            tracked = len(self._entries)
+        stats.update({
+            "tracked_users": tracked,
+            "pending_users": pending,
+            # Tampon olmasaydı her güncelleme ayrı bir yazma olurdu
+            "coalesced": stats["updates"] - stats["persisted"] - pending,
+            "writes_saved": stats["updates"] - stats["writes"] - pending,
+            "write_amplification": round(stats["writes"] / stats["updates"], 4) if stats["updates"] else None,
+        })
+        return stats
+
+
+_buffer = LocationBuffer()
+
+
+def get_location_buffer() -> LocationBuffer:
+    return _buffer
+
@@ -0,0 +1,387 @@
+"""
+Prometheus metrikleri.
+
+Süreç içinde her thread kendi shard'ına yazar. gunicorn'da her worker kendi
+toplamını METRICS_FLUSH_SECONDS'da bir (ve /metrics isteğinde) makinedeki
+paylaşımlı sqlite dosyasına (paylaşımlı önbellekle aynı dosya) yazar; /metrics
+hangi worker'a düşerse düşsün tüm worker'ların toplamını döner. Sonlanan
+worker'ların sayaç ve histogramları korunur (sayaçlar geri gitmez), gauge'ları
+atılır. CACHE_BACKEND=memory iken yalnızca yanıtlayan sürecin değerleri döner.
+"""
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from flask import Response, g, request
+
+from routes.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Saniye cinsinden histogram sınırları
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+RETIRED_PID = 0             # Sonlanmış worker'ların devredilen değerleri bu satırda toplanır
+
+class _Metric:
+    def __init__(self, name: str, kind: str, help_text: str, labels: Tuple[str, ...]):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.labels = labels
+
+
+_metrics: Dict[str, _Metric] = {}
+_shards: List[tuple] = []       # (thread weakref, shard)
+_retired: dict = {}             # Sonlanmış thread'lerden devralınan değerler
+_shards_lock = threading.Lock()
+_local = threading.local()
+_flusher_pid: Optional[int] = None
+
+
+def _shard() -> dict:
+    """
+    Her thread kendi sayaçlarına kilitsiz yazar; /metrics isteğinde tüm
+    thread'lerin değerleri toplanır. Kilit yalnızca yeni thread ilk kez yazarken alınır.
+    """
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = {}
+        with _shards_lock:
+            _retire_finished()
+            _shards.append((weakref.ref(threading.current_thread()), shard))
+        _ensure_flusher()
+    return shard
+
+
+def _reset_after_fork():
+    # Üst süreçten kopyalanan değerler worker'da tekrar sayılmasın
+    global _shards_lock, _flusher_pid
+    _shards_lock = threading.Lock()
+    _shards.clear()
+    _retired.clear()
+    _local.__dict__.clear()
+    _flusher_pid = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _add(total: dict, shard: dict):
+    for key, value in list(shard.items()):
+        if isinstance(value, list):
+            series = total.get(key)
+            if series is None:
+                total[key] = list(value)
+            else:
+                for i, v in enumerate(value):
+                    series[i] += v
+        else:
+            total[key] = total.get(key, 0) + value
+
+
+def _retire_finished():
+    """
+    Sonlanmış thread'lerin shard'larını _retired'a aktarıp listeden çıkarır; kısa ömürlü
+    thread'ler shard biriktirmez. Sonlanmış thread artık yazmadığı için aktarım güvenlidir.
+    Çağıran _shards_lock'u tutar.
+    """
+    alive = []
+    for ref, shard in _shards:
+        thread = ref()
+        if thread is not None and thread.is_alive():
+            alive.append((ref, shard))
+        else:
+            _add(_retired, shard)
+    _shards[:] = alive
+
+
+def register(name: str, kind: str, help_text: str, labels: Tuple[str, ...] = ()):
+    _metrics[name] = _Metric(name, kind, help_text, labels)
+
+
+def inc(name: str, labels: tuple = (), amount: float = 1):
+    shard = _shard()
+    key = (name, labels)
+    shard[key] = shard.get(key, 0) + amount
+
+
+def observe(name: str, labels: tuple, value: float):
+    shard = _shard()
+    key = (name, labels)
+    series = shard.get(key)
+    if series is None:
+        # [bucket sayaçları..., toplam, adet]
+        series = shard[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if value <= bound:
+            series[i] += 1
+            break
+    series[-2] += value
+    series[-1] += 1
+
+
+def record_cache(cache: str, hit: bool):
+    inc("cache_requests_total", (cache, "hit" if hit else "miss"))
+
+
+@contextmanager
+def track_upstream(upstream: str, operation: str = "request", **attrs):
+    """
+    Dış servis çağrısının süresini, sonucunu ve eşzamanlı çağrı sayısını ölçer;
+    aktif isteğin izine (trace) de bir span olarak eklenir.
+    """
+    inc("upstream_in_flight", (upstream,))
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        with span(f"{upstream}.{operation}", **attrs):
+            yield
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        observe("upstream_request_duration_seconds", (upstream, operation, outcome),
+                time.perf_counter() - started)
+        inc("upstream_in_flight", (upstream,), -1)
+
+
+register("http_request_duration_seconds", "histogram",
+         "Flask endpoint başına istek süresi", ("endpoint", "method", "status"))
+register("http_requests_in_flight", "gauge", "İşlenmekte olan istek sayısı", ("endpoint",))
+register("upstream_request_duration_seconds", "histogram",
+         "Dış servis çağrı süresi", ("upstream", "operation", "outcome"))
+register("upstream_in_flight", "gauge", "Devam eden dış servis çağrısı sayısı", ("upstream",))
+register("cache_requests_total", "counter", "Önbellek isabet / ıskalama sayısı", ("cache", "result"))
+
+
+def _merge() -> Dict[tuple, object]:
+    merged: Dict[tuple, object] = {}
+    with _shards_lock:
+        _retire_finished()
+        _add(merged, _retired)
+        shards = [shard for _, shard in _shards]
+    for shard in shards:
+        _add(merged, shard)
+    return merged
+
+
+class _WorkerSnapshots:
+    """Makinedeki süreçlerin metrik toplamları: süreç başına bir satır (pid, JSON)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connection().execute("CREATE TABLE IF NOT EXISTS metric_snapshots ("
+                                   "pid INTEGER PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # fork sonrası üst süreçten kalan bağlantı kullanılmaz
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _dump(values: Dict[tuple, object]) -> str:
+        return json.dumps([[name, list(labels), value] for (name, labels), value in values.items()])
+
+    @staticmethod
+    def _load(data: str) -> Dict[tuple, object]:
+        return {(name, tuple(labels)): value for name, labels, value in json.loads(data)}
+
+    def write(self, values: Dict[tuple, object]):
+        self._connection().execute(
+            "INSERT INTO metric_snapshots (pid, data, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(pid) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            (os.getpid(), self._dump(values), time.time()))
+
+    def read_all(self) -> Dict[tuple, object]:
+        """Tüm süreçlerin toplamı; sonlanmış süreçler okurken RETIRED_PID satırına aktarılır."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = {pid: self._load(data) for pid, data in conn.execute("SELECT pid, data FROM metric_snapshots")}
+            dead = [pid for pid in rows if pid != RETIRED_PID and not _process_alive(pid)]
+            if dead:
+                retired = rows.setdefault(RETIRED_PID, {})
+                for pid in dead:
+                    _add(retired, {key: value for key, value in rows.pop(pid).items()
+                                   if _kind(key[0]) != "gauge"})
+                    conn.execute("DELETE FROM metric_snapshots WHERE pid = ?", (pid,))
+                conn.execute("INSERT INTO metric_snapshots (pid, data, updated_at) VALUES (?, ?, ?) "
+                             "ON CONFLICT(pid) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                             (RETIRED_PID, self._dump(retired), time.time()))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        total: Dict[tuple, object] = {}
+        for values in rows.values():
+            _add(total, values)
+        return total
+
+
+def _kind(name: str) -> Optional[str]:
+    metric = _metrics.get(name)
+    return metric.kind if metric else None
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_snapshots: Optional[_WorkerSnapshots] = None
+
+
+def _snapshot_store() -> Optional[_WorkerSnapshots]:
+    """Paylaşımlı önbelleğin sqlite dosyası; paylaşımlı katman yoksa None."""
+    global _snapshots
+    from routes.cache_backend import TieredCache, get_cache
+    backend = get_cache().backend
+    if not isinstance(backend, TieredCache):
+        return None
+    if _snapshots is None or _snapshots.path != backend.shared.path:
+        _snapshots = _WorkerSnapshots(backend.shared.path)
+    return _snapshots
+
+
+def flush():
+    """Bu sürecin toplamını paylaşımlı dosyaya yazar."""
+    store = _snapshot_store()
+    if store is not None:
+        store.write(_merge())
+
+
+def _ensure_flusher():
+    global _flusher_pid
+    with _shards_lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_run_flusher, name="metrics-flush", daemon=True).start()
+
+
+def _run_flusher():
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
+        try:
+            flush()
+        except Exception as e:
+            logger.warning(f"Metrikler paylaşımlı dosyaya yazılamadı: {str(e)}")
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        pass
+
+
+def collect() -> Dict[tuple, object]:
+    """Makinedeki tüm worker'ların toplamı (paylaşımlı katman yoksa yalnızca bu süreç)."""
+    merged = _merge()
+    try:
+        store = _snapshot_store()
+        if store is None:
+            return merged
+        store.write(merged)
+        return store.read_all()
+    except sqlite3.Error as e:
+        logger.error(f"Worker metrikleri toplanamadı, yalnızca bu süreç döndü: {str(e)}")
+        return merged
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render() -> str:
+    """Prometheus text formatında (0.0.4) çıktı üretir."""
+    merged = collect()
+    lines = []
+    for metric in _metrics.values():
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for (name, labels), value in sorted(merged.items(), key=lambda item: str(item[0])):
+            if name != metric.name:
+                continue
+            if metric.kind == "histogram":
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, value):
+                    cumulative += count
+                    bucket_labels = _labels(metric.labels, labels, 'le="%s"' % bound)
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                bucket_labels = _labels(metric.labels, labels, 'le="+Inf"')
+                lines.append(f"{name}_bucket{bucket_labels} {value[-1]}")
+                lines.append(f"{name}_sum{_labels(metric.labels, labels)} {value[-2]:.6f}")
+                lines.append(f"{name}_count{_labels(metric.labels, labels)} {value[-1]}")
+            else:
+                lines.append(f"{name}{_labels(metric.labels, labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _endpoint() -> str:
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def _before_request():
+    g._metrics_started = time.perf_counter()
+    g._metrics_endpoint = _endpoint()
+    inc("http_requests_in_flight", (g._metrics_endpoint,))
+
+
+def _after_request(response):
+    started = getattr(g, "_metrics_started", None)
+    if started is not None:
+        observe("http_request_duration_seconds",
+                (g._metrics_endpoint, request.method, str(response.status_code)),
+                time.perf_counter() - started)
+        g._metrics_observed = True
+    return response
+
+
+def _teardown_request(error=None):
+    endpoint = getattr(g, "_metrics_endpoint", None)
+    if endpoint is None:
+        return
+    if error is not None and not getattr(g, "_metrics_observed", False):
+        observe("http_request_duration_seconds", (endpoint, request.method, "500"),
+                time.perf_counter() - g._metrics_started)
+    inc("http_requests_in_flight", (endpoint,), -1)
+
+
+def init_metrics(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,72 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+PROFILE_MAX_SECONDS = 60
+PROFILE_INTERVAL = 0.005     # 5 ms -> saniyede ~200 örnek
+MAX_STACK_DEPTH = 128
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """
+    Tüm thread'lerin çağrı yığınlarını belirli aralıklarla örnekler ve
+    flamegraph.pl / speedscope'un okuyabildiği "collapsed stack" formatında döner.
+    Çalışan koda enstrümantasyon eklemediği için production'da güvenle açılabilir.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def _sample(self, counts: Counter, ignore: int):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == ignore:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                counts[";".join(reversed(stack))] += 1
+
+    def profile(self, seconds: float) -> str:
+        """`seconds` boyunca örnekler; aynı anda yalnızca bir profil çalışabilir."""
+        seconds = min(max(float(seconds), 0.1), PROFILE_MAX_SECONDS)
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("Profil zaten çalışıyor")
+        try:
+            counts: Counter = Counter()
+            me = threading.get_ident()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                self._sample(counts, me)
+                time.sleep(self.interval)
+            return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+        finally:
+            self._lock.release()
+
+
+_profiler: Optional[SamplingProfiler] = None
+
+
+def get_profiler() -> SamplingProfiler:
+    global _profiler
+    if _profiler is None:
+        _profiler = SamplingProfiler()
+    return _profiler
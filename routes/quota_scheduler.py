@@ -0,0 +1,187 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import requests
+from dotenv import load_dotenv
+from flask import has_request_context
+
+from routes.cache_backend import get_cache
+from routes.metrics import inc, register
+from routes.token_bucket import SharedTokenBucket
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_EMERGENCY = "emergency"
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BACKGROUND = "background"
+PRIORITIES = (PRIORITY_EMERGENCY, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND)
+
+# Saniyelik kovadan bu oran kadar token üst önceliklere bırakılır
+BUCKET_RESERVE = {PRIORITY_EMERGENCY: 0.0, PRIORITY_INTERACTIVE: 0.2, PRIORITY_BACKGROUND: 0.5}
+# Günlük kotanın en fazla bu kadarını kullanabilir
+DAILY_SHARE = {PRIORITY_EMERGENCY: 1.0, PRIORITY_INTERACTIVE: 0.9, PRIORITY_BACKGROUND: 0.7}
+# Token yoksa en fazla bu kadar sıra beklenir; arka plan işleri beklemeden bırakılır
+MAX_WAIT_SECONDS = {PRIORITY_EMERGENCY: 5.0, PRIORITY_INTERACTIVE: 2.0, PRIORITY_BACKGROUND: 0.0}
+DAY_SECONDS = 86400
+
+_priority: ContextVar[Optional[str]] = ContextVar("upstream_priority", default=None)
+
+register("upstream_quota_decisions_total", "counter",
+         "Kota zamanlayıcısı kararları (granted / waited / shed)", ("upstream", "priority", "result"))
+
+
+class QuotaExceeded(requests.exceptions.RequestException):
+    """
+    Upstream kotası bu öncelik için doldu. RequestException'dan türediği için
+    mevcut "servise ulaşılamıyor" hata yolları aynen çalışır.
+    """
+
+    def __init__(self, upstream: str, priority: str, reason: str, retry_after: float):
+        super().__init__(f"{upstream} kotası doldu ({priority}, {reason})")
+        self.upstream = upstream
+        self.priority = priority
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class UpstreamQuota:
+    def __init__(self, name: str, per_second: float, burst: float, daily_limit: Optional[int]):
+        self.name = name
+        self.per_second = per_second
+        self.daily_limit = daily_limit
+        # Saniyelik hız da günlük sayaç gibi tüm worker'larda ortaktır
+        self.bucket = SharedTokenBucket(f"quota:{name}", burst, per_second)
+        self.stats = {priority: {"granted": 0, "waited": 0, "shed": 0} for priority in PRIORITIES}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, priority: str, field: str):
+        with self._stats_lock:
+            self.stats[priority][field] += 1
+        inc("upstream_quota_decisions_total", (self.name, priority, field))
+
+    def _daily_key(self) -> str:
+        return f"quota:{self.name}:{datetime.now(timezone.utc).strftime('%Y-%m-%d')}"
+
+    def _take_daily(self, priority: str) -> bool:
+        if self.daily_limit is None:
+            return True
+        limit = int(self.daily_limit * DAILY_SHARE[priority])
+        # Tüm worker'lar aynı sayacı paylaşır (paylaşımlı önbellek katmanı)
+        return get_cache().backend.incr(self._daily_key(), 1, limit, DAY_SECONDS * 2) is not None
+
+    def acquire(self, priority: str):
+        # Kova tek token'lıksa (ör. Nominatim) ayrılacak pay yoktur
+        reserve = min(self.bucket.capacity * BUCKET_RESERVE[priority], self.bucket.capacity - 1)
+        deadline = time.monotonic() + MAX_WAIT_SECONDS[priority]
+        waited = False
+        while True:
+            ok, retry_after = self.bucket.try_acquire(1, reserve=reserve)
+            if ok:
+                break
+            if time.monotonic() + retry_after > deadline:
+                self._count(priority, "shed")
+                raise QuotaExceeded(self.name, priority, "rate", retry_after)
+            waited = True
+            time.sleep(retry_after)
+
+        if not self._take_daily(priority):
+            self.bucket.refund()
+            self._count(priority, "shed")
+            raise QuotaExceeded(self.name, priority, "daily", _seconds_until_utc_midnight())
+
+        self._count(priority, "waited" if waited else "granted")
+
+    def snapshot(self) -> dict:
+        used = get_cache().backend.counter(self._daily_key()) if self.daily_limit is not None else None
+        with self._stats_lock:
+            stats = {priority: dict(values) for priority, values in self.stats.items()}
+        return {
+            "per_second": self.per_second,
+            "burst": self.bucket.capacity,
+            "tokens_available": round(self.bucket.available(), 2),
+            "daily_limit": self.daily_limit,
+            "daily_used": used,
+            "daily_remaining": None if used is None else max(0, self.daily_limit - used),
+            "lanes": stats,
+        }
+
+
+def _seconds_until_utc_midnight() -> float:
+    now = time.time()
+    return DAY_SECONDS - now % DAY_SECONDS
+
+
+def _env_number(name: str, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return None if value.lower() in ("", "none", "unlimited") else float(value)
+
+
+def _quota_from_env(name: str, per_second: float, burst: float, daily_limit: Optional[int]) -> UpstreamQuota:
+    prefix = f"QUOTA_{name.upper()}"
+    daily = _env_number(f"{prefix}_DAILY", daily_limit)
+    return UpstreamQuota(
+        name,
+        per_second=_env_number(f"{prefix}_PER_SECOND", per_second),
+        burst=_env_number(f"{prefix}_BURST", burst),
+        daily_limit=None if daily is None else int(daily),
+    )
+
+
+class QuotaScheduler:
+    """
+    Upstream başına saniyelik token bucket + günlük bütçe, öncelik şeritleriyle.
+    İkisi de paylaşımlı önbellek sayacındadır: limitler worker sayısından bağımsız
+    olarak makinenin toplamıdır.
+    Acil durum akışları tüm kotayı kullanabilir; etkileşimli istekler bir pay,
+    arka plan ön-getirmeleri daha büyük bir pay bırakır ve beklemeden bırakılır.
+    """
+
+    def __init__(self):
+        self.quotas: Dict[str, UpstreamQuota] = {}
+
+    def register(self, quota: UpstreamQuota):
+        self.quotas[quota.name] = quota
+
+    def acquire(self, upstream: str, priority: Optional[str] = None):
+        quota = self.quotas.get(upstream)
+        if quota is None:
+            return
+        quota.acquire(priority or current_priority())
+
+    def snapshot(self) -> dict:
+        return {name: quota.snapshot() for name, quota in self.quotas.items()}
+
+
+def current_priority() -> str:
+    """Açıkça ayarlanmadıysa: istek içinde etkileşimli, istek dışında arka plan."""
+    value = _priority.get()
+    if value is not None:
+        return value
+    return PRIORITY_INTERACTIVE if has_request_context() else PRIORITY_BACKGROUND
+
+
+@contextmanager
+def priority(value: str):
+    """Blok (veya dekoratör olarak fonksiyon) içindeki upstream çağrılarının öncelik sınıfını belirler."""
+    token = _priority.set(value)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+scheduler = QuotaScheduler()
+# Ücretsiz katman varsayılanları; QUOTA_<UPSTREAM>_PER_SECOND / _BURST / _DAILY ile değiştirilebilir
+scheduler.register(_quota_from_env("visual_crossing", per_second=5, burst=10, daily_limit=1000))
+scheduler.register(_quota_from_env("places", per_second=10, burst=20, daily_limit=5000))
+scheduler.register(_quota_from_env("nominatim", per_second=1, burst=1, daily_limit=None))  # Kullanım politikası: en fazla 1 istek/sn
@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Dict, Optional
+
+import requests
+from dotenv import load_dotenv
+from flask import g, has_request_context
+
+from routes.metrics import inc, register
+from routes.quota_scheduler import PRIORITY_BACKGROUND, QuotaExceeded, scheduler
+from routes.tracing import submit
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = 5        # Art arda bu kadar hatada devre açılır
+RESET_TIMEOUT = 30.0         # Açık devre bu süre sonra tek bir deneme isteğine izin verir
+HEDGE_AFTER_SECONDS = float(os.getenv("HEDGE_AFTER_SECONDS", "1.0"))
+HEDGE_WORKERS = 16
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+register("upstream_circuit_transitions_total", "counter",
+         "Devre kesici durum değişimleri", ("upstream", "state"))
+register("upstream_hedged_requests_total", "counter",
+         "Yavaş / hatalı ilk denemeden sonra atılan ek istekler", ("upstream",))
+
+
+class CircuitOpen(requests.exceptions.RequestException):
+    """Upstream devre kesicisi açık; istek hiç gönderilmedi."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} devre kesici açık")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+def _is_failure(error: Exception) -> bool:
+    """4xx (ör. geçersiz konum) upstream'in sağlığını göstermez; 429 ve 5xx gösterir."""
+    if isinstance(error, (QuotaExceeded, CircuitOpen)):
+        return False
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None) or getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(error, (requests.exceptions.RequestException, TimeoutError, ConnectionError))
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = FAILURE_THRESHOLD,
+                 reset_timeout: float = RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str):
+        self.state = state
+        inc("upstream_circuit_transitions_total", (self.name, state))
+        logger.warning(f"{self.name} devre kesici: {state}")
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return True
+            if self.state == STATE_OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._transition(STATE_HALF_OPEN)
+            if self.state == STATE_HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probe_in_flight = False
+            if self.state != STATE_CLOSED:
+                self._transition(STATE_CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == STATE_HALF_OPEN or (self.state == STATE_CLOSED and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self._transition(STATE_OPEN)
+
+    def release_probe(self):
+        """Deneme isteği sağlık bilgisi vermeden bittiyse (ör. 4xx) sıradakine izin ver."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry_after = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)) \
+                if self.state == STATE_OPEN else 0.0
+            return {"state": self.state, "consecutive_failures": self.failures,
+                    "retry_after": round(retry_after, 1)}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+_hedge_pool: Optional[ThreadPoolExecutor] = None
+
+
+def get_breaker(upstream: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(upstream)
+        if breaker is None:
+            breaker = _breakers[upstream] = CircuitBreaker(upstream)
+        return breaker
+
+
+def breaker_states() -> Dict[str, dict]:
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.snapshot() for name, breaker in breakers.items()}
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _hedge_pool
+    with _breakers_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+        return _hedge_pool
+
+
+def _hedge_allowed(upstream: str) -> bool:
+    """Ek istek de kota harcar; arka plan şeridinde izin yoksa hedge yapılmaz."""
+    try:
+        scheduler.acquire(upstream, PRIORITY_BACKGROUND)
+        return True
+    except QuotaExceeded:
+        return False
+
+
+def hedged(upstream: str, attempt: Callable[[], object], hedge_after: float = HEDGE_AFTER_SECONDS,
+           max_attempts: int = 2):
+    """
+    `attempt` `hedge_after` saniyede dönmezse (ya da hata verirse) ikinci bir
+    deneme başlatır ve ilk başarılı sonucu döner. Yalnızca idempotent GET'ler için.
+    """
+    pending = {submit(_pool(), attempt)}
+    attempts = 1
+    last_error: Optional[Exception] = None
+    while pending:
+        done, pending = wait(pending, timeout=hedge_after if attempts < max_attempts else None,
+                             return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                return future.result()
+            except Exception as e:
+                last_error = e
+                if not _is_failure(e):
+                    raise
+        if attempts < max_attempts:
+            attempts += 1
+            if _hedge_allowed(upstream):
+                inc("upstream_hedged_requests_total", (upstream,))
+                pending.add(submit(_pool(), attempt))
+            else:
+                attempts = max_attempts
+    raise last_error
+
+
+def call_upstream(upstream: str, attempt: Callable[[], object], hedge: bool = True):
+    """
+    Devre kesici + kota + (isteğe bağlı) hedged istek. Devre açıksa kota
+    harcanmadan CircuitOpen fırlatılır; çağıran önbellekteki eski veriye düşebilir.
+    """
+    breaker = get_breaker(upstream)
+    if not breaker.allow():
+        raise CircuitOpen(upstream, breaker.snapshot()["retry_after"])
+    try:
+        scheduler.acquire(upstream)
+    except QuotaExceeded:
+        breaker.release_probe()
+        raise
+    try:
+        result = hedged(upstream, attempt) if hedge else attempt()
+    except Exception as e:
+        if _is_failure(e):
+            breaker.record_failure()
+        else:
+            breaker.release_probe()
+        raise
+    breaker.record_success()
+    return result
+
+
+async def call_upstream_async(upstream: str, attempt: Callable[[], Awaitable], lane: str):
+    """
+    call_upstream'ın asyncio karşılığı. Kota beklemesi loop'u bloklamasın diye
+    executor'da yapılır; öncelik şeridi açıkça verilir (loop thread'inde istek bağlamı yok).
+    Hedge yapılmaz: toplu isteklerde eşzamanlılık zaten var.
+    """
+    breaker = get_breaker(upstream)
+    if not breaker.allow():
+        raise CircuitOpen(upstream, breaker.snapshot()["retry_after"])
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, scheduler.acquire, upstream, lane)
+    except QuotaExceeded:
+        breaker.release_probe()
+        raise
+    try:
+        result = await attempt()
+    except Exception as e:
+        if _is_failure(e):
+            breaker.record_failure()
+        else:
+            breaker.release_probe()
+        raise
+    breaker.record_success()
+    return result
+
+
+def mark_stale(age: float):
+    """Yanıtın önbellekteki eski veriden üretildiğini işaretler (bkz. init_resilience)."""
+    if has_request_context():
+        g._stale_age = max(getattr(g, "_stale_age", 0.0), age)
+
+
+def _add_stale_headers(response):
+    age = getattr(g, "_stale_age", 0.0)
+    if age:
+        response.headers["Warning"] = '110 - "Response is Stale"'
+        response.headers["X-Data-Age"] = str(int(age))
+    return response
+
+
+def init_resilience(app):
+    app.after_request(_add_stale_headers)
@@ -0,0 +1,165 @@
+"""
+Yanıt kodlaması: içerik pazarlığı (JSON / msgpack), sıkıştırma ve koşullu GET.
+
+- `Accept: application/msgpack` gönderen istemciler msgpack alır; endpoint kompakt
+  (sayısal, sütunlu) bir şema verdiyse o kullanılır.
+- COMPRESS_MIN_BYTES üzerindeki yanıtlar br (brotli kuruluysa) ya da gzip ile sıkıştırılır.
+- Yanıt önbellekteki verilerden üretildiyse (bkz. note_version) güçlü bir ETag taşır;
+  If-None-Match eşleşirse gövde hiç serileştirilmeden 304 döner.
+"""
+import gzip
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from typing import Any, Callable, Optional
+
+import msgpack
+from cachetools import LRUCache
+from flask import Response, g, has_request_context, jsonify, request
+
+try:
+    import brotli  # İsteğe bağlı: pip install brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack")
+COMPRESSIBLE_MIMETYPES = ("application/json", "application/msgpack", "text/plain", "text/html")
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ENCODED_BODY_CACHE = 512      # ETag'li yanıtların sıkıştırılmış gövdeleri yeniden sıkıştırılmaz
+ENCODING_SUFFIX = {"br": "-br", "gzip": "-gz"}
+
+_encoded_bodies = LRUCache(maxsize=ENCODED_BODY_CACHE)
+_encoded_lock = threading.Lock()
+_UNVERSIONED = object()
+
+
+def stamp_version(payload: dict) -> dict:
+    """Önbelleğe yazılmadan önce çekilen veriye sürüm kimliği ekler (ETag'lerin kaynağı)."""
+    payload["_version"] = uuid.uuid4().hex[:16]
+    return payload
+
+
+def note_cached(namespace: str, key: str, payload: dict):
+    version = payload.get("_version") if isinstance(payload, dict) else None
+    note_version(f"{namespace}:{key}:{version}" if version else None)
+
+
+def note_version(token: Optional[str]):
+    """
+    Yanıtın dayandığı önbellek kaydının sürümünü kaydeder. Sürümü bilinmeyen bir
+    kaynak (None) kullanıldıysa yanıta ETag verilmez. İstek dışında etkisizdir.
+    """
+    if not has_request_context():
+        return
+    versions = getattr(g, "_payload_versions", None)
+    if versions is None:
+        versions = g._payload_versions = set()
+    versions.add(_UNVERSIONED if token is None else token)
+
+
+def wants_msgpack() -> bool:
+    accept = request.accept_mimetypes
+    msgpack_quality = max(accept[mimetype] for mimetype in MSGPACK_MIMETYPES)
+    return msgpack_quality > 0 and msgpack_quality >= accept["application/json"]
+
+
+def _etag(representation: str) -> Optional[str]:
+    versions = getattr(g, "_payload_versions", None)
+    if not versions or _UNVERSIONED in versions:
+        return None
+    args = "&".join(f"{key}={value}" for key, value in sorted(request.args.items(multi=True)))
+    source = f"{request.path}?{args}|{representation}|{'|'.join(sorted(versions))}"
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()[:32]
+
+
+def _matching_tag(etag: str) -> Optional[str]:
+    """İstemcinin elindeki sürüm (düz ya da sıkıştırılmış gövdenin ETag'i) eşleşiyorsa onu döner."""
+    candidates = request.if_none_match
+    for suffix in ("", *ENCODING_SUFFIX.values()):
+        if candidates.contains(etag + suffix):
+            return etag + suffix
+    return None
+
+
+def respond(payload: Any, status: int = 200, compact: Callable[[], Any] = None) -> Response:
+    """
+    jsonify yerine: istemcinin istediği biçimde serileştirir. `compact` yalnızca
+    msgpack istendiğinde çağrılır ve sayısal/sütunlu alternatif şemayı döner.
+    """
+    use_msgpack = wants_msgpack()
+    representation = ("msgpack-compact" if compact else "msgpack") if use_msgpack else "json"
+    etag = _etag(representation) if status == 200 else None
+
+    matched = _matching_tag(etag) if etag else None
+    if matched:
+        response = Response(status=304)
+        response.set_etag(matched)
+        response.vary.update(("Accept", "Accept-Encoding"))
+        return response
+
+    if use_msgpack:
+        body = msgpack.packb(compact() if compact else payload, use_bin_type=True)
+        response = Response(body, status=status, mimetype=MSGPACK_MIMETYPES[0])
+    else:
+        response = jsonify(payload)
+        response.status_code = status
+
+    if etag:
+        response.set_etag(etag)
+    response.vary.add("Accept")
+    return response
+
+
+def _choose_encoding() -> Optional[str]:
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def _encode(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def _compress(response: Response) -> Response:
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add("Accept-Encoding")
+    if response.content_length is not None and response.content_length < COMPRESS_MIN_BYTES:
+        return response
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    etag, _ = response.get_etag()
+    key = (etag, encoding) if etag else None
+    with _encoded_lock:
+        body = _encoded_bodies.get(key) if key else None
+    if body is None:
+        body = _encode(response.get_data(), encoding)
+        if key:
+            with _encoded_lock:
+                _encoded_bodies[key] = body
+
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    if etag:
+        # Farklı kodlanmış gövdeler farklı güçlü ETag taşımalı
+        response.set_etag(etag + ENCODING_SUFFIX[encoding])
+    return response
+
+
+def init_response_encoding(app):
+    app.after_request(_compress)
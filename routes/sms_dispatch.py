@@ -0,0 +1,159 @@
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+import requests
+from dotenv import load_dotenv
+from twilio.base.exceptions import TwilioRestException
+from twilio.http.http_client import TwilioHttpClient
+from twilio.rest import Client
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+from routes.metrics import track_upstream
+from routes.tracing import submit
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COUNTRY_CODE = "90"   # Ülke kodu olmayan numaralar Türkiye kabul edilir
+SMS_MAX_WORKERS = 8
+SMS_RETRIES = 2
+SMS_RETRY_BACKOFF = 0.5       # saniye, her denemede iki katına çıkar
+TWILIO_TIMEOUT = 10
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_twilio_client():
+    """Süreç boyunca tek bir Twilio client'ı (bağlantı havuzu ile) kullanılır."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = Client(
+                    os.getenv("TWILIO_ACCOUNT_SID"),
+                    os.getenv("TWILIO_AUTH_TOKEN"),
+                    http_client=TwilioHttpClient(pool_connections=True, timeout=TWILIO_TIMEOUT)
+                )
+    return _client
+
+
+def set_twilio_client(client):
+    """Test ve benchmark'larda gerçek client yerine yerel bir taklit kullanmak için."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+def normalize_phone(phone: str, default_country: str = DEFAULT_COUNTRY_CODE) -> Optional[str]:
+    """
+    Telefon numarasını E.164 formatına çevirir (ör. "0532 123 45 67" -> "+905321234567").
+    Geçersiz numaralar için None döner.
+    """
+    if not phone:
+        return None
+    phone = str(phone).strip()
+    has_plus = phone.startswith("+")
+    digits = re.sub(r"\D", "", phone)
+
+    if has_plus:
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    elif digits.startswith("0"):
+        digits = default_country + digits[1:]
+    elif len(digits) == 10:
+        digits = default_country + digits
+
+    if not 8 <= len(digits) <= 15:
+        return None
+    return f"+{digits}"
+
+
+def unique_recipients(contacts: Dict) -> List[str]:
+    """Acil durum kişilerinden normalize edilmiş, tekrarsız numara listesi çıkarır."""
+    recipients = []
+    seen = set()
+    for contact in (contacts or {}).values():
+        phone = normalize_phone((contact or {}).get("phone"))
+        if phone is None:
+            logger.warning(f"Geçersiz telefon numarası atlandı: {contact}")
+            continue
+        if phone not in seen:
+            seen.add(phone)
+            recipients.append(phone)
+    return recipients
+
+
+def _is_retryable(error: Exception) -> bool:
+    """
+    messages.create idempotent değildir: istek Twilio'ya ulaştıktan sonraki hatalar
+    (okuma zaman aşımı, yanıt okunurken kopan bağlantı) tekrar denenirse aynı SMS
+    iki kez gider. Yalnızca Twilio'nun 429 / 5xx yanıtları ve bağlantı kurulamadan
+    oluşan hatalar tekrar denenir.
+    """
+    if isinstance(error, TwilioRestException):
+        return error.status == 429 or error.status >= 500
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        reason = getattr(error.args[0], "reason", error.args[0])
+        return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+    return False
+
+
+class SmsDispatcher:
+    """Sınırlı bir thread havuzu üzerinden eşzamanlı, tekrar denemeli SMS gönderimi."""
+
+    def __init__(self, max_workers: int = SMS_MAX_WORKERS, retries: int = SMS_RETRIES,
+                 backoff: float = SMS_RETRY_BACKOFF, from_number: Optional[str] = None):
+        self.retries = retries
+        self.backoff = backoff
+        self.from_number = from_number
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sms")
+
+    def _send_one(self, to: str, body: str) -> Dict:
+        result = {"to": to, "status": "failed", "sid": None, "attempts": 0, "error": None}
+        delay = self.backoff
+        for attempt in range(1, self.retries + 2):
+            result["attempts"] = attempt
+            try:
+                with track_upstream("twilio", "messages.create"):
+                    message = get_twilio_client().messages.create(
+                        body=body,
+                        from_=self.from_number or os.getenv("TWILIO_PHONE_NUMBER"),
+                        to=to
+                    )
+                result.update(status="sent", sid=getattr(message, "sid", None), error=None)
+                return result
+            except Exception as e:
+                result["error"] = str(e)
+                if attempt > self.retries or not _is_retryable(e):
+                    break
+                time.sleep(delay)
+                delay *= 2
+        logger.error(f"SMS gönderilemedi ({to}): {result['error']}")
+        return result
+
+    def send_bulk(self, recipients: Iterable[str], body: str) -> List[Dict]:
+        """Tüm alıcılara paralel gönderir, alıcı bazında sonuç listesi döner."""
+        futures = [submit(self._executor, self._send_one, to, body) for to in recipients]
+        return [future.result() for future in futures]
+
+
+_dispatcher = None
+
+
+def get_sms_dispatcher() -> SmsDispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        with _client_lock:
+            if _dispatcher is None:
+                _dispatcher = SmsDispatcher()
+    return _dispatcher
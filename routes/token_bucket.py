@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Tuple
+
+from routes.cache_backend import get_cache
+
+
+class TokenBucket:
+    """Thread-safe token bucket. `rate` saniye başına eklenen token sayısıdır."""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def try_acquire(self, tokens: float = 1, reserve: float = 0) -> Tuple[bool, float]:
+        """
+        Token almayı dener. `reserve` kadar token başkaları için ayrılmış kabul edilir.
+        (başarılı_mı, tekrar_deneme_süresi_sn) döner.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self.tokens - tokens >= reserve:
+                self.tokens -= tokens
+                return True, 0.0
+            if self.rate <= 0:
+                return False, float("inf")
+            return False, (tokens + reserve - self.tokens) / self.rate
+
+    def drain(self):
+        """Kalan tüm token'ları harcar (ör. karşı taraf 429 döndüğünde)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = 0.0
+
+    def refund(self, tokens: float = 1):
+        """Alınıp kullanılmayan token'ları geri koyar."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + tokens)
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+
+class SharedTokenBucket:
+    """
+    Makinedeki tüm worker'ların paylaştığı hız sınırı (TokenBucket ile aynı arayüz).
+
+    Paylaşımlı önbellek sayacında sabit pencere ile yaklaşık token bucket: pencere
+    kovanın dolma süresidir (capacity / rate) ve pencere başına en fazla `capacity`
+    token verilir. Ortalama hız `rate`'i aşmaz; pencere sınırında kısa süreli
+    iki kova dolusu patlama olabilir.
+    """
+
+    def __init__(self, name: str, capacity: float, rate: float):
+        self.name = name
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.window = self.capacity / self.rate if self.rate > 0 else float("inf")
+
+    def _key(self, now: float) -> str:
+        window = int(now // self.window) if self.rate > 0 else 0
+        return f"rate:{self.name}:{window}"
+
+    def _retry_after(self, now: float) -> float:
+        return self.window - now % self.window if self.rate > 0 else float("inf")
+
+    def try_acquire(self, tokens: float = 1, reserve: float = 0) -> Tuple[bool, float]:
+        now = time.time()
+        limit = int(self.capacity - reserve)
+        if get_cache().backend.incr(self._key(now), int(tokens), limit, self.window * 2) is not None:
+            return True, 0.0
+        return False, self._retry_after(now)
+
+    def drain(self):
+        now = time.time()
+        backend = get_cache().backend
+        key = self._key(now)
+        backend.incr(key, max(0, int(self.capacity) - backend.counter(key)), None, self.window * 2)
+
+    def refund(self, tokens: float = 1):
+        now = time.time()
+        backend = get_cache().backend
+        key = self._key(now)
+        # Pencere değiştiyse geri verilecek bir şey kalmamıştır
+        if backend.counter(key) >= tokens:
+            backend.incr(key, -int(tokens), None, self.window * 2)
+
+    def available(self) -> float:
+        return max(0.0, self.capacity - get_cache().backend.counter(self._key(time.time())))
+
+
+class KeyedTokenBuckets:
+    """Anahtar (ör. kullanıcı) başına token bucket; en eski anahtarlar sınırda atılır."""
+
+    def __init__(self, factory: Callable[[], TokenBucket], max_keys: int = 100_000):
+        self.factory = factory
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = self.factory()
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket
+
+    def try_acquire(self, key: Hashable, tokens: float = 1, reserve: float = 0) -> Tuple[bool, float]:
+        return self.get(key).try_acquire(tokens, reserve)
+
+    def __len__(self):
+        return len(self._buckets)
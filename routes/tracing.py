@@ -0,0 +1,140 @@
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from flask import g, request
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+MAX_SPANS_PER_TRACE = 500    # Döngü içinde çok sayıda çağrı yapan isteklerde log şişmesin
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    def __init__(self, name: str, trace: "Trace", attrs: dict = None):
+        self.name = name
+        self.trace = trace
+        self.attrs = attrs or {}
+        self.started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+        self.children: List["Span"] = []
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+
+    def to_dict(self, origin: float) -> dict:
+        data = {
+            "name": self.name,
+            "start_ms": round((self.started - origin) * 1000, 2),
+            "duration_ms": round((self.duration or 0) * 1000, 2),
+        }
+        if self.attrs:
+            data["attrs"] = self.attrs
+        if self.error:
+            data["error"] = self.error
+        if self.children:
+            data["children"] = [child.to_dict(origin) for child in self.children]
+        return data
+
+
+class Trace:
+    """Bir isteğin span ağacı. Kök span isteğin kendisidir."""
+
+    def __init__(self, name: str, trace_id: str = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.span_count = 0
+        self.dropped = 0
+        self.root = Span(name, self)
+
+    def to_dict(self) -> dict:
+        data = {"trace_id": self.trace_id, **self.root.to_dict(self.root.started)}
+        if self.dropped:
+            data["dropped_spans"] = self.dropped
+        return data
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Aktif isteğin span ağacına bir alt span ekler. İzlenen bir istek yoksa
+    (arka plan işleri, scriptler) hiçbir şey kaydetmez.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    trace = parent.trace
+    if trace.span_count >= MAX_SPANS_PER_TRACE:
+        trace.dropped += 1
+        yield None
+        return
+    trace.span_count += 1
+    child = Span(name, trace, attrs)
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.error = type(e).__name__
+        raise
+    finally:
+        child.finish()
+        _current_span.reset(token)
+
+
+def submit(executor, fn, *args, **kwargs):
+    """
+    ThreadPoolExecutor'a iş gönderirken aktif span'i de taşır; böylece havuz
+    thread'lerinde yapılan çağrılar isteğin ağacında görünür.
+    """
+    return executor.submit(copy_context().run, fn, *args, **kwargs)
+
+
+def current_trace() -> Optional[Trace]:
+    current = _current_span.get()
+    return current.trace if current else None
+
+
+def _before_request():
+    endpoint = request.url_rule.rule if request.url_rule else request.path
+    trace = Trace(f"{request.method} {endpoint}", request.headers.get("X-Trace-Id"))
+    g._trace = trace
+    g._trace_token = _current_span.set(trace.root)
+
+
+def _after_request(response):
+    trace = getattr(g, "_trace", None)
+    if trace is not None:
+        response.headers["X-Trace-Id"] = trace.trace_id
+        trace.root.attrs["status"] = response.status_code
+    return response
+
+
+def _teardown_request(error=None):
+    trace = getattr(g, "_trace", None)
+    if trace is None:
+        return
+    trace.root.finish()
+    if error is not None:
+        trace.root.error = type(error).__name__
+    _current_span.reset(g._trace_token)
+
+    if trace.root.duration >= SLOW_REQUEST_SECONDS:
+        logger.warning(json.dumps({"event": "slow_request", **trace.to_dict()}, ensure_ascii=False, default=str))
+
+
+def init_tracing(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
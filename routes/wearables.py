@@ -0,0 +1,307 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+import requests
+from cachetools import LRUCache, TTLCache
+from dotenv import load_dotenv
+from firebase_admin import db
+
+from routes.cache_backend import get_cache
+from routes.metrics import record_cache, track_upstream
+from routes.token_bucket import KeyedTokenBuckets, TokenBucket
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TOKEN_REFRESH_MARGIN = 300   # saniye; token süresi dolmadan bu kadar önce yenilenir
+REQUEST_TIMEOUT = 10
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 3600       # Bağlantısı kaldırılan / yeniden bağlanan cihaz en geç bu sürede görülür
+MISSING_TOKEN_TTL = 60       # Token'ı olmayan kullanıcı kısa süre sonra tekrar okunur (yeni bağlanmış olabilir)
+REFRESH_WAIT_SECONDS = 5     # Başka worker yenilerken yeni token'ın kaydedilmesi bu kadar beklenir
+REFRESH_POLL_INTERVAL = 0.2
+KEY_LOCK_STRIPES = 64
+DATA_CACHE_SIZE = 10000      # İstemci başına önbellekteki kullanıcı yanıtı
+
+
+class WearableProvider:
+    """
+    Giyilebilir cihaz sağlayıcıları için temel adaptör.
+    Alt sınıflar URL, kota ve token yenileme detaylarını tanımlar.
+    """
+    name = "base"
+    granularity_seconds = 60     # Sağlayıcının veriyi güncelleme aralığı (önbellek süresi)
+    hourly_quota = 150           # Kullanıcı başına saatlik istek kotası
+
+    def data_url(self, user_id: str) -> str:
+        raise NotImplementedError
+
+    def refresh_token(self, refresh_token: str) -> Optional[dict]:
+        """Yeni {access_token, refresh_token, expires_at} döner."""
+        raise NotImplementedError
+
+
+class FitbitProvider(WearableProvider):
+    name = "fitbit"
+    granularity_seconds = 60
+    hourly_quota = 150           # Fitbit: kullanıcı başına saatte 150 istek
+    token_url = "https://api.fitbit.com/oauth2/token"
+
+    def data_url(self, user_id: str) -> str:
+        # "-" token sahibidir; token her zaman kullanıcının kendisine aittir (bkz. TokenStore)
+        return "https://api.fitbit.com/1/user/-/activities/heart/date/today/1d.json"
+
+    def refresh_token(self, refresh_token: str) -> Optional[dict]:
+        with track_upstream(self.name, "refresh_token"):
+            response = requests.post(
+                self.token_url,
+                data={"grant_type": "refresh_token", "refresh_token": refresh_token},
+                auth=(os.getenv("FITBIT_CLIENT_ID", ""), os.getenv("FITBIT_CLIENT_SECRET", "")),
+                timeout=REQUEST_TIMEOUT
+            )
+        if response.status_code != 200:
+            logger.error(f"Fitbit token yenileme hatası: {response.status_code} {response.text}")
+            return None
+        payload = response.json()
+        return {
+            "access_token": payload["access_token"],
+            "refresh_token": payload.get("refresh_token", refresh_token),
+            "expires_at": time.time() + payload.get("expires_in", 28800)
+        }
+
+
+class TokenStore:
+    """
+    Kullanıcı başına OAuth token'ları; süresi dolmadan önce yeniler.
+
+    Sağlayıcıların refresh_token'ı tek kullanımlıktır: aynı kullanıcı için yenileme
+    süreç içinde kilitle, worker'lar arasında paylaşımlı önbellek lease'i ile tek
+    bir çağrıya indirilir; diğerleri kaydedilen yeni token'ı okur.
+    """
+
+    def __init__(self, cache_size: int = TOKEN_CACHE_SIZE):
+        self._tokens = TTLCache(maxsize=cache_size, ttl=TOKEN_CACHE_TTL)
+        self._missing = TTLCache(maxsize=cache_size, ttl=MISSING_TOKEN_TTL)
+        self._lock = threading.Lock()
+        # Anahtar başına kilit yerine sabit sayıda kilit: bellek büyümez
+        self._refresh_locks = [threading.Lock() for _ in range(KEY_LOCK_STRIPES)]
+        self._owner = uuid.uuid4().hex
+
+    def _load(self, provider: WearableProvider, user_id: str) -> Optional[dict]:
+        try:
+            return db.reference(f'/users/{user_id}/wearables/{provider.name}').get()
+        except Exception as e:
+            logger.error(f"Token okunamadı: {str(e)}")
+            return None
+
+    def _save(self, provider: WearableProvider, user_id: str, token: dict):
+        try:
+            db.reference(f'/users/{user_id}/wearables/{provider.name}').update(token)
+        except Exception as e:
+            logger.error(f"Token kaydedilemedi: {str(e)}")
+
+    @staticmethod
+    def _expiring(token: dict) -> bool:
+        expires_at = token.get("expires_at")
+        return bool(expires_at and expires_at - time.time() < TOKEN_REFRESH_MARGIN)
+
+    def _cached(self, key: tuple) -> Optional[dict]:
+        """Önbellekteki token; token'ı olmadığı yakın zamanda görülen kullanıcı için {}."""
+        with self._lock:
+            token = self._tokens.get(key)
+            if token is None and key in self._missing:
+                return {}
+            return token
+
+    def _remember(self, key: tuple, token: dict):
+        with self._lock:
+            if token.get("access_token"):
+                self._tokens[key] = token
+                self._missing.pop(key, None)
+            else:
+                self._tokens.pop(key, None)
+                self._missing[key] = True
+
+    def get_access_token(self, provider: WearableProvider, user_id: str) -> Optional[str]:
+        key = (provider.name, user_id)
+        token = self._cached(key)
+        if token is None:
+            token = self._load(provider, user_id) or {}
+            self._remember(key, token)
+
+        if not token.get("access_token"):
+            # Cihaz bağlamamış kullanıcı: veri yok (başka bir hesabın token'ı kullanılmaz)
+            return None
+
+        if self._expiring(token) and token.get("refresh_token"):
+            token = self._refresh(provider, user_id)
+        if not token.get("access_token") or (token.get("expires_at") or float("inf")) <= time.time():
+            return None
+        return token["access_token"]
+
+    def _refresh(self, provider: WearableProvider, user_id: str) -> dict:
+        key = (provider.name, user_id)
+        with self._refresh_locks[hash(key) % KEY_LOCK_STRIPES]:
+            # Kilidi beklerken başka bir thread yenilemiş olabilir
+            token = self._cached(key) or {}
+            if token.get("access_token") and not self._expiring(token):
+                return token
+
+            backend = get_cache().backend
+            lease_key = f"wearable_refresh:{provider.name}:{user_id}"
+            owner = f"{self._owner}:{os.getpid()}"
+            leased = backend.acquire_lease(lease_key, owner)
+            try:
+                if not leased:
+                    return self._wait_for_refresh(provider, user_id, token)
+                # Başka bir worker yenilemiş olabilir: kullanılmış refresh_token ile istek atılmaz
+                token = self._load(provider, user_id) or {}
+                if not self._expiring(token) or not token.get("refresh_token"):
+                    self._remember(key, token)
+                    return token
+                try:
+                    refreshed = provider.refresh_token(token["refresh_token"])
+                except requests.exceptions.RequestException as e:
+                    logger.error(f"{provider.name} token yenileme hatası: {str(e)}")
+                    refreshed = None
+                if refreshed:
+                    token = {**token, **refreshed}
+                    self._save(provider, user_id, refreshed)
+                    self._remember(key, token)
+                return token
+            finally:
+                if leased:
+                    backend.release_lease(lease_key, owner)
+
+    def _wait_for_refresh(self, provider: WearableProvider, user_id: str, token: dict) -> dict:
+        """Yenilemeyi başka worker yapıyor: kaydedilen yeni token beklenir, gelmezse eldeki döner."""
+        deadline = time.monotonic() + REFRESH_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(REFRESH_POLL_INTERVAL)
+            stored = self._load(provider, user_id) or {}
+            if stored.get("access_token") and not self._expiring(stored):
+                self._remember((provider.name, user_id), stored)
+                return stored
+        return token
+
+    def invalidate(self, provider: WearableProvider, user_id: str):
+        with self._lock:
+            self._tokens.pop((provider.name, user_id), None)
+            self._missing.pop((provider.name, user_id), None)
+
+
+class WearableClient:
+    """
+    Sağlayıcıdan veri çeker: granülerlik süresince önbellekten döner,
+    sonrasında ETag / If-Modified-Since ile koşullu istek atar ve
+    kullanıcı başına saatlik kotayı token bucket ile uygular.
+    """
+
+    def __init__(self, provider: WearableProvider, tokens: TokenStore = None):
+        self.provider = provider
+        self.tokens = tokens or TokenStore()
+        self.session = requests.Session()
+        self.quota = KeyedTokenBuckets(
+            lambda: TokenBucket(provider.hourly_quota, provider.hourly_quota / 3600.0)
+        )
+        self._cache: Dict[str, dict] = LRUCache(maxsize=DATA_CACHE_SIZE)
+        self._lock = threading.Lock()
+        self.stats = {"cache_hits": 0, "not_modified": 0, "fetches": 0, "throttled": 0, "errors": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def get_data(self, user_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._cache.get(user_id)
+        now = time.time()
+
+        if entry and now - entry["fetched_at"] < self.provider.granularity_seconds:
+            self._count("cache_hits")
+            record_cache(f"wearable_{self.provider.name}", True)
+            return entry["body"]
+        record_cache(f"wearable_{self.provider.name}", False)
+
+        # Token'ı olmayan kullanıcı için kota kovası da açılmaz
+        access_token = self.tokens.get_access_token(self.provider, user_id)
+        if not access_token:
+            return entry["body"] if entry else None
+
+        allowed, _ = self.quota.try_acquire(user_id)
+        if not allowed:
+            self._count("throttled")
+            logger.warning(f"{self.provider.name} kotası doldu: {user_id}")
+            return entry["body"] if entry else None
+
+        headers = {"Authorization": f"Bearer {access_token}"}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            with track_upstream(self.provider.name, "data"):
+                response = self.session.get(self.provider.data_url(user_id), headers=headers,
+                                            timeout=REQUEST_TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            self._count("errors")
+            logger.error(f"{self.provider.name} API hatası: {str(e)}")
+            return entry["body"] if entry else None
+
+        if response.status_code == 304 and entry:
+            self._count("not_modified")
+            with self._lock:
+                entry["fetched_at"] = now
+            return entry["body"]
+
+        if response.status_code == 200:
+            self._count("fetches")
+            body = response.json()
+            with self._lock:
+                self._cache[user_id] = {
+                    "body": body,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "fetched_at": now
+                }
+            return body
+
+        self._count("errors")
+        if response.status_code == 401:
+            # Token iptal edilmiş olabilir, bir sonraki istekte yeniden okunur
+            self.tokens.invalidate(self.provider, user_id)
+        elif response.status_code == 429:
+            # Sağlayıcı kotası doldu: bucket'ı boşalt, sıfırlanana kadar önbellek kullanılır
+            self.quota.get(user_id).drain()
+        logger.error(f"{self.provider.name} API yanıtı: {response.status_code} {response.text[:200]}")
+        return entry["body"] if entry else None
+
+
+_token_store = TokenStore()
+_clients: Dict[str, WearableClient] = {}
+
+
+def register_provider(provider: WearableProvider):
+    """Yeni bir sağlayıcı adaptörü ekler (ör. Garmin, Apple Health)."""
+    _clients[provider.name] = WearableClient(provider, _token_store)
+
+
+def get_wearable_client(name: str) -> Optional[WearableClient]:
+    return _clients.get(name)
+
+
+def get_wearable_data(user_id: str, provider: str = "fitbit") -> Optional[dict]:
+    client = _clients.get(provider)
+    if client is None:
+        logger.error(f"Bilinmeyen giyilebilir cihaz sağlayıcısı: {provider}")
+        return None
+    return client.get_data(user_id)
+
+
+register_provider(FitbitProvider())
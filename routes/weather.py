@@ -1,39 +1,156 @@
+import asyncio
 import requests
 from flask import jsonify, request
 import os
 import logging
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
-from functools import lru_cache
-from firebase_admin import db
-from typing import Dict, Optional
+from typing import Dict, Iterable, List, Optional
 from models.notification import send_weather_alert
 from models.notification import Notification
+from models.repository import UserRepository
+from routes.async_http import get_async_http
+from routes.cache_backend import get_cache
+from routes.geocoder import DISTRICT_MATCH_KM, get_geocoder
+from routes.http_session import get_session
+from routes.metrics import track_upstream
+from routes.quota_scheduler import current_priority
+from routes.resilience import call_upstream, call_upstream_async, mark_stale
+from routes.response_encoding import note_cached, stamp_version
+from routes.weather_history import history
 
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-TEMP_DROP_THRESHOLD = 5  # °C cinsinden sıcaklık düşüşü eşiği
+FORECAST_TTL = 600        # Visual Crossing verisi 10 dk boyunca tüm worker'lar arasında paylaşılır
+FORECAST_STALE_TTL = 1800         # Sonraki 30 dk eski veri hemen döner, arka planda yenilenir
+FORECAST_ERROR_TTL = 6 * 3600     # Servis çökerse 6 saate kadar eski veri gösterilir
+NOTIFICATION_TIME_TTL = 300
+BATCH_CONCURRENCY = int(os.getenv("WEATHER_BATCH_CONCURRENCY", "16"))  # Toplu istekte eşzamanlı upstream çağrısı
+BATCH_DEADLINE_SLACK = 5        # Toplu istek süre sınırına eklenen pay (kota beklemesi, loop gecikmesi)
+TIMELINE_URL = "https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/"
+
+def fetch_timeline(location: str, period: str, include: str, operation: str, timeout: int = 15) -> dict:
+    """
+    Visual Crossing timeline yanıtını döner. Aynı konum/dönem için makine
+    başına tek istek yapılır. Servis yavaş ya da erişilemezken son iyi veri
+    döner (yanıt bayat olarak işaretlenir); hiç veri yoksa requests istisnası fırlatılır.
+    """
+    def attempt():
+        with track_upstream("visual_crossing", operation):
+            response = get_session().get(
+                f"{TIMELINE_URL}{location}/{period}",
+                params={
+                    "unitGroup": "metric",
+                    "include": include,
+                    "key": os.getenv("VISUAL_CROSSING_API_KEY"),
+                    "contentType": "json"
+                },
+                timeout=timeout
+            )
+            response.raise_for_status()
+        return response.json()
+
+    def fetch():
+        data = stamp_version(call_upstream("visual_crossing", attempt))
+        # Yalnızca gerçek çekimler geçmişe eklenir; önbellek isabetleri tekrar yazmaz
+        history.record_async(location, data)
+        return data
+
+    key = f"{location}|{period}|{include}"
+    data, stale_age = get_cache().get_or_fetch_stale(
+        "forecast", key, FORECAST_TTL, FORECAST_STALE_TTL, FORECAST_ERROR_TTL, fetch
+    )
+    note_cached("forecast", key, data)
+    if stale_age:
+        mark_stale(stale_age)
+    return data
+
+def normalize_location(location) -> Optional[str]:
+    """
+    Tekilleştirme ve tahmin anahtarı: ilçe merkezine DISTRICT_MATCH_KM'den yakın koordinatlar
+    o ilçenin temsil noktasına çevrilir (bkz. routes/geocoder.py), diğerleri 4 ondalığa
+    (~11 m) yuvarlanır; şehir adları küçük harfe çevrilir.
+    """
+    if isinstance(location, (tuple, list)) and len(location) == 2:
+        location = f"{location[0]},{location[1]}"
+    if not isinstance(location, str) or not location.strip():
+        return None
+    parts = location.strip("() ").split(",")
+    if len(parts) == 2:
+        try:
+            lat, lon = float(parts[0]), float(parts[1])
+        except ValueError:
+            pass
+        else:
+            # Uzaktaki merkeze yapıştırmak tahmini başka bir yerin tahmini yapar (ör. Alanya -> Antalya)
+            place = get_geocoder().reverse(lat, lon, DISTRICT_MATCH_KM)
+            return place.forecast_location if place else f"{lat:.4f},{lon:.4f}"
+    return " ".join(location.split()).lower()
+
+async def _fetch_current_async(locations: List[str], lane: str, timeout: float) -> Dict[str, object]:
+    client = get_async_http()
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    params = {"unitGroup": "metric", "include": "current",
+              "key": os.getenv("VISUAL_CROSSING_API_KEY"), "contentType": "json"}
+
+    async def fetch(location):
+        async def attempt():
+            with track_upstream("visual_crossing", "batch_current"):
+                return await client.get_json(f"{TIMELINE_URL}{location}/today", params, timeout)
+
+        async with semaphore:
+            return await call_upstream_async("visual_crossing", attempt, lane)
+
+    outcomes = await asyncio.gather(*(fetch(location) for location in locations), return_exceptions=True)
+    return dict(zip(locations, outcomes))
+
+def fetch_current_many(locations: Iterable[str], timeout: float = 10) -> Dict[str, dict]:
+    """
+    Konum başına {"data", "stale_age"} ya da {"error"}. Taze önbellekteki konumlar için
+    istek atılmaz; kalanlar aiohttp ile en fazla BATCH_CONCURRENCY eşzamanlı çekilir,
+    böylece toplam süre konum sayısıyla değil en yavaş çekimle sınırlı kalır.
+    fetch_timeline(..., "today", "current") ile aynı önbellek anahtarlarını kullanır.
+    """
+    cache = get_cache()
+    results, last_good = {}, {}
+    for location in dict.fromkeys(locations):
+        cached = cache.peek_stale("forecast", f"{location}|today|current")
+        if cached and cached[1] == 0:
+            results[location] = {"data": cached[0], "stale_age": 0.0}
+        else:
+            last_good[location] = cached
+    if not last_good:
+        return results
+
+    # Her BATCH_CONCURRENCY'lik dalga en fazla `timeout` sürer
+    waves = -(-len(last_good) // BATCH_CONCURRENCY)
+    deadline = waves * timeout + BATCH_DEADLINE_SLACK
+    try:
+        fetched = get_async_http().run(_fetch_current_async(list(last_good), current_priority(), timeout),
+                                       deadline)
+    except requests.exceptions.Timeout as e:
+        fetched = dict.fromkeys(last_good, e)
+    for location, outcome in fetched.items():
+        if not isinstance(outcome, Exception):
+            stamp_version(outcome)
+            cache.store_fresh("forecast", f"{location}|today|current", outcome, FORECAST_TTL, FORECAST_ERROR_TTL)
+            history.record_async(location, outcome)
+            results[location] = {"data": outcome, "stale_age": 0.0}
+        elif last_good[location] and last_good[location][1] < FORECAST_ERROR_TTL:
+            logger.warning(f"{location} çekilemedi, önbellekteki veri kullanılıyor: {str(outcome)}")
+            results[location] = {"data": last_good[location][0], "stale_age": last_good[location][1]}
+        else:
+            results[location] = {"error": str(outcome)}
+    return results
 
 def get_weather(city: str) -> dict:
     """Visual Crossing API ile hava durumu ve yağış bilgisini çeker."""
-    api_key = os.getenv("VISUAL_CROSSING_API_KEY")
-    base_url = "https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/"
-    
     try:
-        # API isteği (precip ve precipcover parametreleri eklendi)
-        response = requests.get(
-            f"{base_url}{city}/today"
-            f"?unitGroup=metric"
-            f"&include=hours%2Ccurrent%2Cprecip%2Cprecipcover"
-            f"&key={api_key}"
-            f"&contentType=json",
-            timeout=10
-        )
-        response.raise_for_status()
-        data = response.json()
+        # precip ve precipcover parametreleri eklendi
+        data = fetch_timeline(city, "today", "hours,current,precip,precipcover", "today", timeout=10)
         
         # Anlık verileri işle
         current = data.get('currentConditions', {})
@@ -69,27 +186,12 @@ def get_weather(city: str) -> dict:
         logger.error(f"Geçersiz veri yapısı: {str(e)}")
         return None
     
-@lru_cache(maxsize=100)  # Sık erişilen kullanıcı verilerini önbelleğe al
 def get_time(user_id: str) -> str:
-    """Firebase'den kullanıcının bildirim saatini çeker."""
+    """Firebase'den kullanıcının bildirim saatini çeker (worker'lar arası önbellekli)."""
     try:
-        return db.reference(f'/users/{user_id}/notification_time').get() or "08:00"
+        return get_cache().get_or_fetch(
+            "notification_time", user_id, NOTIFICATION_TIME_TTL,
+            lambda: UserRepository().get_notification_time(user_id) or "08:00"
+        )
     except Exception:
         return "08:00"
-    
-print(get_weather("Ankara"))
-print(get_time("user123"))
-
-def check_sudden_change(user_id: str, previous_data: Dict, current_data: Dict) -> Optional[Dict]:
-    alerts = []
-    
-    # Sıcaklık düşüş kontrolü
-    temp_diff = previous_data['current']['temp'] - current_data['current']['temp']
-    if temp_diff >= TEMP_DROP_THRESHOLD:
-        alert = {
-            "type": "temperature_drop",
-            "message": f"Sıcaklık son 1 saatte {temp_diff}°C düştü!",
-            "location": current_data['location']
-        }
-        alerts.append(alert)
-        send_weather_alert(user_id, alert)  # 🔔 Bildirim tetikleme
\ No newline at end of file
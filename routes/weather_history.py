@@ -0,0 +1,237 @@
+import base64
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import msgpack
+
+from models.repository import WeatherHistoryRepository
+from routes.tracing import submit
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+SLOT_SECONDS = 3600                # Saatlik kova
+SLOTS_PER_DAY = 86400 // SLOT_SECONDS
+CELL_PRECISION = 10                # 0.1° (~11 km) hücreler
+# Tamsayıya çevirme katsayıları: 0.1 °C, 0.01 mm, 0.1 km/s
+SCALES = {"temp": 10, "precip": 100, "wind": 10}
+FIELDS = tuple(SCALES)
+
+_append_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+class Sample(NamedTuple):
+    ts: int                        # Saat başı, UTC epoch
+    temp: Optional[float]
+    precip: Optional[float]
+    wind: Optional[float]
+
+
+def cell_id(location) -> str:
+    """
+    Konumu Firebase anahtarı olarak kullanılabilen bir hücre kimliğine çevirir.
+    (lat, lon) ve "lat,lon" 0.1°'lik ızgaraya yuvarlanır; şehir adları küçük harfe çevrilir.
+    """
+    if isinstance(location, str):
+        parts = location.strip("() ").split(",")
+        try:
+            location = tuple(float(part) for part in parts) if len(parts) == 2 else location
+        except ValueError:
+            pass
+    if isinstance(location, (tuple, list)) and len(location) == 2:
+        lat, lon = (int(round(float(value) * CELL_PRECISION)) for value in location)
+        return f"{lat}_{lon}"
+    return re.sub(r"[.$#\[\]/\s]+", "-", str(location).strip().lower()) or "unknown"
+
+
+def cell_location(cell: str) -> str:
+    """cell_id'nin tersi: hücrenin ızgara noktası ("lat,lon") ya da şehir adı (tahmin çekmek için)."""
+    match = re.fullmatch(r"(-?\d+)_(-?\d+)", cell)
+    if not match:
+        return cell
+    lat, lon = (int(value) / CELL_PRECISION for value in match.groups())
+    return f"{lat},{lon}"
+
+
+def _day_key(ts: int) -> str:
+    return time.strftime("%Y%m%d", time.gmtime(ts))
+
+
+# -- Kodlama ---------------------------------------------------------------
+#
+# Bir hücrenin bir günü tek bir msgpack kaydıdır:
+#   {"v": 1, "start": gün başı epoch, "step": 3600, "mask": dolu saatlerin bit maskesi,
+#    "temp": [...], "precip": [...], "wind": [...]}
+# Diziler yalnızca dolu saatleri içerir: ilk değer mutlak, sonrakiler bir önceki
+# dolu saate göre fark (delta). Eksik alanlar None olarak saklanır ve zinciri bozmaz.
+# RTDB ikili veri saklamadığı için kayıt base64 metin olarak yazılır.
+
+
+def _delta_encode(values: List[Optional[float]], scale: int) -> List[Optional[int]]:
+    encoded, previous = [], 0
+    for value in values:
+        if value is None:
+            encoded.append(None)
+            continue
+        scaled = int(round(value * scale))
+        encoded.append(scaled - previous)
+        previous = scaled
+    return encoded
+
+
+def _delta_decode(encoded: List[Optional[int]], scale: int) -> List[Optional[float]]:
+    values, current = [], 0
+    for delta in encoded:
+        if delta is None:
+            values.append(None)
+            continue
+        current += delta
+        values.append(current / scale)
+    return values
+
+
+def encode_day(day_start: int, slots: Dict[int, Sample]) -> str:
+    indexes = sorted(slots)
+    mask = 0
+    for index in indexes:
+        mask |= 1 << index
+    record = {"v": FORMAT_VERSION, "start": day_start, "step": SLOT_SECONDS, "mask": mask}
+    for field in FIELDS:
+        record[field] = _delta_encode([getattr(slots[index], field) for index in indexes], SCALES[field])
+    return base64.b64encode(msgpack.packb(record, use_bin_type=True)).decode("ascii")
+
+
+def decode_day(blob: Optional[str]) -> Dict[int, Sample]:
+    """Saat indeksi -> Sample. Bozuk ya da bilinmeyen sürümlü kayıtlar boş sayılır."""
+    if not blob:
+        return {}
+    try:
+        record = msgpack.unpackb(base64.b64decode(blob), raw=False)
+    except (ValueError, msgpack.exceptions.ExtraData, msgpack.exceptions.FormatError) as e:
+        logger.warning(f"Hava geçmişi kaydı çözülemedi: {str(e)}")
+        return {}
+    if record.get("v") != FORMAT_VERSION:
+        return {}
+    indexes = [index for index in range(SLOTS_PER_DAY) if record["mask"] >> index & 1]
+    columns = {field: _delta_decode(record.get(field, []), SCALES[field]) for field in FIELDS}
+    return {
+        index: Sample(record["start"] + index * record["step"],
+                      *(columns[field][position] for field in FIELDS))
+        for position, index in enumerate(indexes)
+    }
+
+
+# -- Timeline yanıtından örnek çıkarma ------------------------------------------
+
+
+def _sample_from(entry: dict, ts: int) -> Sample:
+    return Sample(ts // SLOT_SECONDS * SLOT_SECONDS, entry.get("temp"),
+                  entry.get("precip"), entry.get("windspeed"))
+
+
+def samples_from_timeline(data: dict, now: Optional[float] = None) -> List[Sample]:
+    """Anlık koşullar ve geçmiş saatler; henüz gelmemiş (tahmin) saatler geçmişe yazılmaz."""
+    now = int(now if now is not None else time.time())
+    samples = []
+    for day in data.get("days", []):
+        for hour in day.get("hours") or []:
+            epoch = hour.get("datetimeEpoch")
+            if epoch is not None and epoch <= now:
+                samples.append(_sample_from(hour, epoch))
+    current = data.get("currentConditions")
+    if current:
+        samples.append(_sample_from(current, current.get("datetimeEpoch") or now))
+    return samples
+
+
+# -- Okuma / yazma ---------------------------------------------------------
+
+
+class WeatherHistory:
+    """Konum hücresi başına, gün kovalarına bölünmüş sıkıştırılmış saatlik hava geçmişi."""
+
+    def __init__(self, repository: WeatherHistoryRepository = None):
+        self._repository = repository
+
+    @property
+    def repository(self) -> WeatherHistoryRepository:
+        return self._repository or WeatherHistoryRepository()
+
+    def append(self, location, samples: Iterable[Sample]) -> int:
+        """Örnekleri ilgili gün kovalarına birleştirir; aynı saatte yeni değer eskisinin yerine geçer."""
+        cell = cell_id(location)
+        by_day: Dict[int, Dict[int, Sample]] = {}
+        for sample in samples:
+            day_start = sample.ts // 86400 * 86400
+            by_day.setdefault(day_start, {})[(sample.ts - day_start) // SLOT_SECONDS] = sample
+
+        repository = self.repository
+        stored = repository.get_days(cell, [_day_key(day_start) for day_start in by_day])
+        written = 0
+        for day_start, new_slots in by_day.items():
+            day = _day_key(day_start)
+            slots = decode_day(stored.get(day))
+            if {**slots, **new_slots} == slots:
+                continue
+
+            def merge(blob, day_start=day_start, new_slots=new_slots):
+                # Diğer worker'ların ve izleyici sürecinin yazdığı saatler korunur
+                return encode_day(day_start, {**decode_day(blob), **new_slots})
+
+            repository.update_day(cell, day, merge)
+            written += 1
+        return written
+
+    def range(self, location, start: float, end: float) -> List[Sample]:
+        """[start, end] aralığındaki örnekler; yalnızca aralığa düşen gün kovaları okunur."""
+        start, end = int(start), int(end)
+        days = [_day_key(ts) for ts in range(start // 86400 * 86400, end + 1, 86400)]
+        stored = self.repository.get_days(cell_id(location), days)
+        samples = []
+        for day in days:
+            samples.extend(sample for _, sample in sorted(decode_day(stored.get(day)).items())
+                           if start <= sample.ts <= end)
+        return samples
+
+    def window(self, location, hours: int, now: Optional[float] = None) -> List[Sample]:
+        now = now if now is not None else time.time()
+        return self.range(location, now - hours * SLOT_SECONDS, now)
+
+    def record(self, location, data: dict) -> int:
+        return self.append(location, samples_from_timeline(data))
+
+    def record_async(self, location, data: dict):
+        """Tahmin çekicisi için: yazma isteğin yanıt süresine eklenmez."""
+        submit(_pool(), self._record_safely, location, data)
+
+    def _record_safely(self, location, data: dict):
+        try:
+            self.record(location, data)
+        except Exception as e:
+            logger.warning(f"Hava geçmişi yazılamadı ({location}): {str(e)}")
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _append_pool
+    with _pool_lock:
+        if _append_pool is None:
+            # Tek worker: yazmalar isteklerle yarışmaz (süreçler arası tutarlılık transaction ile)
+            _append_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="weather-history")
+        return _append_pool
+
+
+history = WeatherHistory()
+
+
+def previous_sample(location, hours: int = 1, now: Optional[float] = None) -> Optional[Sample]:
+    """En az `hours` saat önceki en yeni sıcaklık örneği (ani değişim karşılaştırması için)."""
+    now = now if now is not None else time.time()
+    cutoff = now - hours * SLOT_SECONDS
+    samples = [sample for sample in history.window(location, hours + 1, now)
+               if sample.temp is not None and sample.ts <= cutoff]
+    return samples[-1] if samples else None
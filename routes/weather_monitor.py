@@ -0,0 +1,255 @@
+"""
+Ani hava değişimi izleyicisi.
+
+Aboneli her konum hücresi `MONITOR_INTERVAL_MINUTES` dakikada bir yoklanır: anlık
+koşullar bir saat önceki geçmiş örneğiyle karşılaştırılır. Sıcaklık düşüşü, yağış
+başlangıcı ve rüzgar artışı tüm hücreler için tek seferde (NumPy) hesaplanır ve
+uyarı çıkan hücrenin abonelerine toplu bildirim gider. Maliyet kullanıcı sayısıyla
+değil hücre sayısıyla büyür.
+
+    python -m routes.weather_monitor run     # ayrı süreç olarak
+    WEATHER_MONITOR=1 (uygulama içinde)        # worker'lardan biri çalıştırır
+"""
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from apscheduler.schedulers.background import BackgroundScheduler
+from dotenv import load_dotenv
+
+from models.notification import send_bulk_push
+from models.repository import DigestIndexRepository, NotificationRepository, WeatherAlertRepository
+from routes.alert_explanations import explain_alert
+from routes.background_jobs import register_job
+from routes.cache_backend import get_cache
+from routes.quota_scheduler import PRIORITY_INTERACTIVE, priority
+from routes.tracing import submit
+from routes.weather import fetch_timeline
+from routes.weather_history import cell_location, previous_sample
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MONITOR_INTERVAL_MINUTES = int(os.getenv("MONITOR_INTERVAL_MINUTES", "15"))
+TEMP_DROP_THRESHOLD = 5.0   # °C, bir saatte
+PRECIP_DRY_MM = 0.1         # Bunun altı "yağış yok" sayılır
+PRECIP_ONSET_MM = 1.0       # Kuru saatten sonra bu kadar yağış "yağış başladı" sayılır
+WIND_SPIKE_DELTA = 20.0     # km/s, bir saatte artış
+WIND_SPIKE_MIN = 40.0       # km/s, artıştan sonra en az bu hız
+ALERT_TTL = 3 * 3600        # Uyarı bu süre boyunca /weather/alerts'te görünür
+FETCH_WORKERS = 8
+SEND_WORKERS = 8
+WRITE_CHUNK = 500
+
+# Uyarı sebepleri (bit maskesi)
+REASON_TEMP_DROP = 1
+REASON_PRECIP_ONSET = 2
+REASON_WIND_SPIKE = 4
+
+REASON_NAMES = {
+    REASON_TEMP_DROP: "temperature_drop",
+    REASON_PRECIP_ONSET: "precipitation_onset",
+    REASON_WIND_SPIKE: "wind_spike",
+}
+
+
+def detect(previous: np.ndarray, current: np.ndarray) -> np.ndarray:
+    """
+    previous / current: (hücre, 3) float dizileri - sütunlar sıcaklık, yağış, rüzgar;
+    eksik değerler NaN. Hücre başına sebep bit maskesi döner (NaN karşılaştırmaları yanlıştır).
+    """
+    temp_prev, precip_prev, wind_prev = previous.T
+    temp_now, precip_now, wind_now = current.T
+    with np.errstate(invalid="ignore"):
+        reasons = np.zeros(len(previous), dtype=np.uint8)
+        reasons |= np.where(temp_prev - temp_now >= TEMP_DROP_THRESHOLD, REASON_TEMP_DROP, 0).astype(np.uint8)
+        reasons |= np.where((precip_prev < PRECIP_DRY_MM) & (precip_now >= PRECIP_ONSET_MM),
+                            REASON_PRECIP_ONSET, 0).astype(np.uint8)
+        reasons |= np.where((wind_now - wind_prev >= WIND_SPIKE_DELTA) & (wind_now >= WIND_SPIKE_MIN),
+                            REASON_WIND_SPIKE, 0).astype(np.uint8)
+    return reasons
+
+
+def _message(reason: int, previous: np.ndarray, current: np.ndarray) -> str:
+    if reason == REASON_TEMP_DROP:
+        return f"Sıcaklık son 1 saatte {previous[0] - current[0]:.1f}°C düştü!"
+    if reason == REASON_PRECIP_ONSET:
+        return f"Yağış başladı: saatte {current[1]:.1f} mm"
+    return f"Rüzgar hızı son 1 saatte {previous[2]:.0f} km/s'den {current[2]:.0f} km/s'ye çıktı!"
+
+
+def _value(value) -> float:
+    return np.nan if value is None else float(value)
+
+
+class WeatherMonitor:
+    def __init__(self, interval_minutes: int = MONITOR_INTERVAL_MINUTES):
+        self.interval_minutes = interval_minutes
+        self._fetch_pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="monitor-fetch")
+        self._send_pool = ThreadPoolExecutor(max_workers=SEND_WORKERS, thread_name_prefix="monitor-send")
+        self._scheduler: Optional[BackgroundScheduler] = None
+
+    def _observe(self, cell: str) -> tuple:
+        """(bir saat önce, şimdi) -> [sıcaklık, yağış, rüzgar]"""
+        location = cell_location(cell)
+        # Uyarılar kullanıcıya dönük; arka plan şeridinde atlanmasın
+        with priority(PRIORITY_INTERACTIVE):
+            current = fetch_timeline(location, "today", "current", "monitor").get("currentConditions") or {}
+        sample = previous_sample(location)
+        previous = [np.nan] * 3 if sample is None else [_value(sample.temp), _value(sample.precip),
+                                                         _value(sample.wind)]
+        return previous, [_value(current.get("temp")), _value(current.get("precip")),
+                          _value(current.get("windspeed"))]
+
+    def _claim(self, alert_id: str) -> bool:
+        """Aynı uyarı (hücre, sebep, saat) makinede yalnızca bir kez gönderilir."""
+        return get_cache().backend.incr(f"weather_alert:{alert_id}", 1, 1, ALERT_TTL) is not None
+
+    def _fan_out(self, cell: str, alerts: List[dict]) -> dict:
+        subscribers = DigestIndexRepository().subscribers(cell)
+        uids = list(subscribers)
+        tokens = [token for value in subscribers.values() if isinstance(value, list) for token in value]
+        notifications = NotificationRepository()
+        result = {"users": len(uids), "success": 0, "failure": 0}
+        for alert in alerts:
+            record = {
+                "type": "weather_alert",
+                "message": alert["message"],
+                "timestamp": alert["detected_at"],
+                "read": False,
+                "metadata": alert
+            }
+            for start in range(0, len(uids), WRITE_CHUNK):
+                notifications.create_many(alert["alert_id"], {uid: record for uid in uids[start:start + WRITE_CHUNK]})
+            push = send_bulk_push(tokens, "⛈️ Hava Durumu Uyarısı", alert["explanation"] or alert["message"], {
+                "type": "weather_alert",
+                "notification_id": alert["alert_id"],
+                "deep_link": f"app://weather/alerts/{alert['alert_id']}"
+            })
+            result["success"] += push["success"]
+            result["failure"] += push["failure"]
+        return result
+
+    def poll(self) -> dict:
+        started = time.monotonic()
+        cells = DigestIndexRepository().cells()
+        futures = {cell: submit(self._fetch_pool, self._observe, cell) for cell in cells}
+        observed, previous, current = [], [], []
+        for cell, future in futures.items():
+            try:
+                before, now = future.result()
+            except Exception as e:
+                logger.warning(f"Hücre yoklanamadı ({cell}): {str(e)}")
+                continue
+            observed.append(cell)
+            previous.append(before)
+            current.append(now)
+        if not observed:
+            return {"cells": len(cells), "observed": 0, "alerts": 0}
+
+        previous = np.asarray(previous, dtype=np.float32)
+        current = np.asarray(current, dtype=np.float32)
+        reasons = detect(previous, current)
+
+        now = datetime.now()
+        hour = now.strftime("%Y%m%d%H")
+        new_alerts: Dict[str, List[dict]] = {}
+        for pos in np.flatnonzero(reasons):
+            cell = observed[pos]
+            for bit, name in REASON_NAMES.items():
+                if not reasons[pos] & bit:
+                    continue
+                alert_id = f"{cell}_{name}_{hour}"
+                if not self._claim(alert_id):
+                    continue
+                message = _message(bit, previous[pos], current[pos])
+                new_alerts.setdefault(cell, []).append({
+                    "alert_id": alert_id,
+                    "type": name,
+                    "message": message,
+                    # Açıklama önceden üretilmiş tablodan; toplu gönderimde Gemini çağrılmaz
+                    "explanation": explain_alert(message, now),
+                    "location": cell_location(cell),
+                    "detected_at": now.isoformat(),
+                    "expires_at": int(time.time() + ALERT_TTL),
+                })
+
+        if new_alerts:
+            self._store(new_alerts)
+        sent = [submit(self._send_pool, self._fan_out, cell, alerts) for cell, alerts in new_alerts.items()]
+        users = 0
+        for future in sent:
+            try:
+                users += future.result()["users"]
+            except Exception as e:
+                logger.error(f"Uyarı gönderim hatası: {str(e)}")
+
+        stats = {"cells": len(cells), "observed": len(observed),
+                 "alerts": sum(len(alerts) for alerts in new_alerts.values()), "notified_users": users,
+                 "seconds": round(time.monotonic() - started, 2)}
+        logger.info(f"Hava izleme turu: {stats}")
+        return stats
+
+    def _store(self, new_alerts: Dict[str, List[dict]]):
+        """Hücrelerin etkin uyarı listesini günceller; süresi dolanlar bu sırada silinir."""
+        repository = WeatherAlertRepository()
+        now = time.time()
+        existing = repository.get_many([f'/cell_alerts/{cell}' for cell in new_alerts])
+        merged = {}
+        for cell, alerts in new_alerts.items():
+            active = {alert_id: alert for alert_id, alert in (existing[f'/cell_alerts/{cell}'] or {}).items()
+                      if alert.get("expires_at", 0) > now}
+            active.update({alert["alert_id"]: alert for alert in alerts})
+            merged[cell] = active
+        repository.replace(merged)
+
+    def start(self):
+        self._scheduler = BackgroundScheduler()
+        self._scheduler.add_job(self.poll, "interval", minutes=self.interval_minutes,
+                                max_instances=1, coalesce=True, next_run_time=datetime.now())
+        self._scheduler.start()
+        logger.info(f"Hava izleyicisi başladı ({self.interval_minutes} dk aralıkla)")
+
+    def shutdown(self):
+        if self._scheduler:
+            self._scheduler.shutdown(wait=False)
+
+
+def active_alerts(cell: str) -> List[dict]:
+    """/weather/alerts için: hücrenin süresi dolmamış uyarıları, en yenisi önce."""
+    now = time.time()
+    alerts = [alert for alert in WeatherAlertRepository().for_cell(cell).values()
+              if alert.get("expires_at", 0) > now]
+    return sorted(alerts, key=lambda alert: alert["detected_at"], reverse=True)
+
+
+def init_weather_monitor(app):
+    """WEATHER_MONITOR=1 ise izleyiciyi arka plan işi olarak kaydeder (bkz. routes/background_jobs.py)."""
+    if os.getenv("WEATHER_MONITOR", "").lower() in ("1", "true", "yes"):
+        def start():
+            app.extensions["weather_monitor"] = monitor = WeatherMonitor()
+            monitor.start()
+        register_job("weather_monitor", start)
+
+
+if __name__ == "__main__":
+    from routes.bulk_import import init_firebase
+
+    parser = argparse.ArgumentParser(description="Ani hava değişimi izleyicisi")
+    parser.add_argument("command", choices=["run", "once"])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    init_firebase()
+    if args.command == "once":
+        WeatherMonitor().poll()
+    else:
+        WeatherMonitor().start()
+        while True:
+            time.sleep(3600)
@@ -0,0 +1,25 @@
+"""
+Birim testleri için ortak fixture'lar: bellek içi Firebase ve geçici paylaşımlı önbellek.
+"""
+import pytest
+from firebase_admin import db
+
+from benchmarks.fake_db import InMemoryDatabase
+from routes import cache_backend
+from routes.cache_backend import Cache, MemoryCache, SqliteCache, TieredCache
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """db.reference çağrıları bellek içi veritabanına gider."""
+    fake = InMemoryDatabase()
+    monkeypatch.setattr(db, "reference", fake.reference)
+    return fake
+
+
+@pytest.fixture
+def shared_cache(monkeypatch, tmp_path):
+    """Test başına boş bir TieredCache (sqlite dosyası geçici dizinde)."""
+    cache = Cache(TieredCache(MemoryCache(), SqliteCache(str(tmp_path / "cache.sqlite3"))))
+    monkeypatch.setattr(cache_backend, "_cache", cache)
+    return cache
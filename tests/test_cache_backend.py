@@ -0,0 +1,115 @@
+"""Önbellek: tek çekim (süreç içi ve lease ile worker'lar arası), stale-while-revalidate, stale-if-error."""
+import threading
+import time
+
+import pytest
+
+from routes.cache_backend import Cache, MemoryCache, SqliteCache, TieredCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return Cache(TieredCache(MemoryCache(), SqliteCache(str(tmp_path / "cache.sqlite3"))))
+
+
+def test_concurrent_misses_share_one_fetch(cache):
+    calls, release = [], threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return {"value": 1}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_fetch("ns", "k", 60, fetch)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(calls) == 1
+    assert results == [{"value": 1}] * 5
+
+
+def test_slow_key_does_not_block_other_keys(cache):
+    release = threading.Event()
+    slow = threading.Thread(target=cache.get_or_fetch, args=("ns", "slow", 60, lambda: release.wait(5) or 1))
+    slow.start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    assert cache.get_or_fetch("ns", "fast", 60, lambda: 2) == 2
+    assert time.monotonic() - started < 1
+    release.set()
+    slow.join(5)
+
+
+def test_errors_and_none_are_not_cached(cache):
+    def failing():
+        raise RuntimeError("upstream")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_fetch("ns", "k", 60, failing)
+    assert cache.get_or_fetch("ns", "k", 60, lambda: None) is None
+    assert cache.get_or_fetch("ns", "k", 60, lambda: 3) == 3
+
+
+def test_lease_makes_other_worker_wait_for_result(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    # İki Cache aynı sqlite dosyasını paylaşan iki worker gibidir
+    first = Cache(TieredCache(MemoryCache(), SqliteCache(path)))
+    second = Cache(TieredCache(MemoryCache(), SqliteCache(path)))
+    calls, release = [], threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return "value"
+
+    leader = threading.Thread(target=first.get_or_fetch, args=("ns", "k", 60, fetch))
+    leader.start()
+    time.sleep(0.1)
+    threading.Timer(0.2, release.set).start()
+    assert second.get_or_fetch("ns", "k", 60, fetch) == "value"
+    leader.join(5)
+    assert len(calls) == 1
+
+
+def test_stale_value_is_served_while_refreshing(cache):
+    cache.store_fresh("ns", "k", "old", fresh_ttl=60, error_ttl=3600)
+    cache.delete("ns", "k")              # Taze kopyanın süresi doldu
+    refreshed = threading.Event()
+
+    def fetch():
+        refreshed.set()
+        return "new"
+
+    value, age = cache.get_or_fetch_stale("ns", "k", fresh_ttl=60, stale_ttl=600, error_ttl=3600, fetch=fetch)
+    assert value == "old" and age >= 0
+    assert refreshed.wait(5)
+    for _ in range(50):
+        if cache.peek_stale("ns", "k") == ("new", 0.0):
+            break
+        time.sleep(0.02)
+    assert cache.peek_stale("ns", "k") == ("new", 0.0)
+
+
+def test_stale_if_error_serves_last_good_value(cache):
+    cache.store_fresh("ns", "k", "old", fresh_ttl=60, error_ttl=3600)
+    cache.delete("ns", "k")
+
+    def failing():
+        raise RuntimeError("upstream")
+
+    # stale_ttl=0: bayat değer arka plan yenilemesiyle değil, yalnızca hata durumunda verilir
+    value, age = cache.get_or_fetch_stale("ns", "k", fresh_ttl=0, stale_ttl=0, error_ttl=3600, fetch=failing)
+    assert value == "old" and age >= 0
+
+
+def test_missing_value_with_failing_fetch_raises(cache):
+    def failing():
+        raise RuntimeError("upstream")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_fetch_stale("ns", "k", fresh_ttl=60, stale_ttl=600, error_ttl=3600, fetch=failing)
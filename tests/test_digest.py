@@ -0,0 +1,77 @@
+"""Günlük özet: dakika / hücre kovalarına indeksleme ve hücre başına tek mesajla gönderim."""
+from datetime import datetime
+
+import pytest
+from firebase_admin import messaging
+
+from models.repository import DigestIndexRepository
+from routes.digest import DigestEngine, PreparedBucket, index_users, minute_key, render, slot_for
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("8:00", "0800"), ("08:05", "0805"), ("23:59:00", "2359"),
+    ("24:00", "0800"), ("sabah", "0800"), (None, "0800"),
+])
+def test_minute_key(value, expected):
+    assert minute_key(value) == expected
+
+
+def test_slot_for_requires_location():
+    assert slot_for({"notification_time": "07:30"}) is None
+    assert slot_for({"notification_time": "07:30", "location": "39.93,32.86"}) == "0730/399_329"
+
+
+def test_index_users_moves_user_between_buckets(database):
+    database.root.update({
+        "users": {"u1": {"location": "39.93,32.86", "notification_time": "07:30"},
+                  "u2": {"location": "41.01,28.97"}},
+        "devices": {"u1": {"d1": {"token": "t1"}}},
+    })
+    index_users(["u1", "u2"])
+    repository = DigestIndexRepository()
+    assert repository.bucket("0730") == {"399_329": {"u1": ["t1"]}}
+    assert repository.bucket("0800") == {"410_290": {"u2": True}}
+
+    # Saat ve konum değişince eski kova ve hücre indeksinden silinir
+    database.root["users"]["u1"].update({"location": "41.01,28.97", "notification_time": "08:00"})
+    index_users(["u1"])
+    assert repository.bucket("0730") == {}
+    assert repository.bucket("0800") == {"410_290": {"u1": ["t1"], "u2": True}}
+    assert repository.subscribers("399_329") == {}
+
+
+def test_render_uses_tomorrow_in_the_evening():
+    forecast = {"days": [{"conditions": "Clear", "tempmin": 5, "tempmax": 15, "precipprob": 10},
+                         {"conditions": "Rain", "tempmin": 3, "tempmax": 9, "precipprob": 80}]}
+    assert render(forecast, evening=False) == ("☀️ Bugünün hava durumu", "Clear, 5–15°C, yağış olasılığı %10")
+    assert render(forecast, evening=True)[1] == "Rain, 3–9°C, yağış olasılığı %80"
+
+
+def test_fire_sends_one_message_per_cell_once(database, shared_cache, monkeypatch):
+    pushes = []
+
+    def send_multicast(message, dry_run=False, app=None):
+        pushes.append((message.notification.body, list(message.tokens)))
+        return type("Response", (), {"success_count": len(message.tokens), "failure_count": 0})()
+
+    monkeypatch.setattr(messaging, "send_multicast", send_multicast)
+    engine = DigestEngine(lead_minutes=0)
+    forecast = {"days": [{"conditions": "Clear", "tempmin": 5, "tempmax": 15, "precipprob": 10}]}
+    engine._prepared["0730"] = PreparedBucket(
+        "0730",
+        {"399_329": {"u1": ["t1"], "u2": ["t2", "t3"]}, "410_290": {"u3": True}},
+        {"399_329": forecast, "410_290": forecast},
+    )
+    at = datetime(2026, 10, 19, 7, 30)
+
+    stats = engine.fire(at)
+    assert stats["sent_cells"] == 2 and stats["users"] == 3
+    assert stats["push_success"] == 3
+    # Cihazı olmayan hücreye push gitmez, bildirim kaydı yine yazılır
+    assert pushes == [("Clear, 5–15°C, yağış olasılığı %10", ["t1", "t2", "t3"])]
+    notifications = database.root["notifications"]
+    assert {uid: list(records) for uid, records in notifications.items()} == \
+        {uid: ["digest_20261019_0730"] for uid in ("u1", "u2", "u3")}
+
+    # Aynı dakika ikinci kez gönderilmez
+    assert "skipped" in engine.fire(at)
@@ -0,0 +1,62 @@
+"""EmergencyDetector: sürekli ihlalde alarm, art arda normal ölçümle kapanış (histerezis)."""
+import numpy as np
+
+from routes.emergency_detector import EmergencyDetector, HealthBatchReader
+
+
+def tick(detector, heart_rate, steps=-1, sleep=float("nan")):
+    return detector.update(detector.register(["u1"]), [heart_rate], [steps], [sleep])
+
+
+def test_alarm_requires_sustained_breach():
+    detector = EmergencyDetector(sustain_ticks=3, clear_ticks=5)
+    assert tick(detector, 140) == []
+    assert tick(detector, 140) == []
+    events = tick(detector, 140)
+    assert [event["state"] for event in events] == ["emergency"]
+    assert events[0]["reasons"] == ["heart_rate_high"]
+    # Açık alarm tekrar olay üretmez
+    assert tick(detector, 140) == []
+
+
+def test_single_normal_reading_resets_breach_count():
+    detector = EmergencyDetector(sustain_ticks=3, clear_ticks=5)
+    tick(detector, 140)
+    tick(detector, 140)
+    tick(detector, 80)
+    assert tick(detector, 140) == []
+    assert not detector.is_active("u1")
+
+
+def test_clear_requires_consecutive_normal_readings():
+    detector = EmergencyDetector(sustain_ticks=1, clear_ticks=3)
+    assert tick(detector, 30)[0]["reasons"] == ["heart_rate_low"]
+    assert tick(detector, 70) == []
+    assert tick(detector, 70) == []
+    assert tick(detector, 30) == []       # İhlal sayacı sıfırlanır, alarm sürer
+    assert tick(detector, 70) == []
+    assert tick(detector, 70) == []
+    assert [event["state"] for event in tick(detector, 70)] == ["resolved"]
+    assert not detector.is_active("u1")
+
+
+def test_unknown_steps_and_sleep_disable_inactivity_rule():
+    detector = EmergencyDetector(sustain_ticks=1)
+    assert tick(detector, 70, steps=-1, sleep=float("nan")) == []
+    assert tick(detector, 70, steps=0, sleep=13)[0]["reasons"] == ["inactivity"]
+
+
+def test_batch_reader_skips_users_without_readings():
+    samples = {"u1": {"heart_rate": 72, "steps": None, "sleep_duration": None}, "u2": None}
+
+    def read(user_id):
+        if user_id == "u3":
+            raise ValueError("bozuk yanıt")
+        return samples[user_id]
+
+    reader = HealthBatchReader(read=read, users=lambda: ["u1", "u2", "u3"])
+    user_ids, heart_rate, steps, sleep = reader()
+    assert user_ids == ["u1"]
+    assert heart_rate.tolist() == [72.0]
+    assert steps.tolist() == [-1]
+    assert np.isnan(sleep[0])
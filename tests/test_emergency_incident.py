@@ -0,0 +1,67 @@
+"""IncidentManager: open -> acknowledged -> resolved, tekrar tetikleme ve yeniden açılış."""
+import pytest
+
+from routes.emergency_incident import STATE_ACKNOWLEDGED, STATE_OPEN, STATE_RESOLVED, IncidentManager
+
+
+@pytest.fixture
+def manager(database, shared_cache):
+    notified = []
+    manager = IncidentManager(detect=lambda user_id: {"heart_rate": 140},
+                              notify=lambda user_id, incident: notified.append(incident.id),
+                              debounce_seconds=0)
+    manager.notified = notified
+    return manager
+
+
+def test_trigger_opens_once_and_counts_repeats(manager, database):
+    incident, notified = manager.trigger("u1")
+    assert notified and incident.state == STATE_OPEN
+    calls = database.calls
+
+    again, notified = manager.trigger("u1")
+    assert not notified and again.id == incident.id
+    assert manager.notified == [incident.id]
+    assert database.calls == calls    # Açık olay önbellekten gelir
+
+    # Biriken tetiklemeler transaction ile kayda eklenir
+    manager._flush_triggers("u1")
+    record = database.reference("/emergency_incident_current/u1").get()
+    assert record["trigger_count"] == 2
+
+
+def test_acknowledge_and_resolve(manager, database):
+    incident, _ = manager.trigger("u1")
+    assert manager.acknowledge("u1", "başka-olay") is None
+    assert manager.acknowledge("u1", incident.id).state == STATE_ACKNOWLEDGED
+    assert manager.resolve("u1", incident.id).state == STATE_RESOLVED
+    # Kapanan olay tekrar kapatılamaz, önbellekten de düşer
+    assert manager.resolve("u1", incident.id) is None
+    assert manager._cached("u1") is None
+    assert database.reference(f"/emergency_incidents/u1/{incident.id}").get()["state"] == STATE_RESOLVED
+
+
+def test_recently_resolved_incident_reopens_and_notifies_again(manager):
+    incident, _ = manager.trigger("u1")
+    manager.resolve("u1", incident.id)
+
+    reopened, notified = manager.trigger("u1")
+    assert notified
+    assert reopened.id == incident.id and reopened.state == STATE_OPEN
+    assert reopened.escalation_level == 0
+    assert manager.notified == [incident.id, incident.id]
+
+
+def test_resolved_incident_outside_window_opens_new_record(database, shared_cache):
+    manager = IncidentManager(detect=lambda user_id: {"heart_rate": 140},
+                              notify=lambda user_id, incident: None,
+                              debounce_seconds=0, reopen_window_seconds=0)
+    first, _ = manager.trigger("u1")
+    manager.resolve("u1", first.id)
+    second, notified = manager.trigger("u1")
+    assert notified and second.id != first.id
+
+
+def test_no_emergency_returns_none(database, shared_cache):
+    manager = IncidentManager(detect=lambda user_id: None, notify=lambda user_id, incident: None)
+    assert manager.trigger("u1") == (None, False)
@@ -0,0 +1,61 @@
+"""Olay merkezi: Last-Event-ID ile devam, resync ve yavaş bağlantının taşması."""
+from routes.event_hub import EventHub, MemoryEventLog, SqliteEventLog
+
+
+def test_publish_without_listeners_is_dropped():
+    hub = EventHub(MemoryEventLog)
+    assert hub.publish("u1", "notification", {"id": "n1"}) is None
+    assert hub.log.last_seq() == 0
+
+
+def test_events_are_delivered_and_resumed_after_reconnect():
+    hub = EventHub(MemoryEventLog)
+    subscription, replay, resync = hub.subscribe("u1")
+    assert replay == [] and resync is None
+
+    first = hub.publish("u1", "notification", {"id": "n1"})
+    hub.publish("u2", "notification", {"id": "x"})        # Başka konu
+    hub.relay()
+    assert subscription.get(1) == first
+    hub.unsubscribe(subscription)
+
+    # Bağlantı yokken gelen olaylar günlükte kalır (konu REPLAY_TTL_SECONDS dinleniyor sayılır)
+    second = hub.publish("u1", "notification", {"id": "n2"})
+    third = hub.publish("u1", "incident", {"state": "open"})
+    hub.relay()
+    subscription, replay, resync = hub.subscribe("u1", first.id)
+    assert [event.id for event in replay] == [second.id, third.id]
+    assert resync is None
+
+
+def test_unknown_or_foreign_event_id_requests_resync():
+    hub = EventHub(MemoryEventLog)
+    hub.subscribe("u1")
+    hub.publish("u1", "notification", {"id": "n1"})
+    hub.relay()
+    for last_event_id in ("başkadönem-1", "bozuk", f"{hub.log.epoch}-x"):
+        _, replay, resync = hub.subscribe("u1", last_event_id)
+        assert replay == [] and resync == f"{hub.log.epoch}-1"
+
+
+def test_slow_subscriber_overflows_and_is_closed():
+    hub = EventHub(MemoryEventLog)
+    slow, _, _ = hub.subscribe("u1", maxsize=2)
+    fast, _, _ = hub.subscribe("u1", maxsize=10)
+    for index in range(3):
+        hub.publish("u1", "notification", {"id": index})
+    hub.relay()
+    # Aktarıcı beklemez: taşan bağlantı kapanır, diğerleri etkilenmez
+    assert slow.overflowed
+    assert slow.get(0) is None
+    assert [fast.get(0).data["id"] for _ in range(3)] == [0, 1, 2]
+
+
+def test_sqlite_log_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "events.sqlite3")
+    writer, reader = SqliteEventLog(path), SqliteEventLog(path)
+    assert writer.epoch == reader.epoch
+    reader.touch(["u1"])
+    assert writer.listening("u1") and not writer.listening("u2")
+    seq = writer.append("u1", "notification", {"id": "n1"})
+    assert reader.read_after(seq - 1, "u1") == [(seq, "u1", "notification", {"id": "n1"})]
@@ -0,0 +1,58 @@
+"""Çevrimdışı ters coğrafi kodlama: ızgara indeksi üretimi ve en yakın merkez araması."""
+import pytest
+
+from routes.geocoder import ReverseGeocoder, slug
+
+CSV = """city_code,city,district,lat,lon
+06,Ankara,Çankaya,39.8700,32.8300
+06,Ankara,Altındağ,39.9600,32.9200
+07,Antalya,,36.8969,30.7133
+34,İstanbul,Kadıköy,40.9900,29.0300
+"""
+
+
+@pytest.fixture
+def geocoder(tmp_path):
+    source = tmp_path / "places.csv"
+    source.write_text(CSV, encoding="utf-8")
+    # İndeks ilk aramada kaynak dosyadan üretilir
+    return ReverseGeocoder(index_dir=str(tmp_path / "index"), source=str(source))
+
+
+def test_reverse_returns_nearest_district(geocoder):
+    place = geocoder.reverse(39.88, 32.84)
+    assert (place.city, place.district, place.key) == ("Ankara", "Çankaya", "TR-06-cankaya")
+    assert 0 < place.distance_km < 2
+    assert geocoder.reverse(39.955, 32.915).district == "Altındağ"
+
+
+def test_city_without_districts_uses_city_id(geocoder):
+    place = geocoder.reverse(36.90, 30.70)
+    assert place.district is None and place.key == "TR-07"
+    assert place.forecast_location == "36.8969,30.7133"
+
+
+def test_out_of_range_and_far_points_return_none(geocoder):
+    assert geocoder.reverse(48.85, 2.35) is None                 # Kapsam dışı (Paris)
+    assert geocoder.reverse(38.0, 36.0) is None                  # En yakın merkez MAX_DISTANCE_KM'den uzak
+    assert geocoder.reverse(39.88, 32.84, max_distance_km=0.1) is None
+
+
+def test_resolve_accepts_strings_and_tuples(geocoder):
+    assert geocoder.resolve("40.99,29.03").district == "Kadıköy"
+    assert geocoder.resolve((40.99, 29.03)).district == "Kadıköy"
+    assert geocoder.resolve("Ankara") is None
+    assert geocoder.resolve("x,y") is None
+
+
+def test_index_is_rebuilt_when_source_changes(tmp_path, geocoder):
+    geocoder.places()
+    source = tmp_path / "places.csv"
+    source.write_text(CSV + "35,İzmir,Konak,38.4189,27.1287\n", encoding="utf-8")
+    fresh = ReverseGeocoder(index_dir=str(tmp_path / "index"), source=str(source))
+    assert fresh.reverse(38.42, 27.13).city == "İzmir"
+
+
+def test_slug_transliterates_turkish():
+    assert slug("Çankaya") == "cankaya"
+    assert slug("Şişli / İstanbul") == "sisli-istanbul"
@@ -0,0 +1,72 @@
+"""Konum yazma tamponu: kirli giriş kuralı, toplu flush ve okumalarda yalnızca yazılmamış konum."""
+import pytest
+
+from routes.location_buffer import LocationBuffer
+
+ANKARA = "39.9300,32.8300"
+NEARBY = "39.9303,32.8303"        # ~40 m
+FAR = "39.9400,32.8400"           # ~1.4 km
+
+
+@pytest.fixture
+def buffer(database):
+    buffer = LocationBuffer(min_distance_m=100, max_interval=600, flush_interval=3600)
+    yield buffer
+    # Kapanıştaki atexit flush'ı yazacak bir şey kalmasın
+    buffer.flush(force=True)
+    buffer._stop.set()
+
+
+def stored(database, user_id):
+    return (database.root.get("users", {}).get(user_id) or {}).get("location")
+
+
+def test_new_user_is_dirty_until_flushed(buffer, database):
+    buffer.update("u1", ANKARA)
+    assert buffer.latest("u1") == ANKARA
+    assert buffer.flush() == 1
+    assert stored(database, "u1") == ANKARA
+    # Kaydedilen konum okumalarda veritabanından gelir
+    assert buffer.latest("u1") is None
+
+
+def test_small_moves_are_coalesced(buffer, database):
+    buffer.update("u1", ANKARA)
+    buffer.flush()
+    buffer.update("u1", NEARBY)
+    assert buffer.latest("u1") is None
+    assert buffer.flush() == 0
+    assert stored(database, "u1") == ANKARA
+
+    buffer.update("u1", FAR)
+    assert buffer.latest("u1") == FAR
+    assert buffer.flush() == 1
+    assert stored(database, "u1") == FAR
+
+
+def test_max_interval_marks_entry_dirty(database):
+    buffer = LocationBuffer(min_distance_m=100, max_interval=0, flush_interval=3600)
+    try:
+        buffer.update("u1", ANKARA)
+        buffer.flush()
+        buffer.update("u1", NEARBY)
+        assert buffer.latest("u1") == NEARBY
+    finally:
+        buffer.flush(force=True)
+        buffer._stop.set()
+
+
+def test_force_flush_writes_coalesced_positions(buffer, database):
+    buffer.update("u1", ANKARA)
+    buffer.flush()
+    buffer.update("u1", NEARBY)
+    assert buffer.flush(force=True) == 1
+    assert stored(database, "u1") == NEARBY
+
+
+def test_flush_batches_users_into_one_write(buffer, database):
+    for index in range(5):
+        buffer.update(f"u{index}", ANKARA)
+    assert buffer.flush() == 5
+    snapshot = buffer.snapshot()
+    assert snapshot["writes"] == 1 and snapshot["pending_users"] == 0
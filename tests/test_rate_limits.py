@@ -0,0 +1,94 @@
+"""Token bucket'lar, upstream kotaları ve kabul kontrolü."""
+import pytest
+
+from routes.admission import AdmissionController, Rejected, RouteClassLimits
+from routes.quota_scheduler import PRIORITY_BACKGROUND, PRIORITY_EMERGENCY, QuotaExceeded, UpstreamQuota
+from routes.token_bucket import SharedTokenBucket, TokenBucket
+
+
+def test_token_bucket_respects_reserve_and_refund():
+    bucket = TokenBucket(capacity=3, rate=0)
+    assert bucket.try_acquire(1, reserve=1)[0]
+    assert bucket.try_acquire(1, reserve=1)[0]
+    ok, retry_after = bucket.try_acquire(1, reserve=1)
+    assert not ok and retry_after == float("inf")
+    assert bucket.try_acquire(1)[0]             # Ayrılmış payı yalnızca reserve=0 kullanır
+    bucket.refund(5)
+    assert bucket.available() == 3             # Kapasiteyi aşmaz
+
+
+def test_shared_bucket_is_shared_between_instances(shared_cache):
+    first = SharedTokenBucket("test", capacity=2, rate=0.01)
+    second = SharedTokenBucket("test", capacity=2, rate=0.01)
+    assert first.try_acquire()[0]
+    assert second.try_acquire()[0]
+    ok, retry_after = first.try_acquire()
+    assert not ok and 0 < retry_after <= first.window
+    second.refund()
+    assert first.available() == 1
+    assert first.try_acquire()[0]
+
+
+def test_shared_bucket_reserve(shared_cache):
+    bucket = SharedTokenBucket("reserve", capacity=4, rate=0.01)
+    assert bucket.try_acquire(reserve=2)[0]
+    assert bucket.try_acquire(reserve=2)[0]
+    assert not bucket.try_acquire(reserve=2)[0]
+    assert bucket.try_acquire(reserve=0)[0]
+
+
+def test_quota_daily_shed_refunds_rate_token(shared_cache):
+    quota = UpstreamQuota("test", per_second=0.01, burst=10, daily_limit=2)
+    quota.acquire(PRIORITY_EMERGENCY)
+    quota.acquire(PRIORITY_EMERGENCY)
+    with pytest.raises(QuotaExceeded) as error:
+        quota.acquire(PRIORITY_EMERGENCY)
+    assert error.value.reason == "daily"
+    # Günlük kotada reddedilen istek saniyelik token harcamaz
+    assert quota.bucket.available() == 8
+
+
+def test_quota_background_lane_sheds_without_waiting(shared_cache):
+    quota = UpstreamQuota("lanes", per_second=0.01, burst=2, daily_limit=None)
+    with pytest.raises(QuotaExceeded) as error:
+        # Arka plan şeridi kovanın yarısını öncelikli şeritlere bırakır
+        for _ in range(2):
+            quota.acquire(PRIORITY_BACKGROUND)
+    assert error.value.reason == "rate"
+    quota.acquire(PRIORITY_EMERGENCY)
+
+
+def controller(**limits):
+    classes = {
+        "cheap": RouteClassLimits(**limits),
+        "emergency": RouteClassLimits(1, 0.01, 1, 0.01, shed=False),
+    }
+    return AdmissionController(classes, max_in_flight=2, emergency_slots=1)
+
+
+def test_admission_rate_limits_user_then_global(shared_cache):
+    admission = controller(user_burst=1, user_per_second=0.01, global_burst=2, global_per_second=0.01)
+    admission.admit("cheap", "u1")
+    admission.release()
+    with pytest.raises(Rejected) as error:
+        admission.admit("cheap", "u1")
+    assert error.value.reason == "rate_limited"
+
+    admission.admit("cheap", "u2")
+    admission.release()
+    with pytest.raises(Rejected):
+        admission.admit("cheap", "u3")
+    # Genel kovada reddedilen kullanıcının token'ı iade edilir
+    assert admission._user_bucket("cheap", "u3").available() == 1
+
+
+def test_admission_keeps_slots_for_emergency(shared_cache):
+    admission = controller(user_burst=10, user_per_second=1, global_burst=10, global_per_second=1)
+    admission.admit("cheap", "u1")
+    with pytest.raises(Rejected) as error:
+        admission.admit("cheap", "u2")
+    assert error.value.reason == "overloaded"
+    # Acil durum sınıfı ne eşzamanlılıkta ne hızda reddedilir
+    admission.admit("emergency", "u1")
+    admission.admit("emergency", "u1")
+    assert admission.snapshot()["in_flight"] == 3
@@ -0,0 +1,78 @@
+"""
+İstek başına Realtime Database gidiş-dönüş sayısı (X-DB-Round-Trips).
+
+Sahte Firebase (benchmarks/fake_db.py) ve sahte upstream'lerle çevrimdışı çalışır:
+    python -m pytest tests
+"""
+import pytest
+from werkzeug.test import Client
+
+from benchmarks.app_bench import seed_data
+from benchmarks.fake_upstreams import OfflineEnvironment
+from routes.location_buffer import get_location_buffer
+
+
+@pytest.fixture(scope="module")
+def env():
+    with OfflineEnvironment(latency=0) as environment:
+        environment.seed(seed_data(3))
+        import app as app_module
+        environment.attach_app(app_module)
+        environment.client = Client(app_module.app)
+        yield environment
+        # Tampondaki konumlar sahte veritabanı kapanmadan yazılsın
+        get_location_buffer().flush(force=True)
+
+
+def post(env, path: str, body: dict) -> tuple:
+    """(yanıt, başlıktaki gidiş-dönüş, sahte veritabanının gördüğü çağrı sayısı)"""
+    before = sum(env.db_calls.values())
+    response = env.client.post(path, json=body)
+    return response, int(response.headers["X-DB-Round-Trips"]), sum(env.db_calls.values()) - before
+
+
+def test_weather_alert_reads_location_once(env):
+    # İlk çağrı tahmini çeker ve hava geçmişi hücresini yazar; ölçüm sıcak önbellekle yapılır
+    post(env, "/api/notifications/weather-alert/user0", {"message": "Yarın fırtına bekleniyor"})
+
+    response, round_trips, calls = post(env, "/api/notifications/weather-alert/user0",
+                                        {"message": "Yarın fırtına bekleniyor"})
+    assert response.status_code == 201
+    # Konum (tahmin ve kafe önerisi aynı okumayı paylaşır) + bildirim kaydı + cihazlar
+    assert round_trips == 3
+    assert calls == round_trips
+
+
+def test_weather_alert_uses_buffered_location(env):
+    buffer = get_location_buffer()
+    # Arka plandaki flush ölçülen isteğe denk gelmesin: giriş ölçüm boyunca kirli kalır
+    with buffer._flush_lock:
+        env.client.post("/set_location", json={"user_id": "user1", "location": "39.9050,32.8050"})
+        response, round_trips, calls = post(env, "/api/notifications/weather-alert/user1",
+                                            {"message": "Yarın fırtına bekleniyor"})
+    assert response.status_code == 201
+    # Konum yazma tamponundan gelir (init_repository'deki pending_location kancası)
+    assert round_trips == 2
+    assert calls == round_trips
+
+
+def test_weather_alert_reads_location_after_flush(env):
+    env.client.post("/set_location", json={"user_id": "user1", "location": "39.9300,32.8300"})
+    get_location_buffer().flush(force=True)
+    # Yeni hücrenin tahmini ve hava geçmişi ilk çağrıda yazılır
+    post(env, "/api/notifications/weather-alert/user1", {"message": "Yarın fırtına bekleniyor"})
+
+    response, round_trips, calls = post(env, "/api/notifications/weather-alert/user1",
+                                        {"message": "Yarın fırtına bekleniyor"})
+    assert response.status_code == 201
+    # Kaydedilmiş giriş tampondan verilmez: konum veritabanından okunur
+    assert round_trips == 3
+    assert calls == round_trips
+
+
+def test_push_notification_reads_devices_once(env):
+    response, round_trips, calls = post(env, "/api/notifications/push/test/user2", {})
+    assert response.status_code == 200
+    assert response.get_json() == {"success": 1, "failure": 0}
+    assert round_trips == 1
+    assert calls == round_trips
@@ -0,0 +1,86 @@
+"""SMS gönderimi: numara normalizasyonu, tekrarsız alıcılar ve yalnızca güvenli hatalarda tekrar deneme."""
+import pytest
+import requests
+from twilio.base.exceptions import TwilioRestException
+
+from routes import sms_dispatch
+from routes.sms_dispatch import SmsDispatcher, normalize_phone, unique_recipients
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("0532 123 45 67", "+905321234567"),
+    ("5321234567", "+905321234567"),
+    ("+90 (532) 123-45-67", "+905321234567"),
+    ("0049 30 1234567", "+49301234567"),
+    ("12", None),
+    ("", None),
+    (None, None),
+])
+def test_normalize_phone(raw, expected):
+    assert normalize_phone(raw) == expected
+
+
+def test_unique_recipients_dedups_and_skips_invalid():
+    contacts = {
+        "a": {"phone": "0532 123 45 67"},
+        "b": {"phone": "+905321234567"},
+        "c": {"phone": "abc"},
+        "d": None,
+        "e": {"phone": "0533 000 00 00"},
+    }
+    assert unique_recipients(contacts) == ["+905321234567", "+905330000000"]
+
+
+class FakeMessages:
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def create(self, body, from_, to):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return type("Message", (), {"sid": f"SM{self.calls}"})()
+
+
+@pytest.fixture
+def messages(monkeypatch):
+    def install(*errors):
+        fake = FakeMessages(errors)
+        monkeypatch.setattr(sms_dispatch, "_client", type("Client", (), {"messages": fake})())
+        return fake
+    return install
+
+
+def test_retries_rate_limit_then_sends(messages):
+    fake = messages(TwilioRestException(429, "uri", "Too Many Requests"))
+    result = SmsDispatcher(retries=2, backoff=0)._send_one("+905321234567", "test")
+    assert result["status"] == "sent" and result["attempts"] == 2
+    assert fake.calls == 2
+
+
+def test_read_timeout_is_not_retried(messages):
+    # İstek Twilio'ya ulaşmış olabilir: tekrar denemek aynı SMS'i iki kez gönderir
+    fake = messages(requests.exceptions.ReadTimeout("okuma zaman aşımı"))
+    result = SmsDispatcher(retries=2, backoff=0)._send_one("+905321234567", "test")
+    assert result["status"] == "failed" and fake.calls == 1
+
+
+def test_client_error_is_not_retried(messages):
+    fake = messages(TwilioRestException(400, "uri", "Invalid number"))
+    assert SmsDispatcher(retries=2, backoff=0)._send_one("+905321234567", "test")["status"] == "failed"
+    assert fake.calls == 1
+
+
+def test_gives_up_after_retries(messages):
+    errors = [TwilioRestException(503, "uri", "Unavailable")] * 3
+    fake = messages(*errors)
+    result = SmsDispatcher(retries=2, backoff=0)._send_one("+905321234567", "test")
+    assert result["status"] == "failed" and result["attempts"] == 3 and fake.calls == 3
+
+
+def test_send_bulk_returns_result_per_recipient(messages):
+    messages()
+    results = SmsDispatcher(backoff=0).send_bulk(["+905321234567", "+905330000000"], "test")
+    assert [result["to"] for result in results] == ["+905321234567", "+905330000000"]
+    assert all(result["status"] == "sent" for result in results)
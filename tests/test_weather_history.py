@@ -0,0 +1,69 @@
+"""Sıkıştırılmış hava geçmişi: gün kaydının kodlanması ve gün kovalarına birleştirme."""
+from models.repository import WeatherHistoryRepository
+from routes.weather_history import (
+    SLOT_SECONDS, Sample, WeatherHistory, cell_id, cell_location, decode_day, encode_day, samples_from_timeline
+)
+
+DAY = 1_700_000_000 // 86400 * 86400
+
+
+def test_encode_decode_round_trip_with_gaps_and_missing_fields():
+    slots = {
+        0: Sample(DAY, 12.3, 0.0, 10.4),
+        5: Sample(DAY + 5 * SLOT_SECONDS, -4.1, None, 22.0),
+        23: Sample(DAY + 23 * SLOT_SECONDS, None, 1.25, None),
+    }
+    assert decode_day(encode_day(DAY, slots)) == slots
+
+
+def test_corrupt_or_empty_blob_decodes_to_empty():
+    assert decode_day(None) == {}
+    assert decode_day("") == {}
+    assert decode_day("bozuk-kayıt") == {}
+
+
+def test_cell_id_rounds_to_grid_and_round_trips():
+    assert cell_id("39.9334,32.8597") == "399_329"
+    assert cell_id((39.9334, 32.8597)) == "399_329"
+    assert cell_location("399_329") == "39.9,32.9"
+    assert cell_id("New York") == "new-york"
+
+
+def test_append_merges_hours_and_skips_unchanged_days(database):
+    history = WeatherHistory()
+    assert history.append("39.9,32.8", [Sample(DAY, 10.0, 0.0, 5.0)]) == 1
+    assert history.append("39.9,32.8", [Sample(DAY + SLOT_SECONDS, 11.0, 0.0, 5.0),
+                                        Sample(DAY + 86400, 3.0, 0.0, 1.0)]) == 2
+    calls = database.calls
+    assert history.append("39.9,32.8", [Sample(DAY, 10.0, 0.0, 5.0)]) == 0
+    assert database.calls == calls + 1      # Yalnızca toplu okuma
+
+    samples = history.range("39.9,32.8", DAY, DAY + 86400 + SLOT_SECONDS)
+    assert [sample.temp for sample in samples] == [10.0, 11.0, 3.0]
+
+
+class RacingRepository(WeatherHistoryRepository):
+    def get_days(self, cell, days):
+        stored = super().get_days(cell, days)
+        # Başka bir worker bu okumadan hemen sonra aynı güne bir saat ekler
+        WeatherHistory().append("39.9,32.8", [Sample(DAY + 2 * SLOT_SECONDS, 9.0, 0.0, 4.0)])
+        return stored
+
+
+def test_append_keeps_hours_written_concurrently(database):
+    WeatherHistory().append("39.9,32.8", [Sample(DAY, 10.0, 0.0, 5.0)])
+    WeatherHistory(RacingRepository()).append("39.9,32.8", [Sample(DAY + SLOT_SECONDS, 11.0, 0.0, 5.0)])
+    samples = WeatherHistory().range("39.9,32.8", DAY, DAY + 3 * SLOT_SECONDS)
+    assert [sample.temp for sample in samples] == [10.0, 11.0, 9.0]
+
+
+def test_samples_from_timeline_excludes_future_hours():
+    data = {
+        "days": [{"hours": [
+            {"datetimeEpoch": DAY, "temp": 5, "precip": 0, "windspeed": 3},
+            {"datetimeEpoch": DAY + 7200, "temp": 8, "precip": 0, "windspeed": 3},
+        ]}],
+        "currentConditions": {"datetimeEpoch": DAY + 1800, "temp": 6, "precip": 0, "windspeed": 3},
+    }
+    samples = samples_from_timeline(data, now=DAY + 3600)
+    assert [(sample.ts, sample.temp) for sample in samples] == [(DAY, 5), (DAY, 6)]
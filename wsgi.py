@@ -0,0 +1,63 @@
+"""
+Production WSGI giriş noktası.
+
+    gunicorn -c gunicorn.conf.py
+
+Geliştirme sunucusu için `python app.py` kullanılmaya devam edilebilir.
+"""
+import logging
+import os
+import time
+
+from firebase_admin import db
+
+from app import app
+from routes.auth_middleware import verifier
+from routes.background_jobs import start_as_leader
+from routes.cache_backend import get_cache
+from routes.http_session import warm_up as warm_up_connections
+from routes.sms_dispatch import get_sms_dispatcher, get_twilio_client
+from routes.weather import get_weather
+
+logger = logging.getLogger(__name__)
+
+# Trafik almadan önce hava durumu önbelleğe alınacak konumlar (virgülle ayrılmış)
+WARMUP_LOCATIONS = [loc.strip() for loc in os.getenv("WARMUP_LOCATIONS", "Ankara").split(",") if loc.strip()]
+WARMUP_HOSTS = (
+    "https://weather.visualcrossing.com/",
+    "https://maps.googleapis.com/",
+)
+
+
+def _step(name: str, func):
+    started = time.perf_counter()
+    try:
+        func()
+        logger.info(f"Isınma adımı tamam: {name} ({(time.perf_counter() - started) * 1000:.0f} ms)")
+    except Exception as e:
+        logger.warning(f"Isınma adımı başarısız: {name}: {str(e)}")
+
+
+def warm_up():
+    """
+    Worker trafik almadan önce çağrılır (gunicorn post_worker_init).
+
+    preload_app ile uygulama master süreçte yüklenir; thread'ler fork'tan sonra
+    taşınmadığı için arka plan işleri burada yeniden başlatılır. Ardından
+    bağlantı havuzları ve önbellekler doldurulur. Hiçbir adımın hatası worker'ı
+    durdurmaz.
+    """
+    # Anahtarlar çekilir ve bu worker'ın yenileyici thread'i başlar
+    _step("public keys", verifier.keys.get)
+    _step("shared cache", lambda: get_cache().get("warmup", "ping"))
+    _step("http pool", lambda: warm_up_connections(WARMUP_HOSTS))
+    _step("firebase", lambda: db.reference('/users').order_by_key().limit_to_first(1).get())
+    _step("twilio", lambda: (get_twilio_client(), get_sms_dispatcher()))
+    for location in WARMUP_LOCATIONS:
+        # Önbellek lease'i sayesinde makinedeki worker'lardan yalnızca biri istek atar
+        _step(f"forecast {location}", lambda: get_weather(location))
+    # Zamanlayıcılar (DIGEST_SCHEDULER vb.) makinedeki worker'lardan yalnızca birinde
+    _step("background jobs", start_as_leader)
+
+
+application = app